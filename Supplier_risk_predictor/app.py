@@ -1,20 +1,31 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Optional
+import asyncio
 from pydantic import BaseModel
 import json
 from datetime import datetime
-from pathlib import Path
-import os
-import requests
-from dotenv import load_dotenv
 
-from news import fetch_news
-from risk import analyze_risk
-from sentiment import analyze_sentiment
+from news import get_news, news_cache
+from risk import analyze_risk_batch
+from sentiment import analyze_sentiments, sentiment_cache, require_inference_capacity, require_capacity_unless_background
+from config import LLM_BATCH_SIZE, INCREMENTAL_LLM_STATE_PATH, REPORT_STORE, REPORT_STORE_PATH
+from llm import llm_generate_risk_report, llm_generate_risk_reports, is_error_report
+from incremental import IncrementalState
+from concurrency import llm_limiter, map_bounded, iter_bounded
+from datastore import supplier_store, storage_store
+from weather import get_road_details, prefetch_weather, weather_cache
+from scoring import summarize
+from jobs import job_manager, submit_job
+from report_writer import JSONReportWriter, PartitionedReportStore, report_files, report_slug
+from history import record_history
+from article_index import index_articles
+from dedup import cluster_articles, cluster_members
 
 router = APIRouter()
 
-with open("walmart_india_suppliers_final.json") as f:
-    SUPPLIERS = json.load(f)["suppliers"]
+# With REPORT_STORE=partitioned every report is also kept as history by date and supplier
+report_store = PartitionedReportStore(REPORT_STORE_PATH) if REPORT_STORE == "partitioned" else None
 
 # Pydantic model for request validation
 class SupplierRequest(BaseModel):
@@ -32,202 +43,313 @@ class SupplierLLMRequest(BaseModel):
     latitude: float
     longitude: float
 
-load_dotenv()
-WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
-WEATHER_API_URL = "https://api.openweathermap.org/data/2.5/weather"
+def article_content(article):
+    return article.get("description") or article.get("title", "")
 
-def fetch_road_details(state, lat, lon):
-    params = {
-        "lat": lat,
-        "lon": lon,
-        "appid": WEATHER_API_KEY,
-        "units": "metric"
-    }
-    response = requests.get(WEATHER_API_URL, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        return {
-            "weather": data.get("weather", [{}])[0].get("description", "N/A"),
-            "temp": data.get("main", {}).get("temp", "N/A"),
-            "humidity": data.get("main", {}).get("humidity", "N/A"),
-            "wind_speed": data.get("wind", {}).get("speed", "N/A")
-        }
-    return {"error": f"Failed to fetch road/weather details for {state}"}
-
-def llm_generate_risk_report(supplier_name, news_json, road_json):
-    api_key = os.getenv("TOGETHER_API_KEY")
-    llm_url = "https://api.together.xyz/v1/chat/completions"
-    import json as _json
-    prompt = f"""
-You are a JSON-generating API that analyzes both recent news and weather data related to suppliers.
-
-Your task is to return ONLY a valid JSON object for each supplier using the format below.
-
-- Use the news content to detect issues such as strikes, financial trouble, factory incidents, legal actions, or operational disruptions.
-- Use weather data to identify environmental threats like floods, storms, extreme heat, or rainfall affecting operations or transport.
-- Determine the overall risk level based on the severity and combined impact of both sources.
-- Assess any potential supply chain impacts and include a clear explanation in the `reason` field if disruptions are likely.
-- The state field should indicate the Indian state where the supplier is physically located (e.g., Maharashtra, Tamil Nadu, Gujarat, etc.) 
-
-STRICTLY FOLLOW this JSON structure. Return only valid JSON (no extra text or formatting comments):
-
-{{
-  "supplier": "<supplier name>",
-  "issue": "<short summary of the most relevant issue>",
-  "risk_level": "<low|medium|high>",
-  "state": "<Indian state where the supplier is located>",
-  "reason": "<detailed reason combining both news events and weather impact, if applicable>"
-}}
-Supplier: {supplier_name}
-News JSON: {_json.dumps(news_json)}
-Road/Weather JSON: {_json.dumps(road_json)}
-Analyze the above and return the JSON as specified.
-"""
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": "mistralai/Mistral-7B-Instruct-v0.1",
-        "messages": [
-            {"role": "system", "content": "You are a JSON API."},
-            {"role": "user", "content": prompt}
-        ],
-        "max_tokens": 512,
-        "temperature": 0.2
-    }
-    response = requests.post(llm_url, headers=headers, json=payload)
-    if response.status_code == 200:
-        try:
-            content = response.json()["choices"][0]["message"]["content"]
-            return _json.loads(content)
-        except Exception as e:
-            return {
-                "supplier": supplier_name,
-                "issue": "LLM response error",
-                "risk_level": "high",
-                "reason": f"Failed to parse LLM response: {str(e)}"
-            }
+def process_articles(clusters, sentiments):
+    """Combine near-duplicate clusters with their sentiment results into report entries, one per cluster."""
+    processed = []
+    risks = analyze_risk_batch([cluster["content"] for cluster in clusters])
+    for cluster, sentiment, risk in zip(clusters, sentiments, risks):
+        article = cluster["articles"][0]
+        processed.append({
+            "title": article.get("title"),
+            "url": article.get("url"),
+            "publishedAt": article.get("publishedAt"),
+            "risk_keywords": risk["keywords"],
+            "risk_score": risk["risk_score"],
+            "sentiment": sentiment["sentiment"],
+            "polarity_score": sentiment["polarity_score"],
+            "cluster_id": cluster["cluster_id"],
+            "copies": len(cluster["articles"])
+        })
+    return processed
+
+async def score_articles(articles):
+    """
+    Cluster near-duplicate articles and score each cluster once, so syndicated
+    copies of a story cost one inference, one prompt entry and one polarity.
+    Returns the clusters and their report entries.
+    """
+    clusters = await cluster_articles(articles, article_content)
+    sentiments = await analyze_sentiments([cluster["content"] for cluster in clusters])
+    return clusters, process_articles(clusters, sentiments)
+
+def supplier_scopes(supplier_name, state, category):
+    """Rollups a supplier's articles and verdicts count towards in the risk history."""
+    return {"supplier": supplier_name, "state": state, "category": category}
+
+async def gather_supplier_inputs(supplier_name, state, latitude, longitude, incremental_state=None, category=None):
+    """
+    News and weather are fetched concurrently, then scored into the LLM prompt inputs.
+    With an IncrementalState only unseen articles are scored and merged into
+    the supplier's retained history. Scored articles are added to the risk
+    history and the article search index.
+    """
+    articles, road_details = await asyncio.gather(
+        get_news(supplier_name),
+        get_road_details(state, latitude, longitude)
+    )
+    if incremental_state is not None:
+        clusters, scored = await score_articles(incremental_state.new_articles(supplier_name, articles))
+        members, member_entries = cluster_members(clusters, scored)
+        await index_articles(members, member_entries, supplier=supplier_name, state=state, category=category)
+        unscored = incremental_state.record_articles(supplier_name, members, member_entries)
+        processed_news = incremental_state.articles(supplier_name) + unscored
     else:
-        return {
-            "supplier": supplier_name,
-            "issue": "LLM API error",
-            "risk_level": "high",
-            "reason": f"HTTP {response.status_code}: {response.text}"
-        }
+        clusters, processed_news = await score_articles(articles)
+        await index_articles(
+            *cluster_members(clusters, processed_news), supplier=supplier_name, state=state, category=category
+        )
+    await record_history(
+        "record_articles", "supplier", supplier_name, processed_news, supplier_scopes(supplier_name, state, category)
+    )
+    # Pass the actual state to the LLM prompt by including it in the news_json
+    return {
+        "supplier_name": supplier_name,
+        "news_json": {"articles": processed_news, "state": state},
+        "road_json": road_details
+    }
+
+async def record_verdict(report, supplier_name, state, category):
+    """Append an LLM report to the risk history (tracking risk-level changes); error reports are skipped."""
+    if not is_error_report(report):
+        await record_history(
+            "record_verdict", "supplier", supplier_name, report, supplier_scopes(supplier_name, state, category),
+            risk_level=report.get("risk_level")
+        )
+
+async def analyze_supplier_with_llm(supplier_name, state, latitude, longitude, category=None):
+    inputs = await gather_supplier_inputs(supplier_name, state, latitude, longitude, category=category)
+    report = await llm_limiter.run(llm_generate_risk_report, **inputs)
+    await record_verdict(report, supplier_name, state, category)
+    return report
+
+def _llm_fingerprint(incremental_state, inputs):
+    # Weather only counts through its condition so temperature drift doesn't re-trigger the LLM
+    return incremental_state.fingerprint(inputs["supplier_name"], inputs["road_json"].get("weather"))
+
+async def _report_for(inputs, incremental_state):
+    """Single-supplier LLM report, reusing the previous verdict when its inputs are unchanged."""
+    fingerprint = None
+    if incremental_state is not None:
+        fingerprint = _llm_fingerprint(incremental_state, inputs)
+        cached = incremental_state.cached_verdict(inputs["supplier_name"], fingerprint)
+        if cached is not None:
+            return cached
+    report = await llm_limiter.run(llm_generate_risk_report, **inputs)
+    if incremental_state is not None and not is_error_report(report):
+        incremental_state.record_verdict(inputs["supplier_name"], fingerprint, report)
+    return report
+
+async def _iter_batched_reports(all_inputs, incremental_state):
+    """
+    (index, report) pairs as they finish: reusable verdicts first, then the
+    remaining suppliers LLM_BATCH_SIZE per prompt.
+    """
+    pending = []
+    for index, inputs in enumerate(all_inputs):
+        fingerprint = None
+        if incremental_state is not None:
+            fingerprint = _llm_fingerprint(incremental_state, inputs)
+            cached = incremental_state.cached_verdict(inputs["supplier_name"], fingerprint)
+            if cached is not None:
+                yield index, cached
+                continue
+        pending.append((index, fingerprint))
+    batches = [pending[i:i + LLM_BATCH_SIZE] for i in range(0, len(pending), LLM_BATCH_SIZE)]
+
+    async def run_batch(batch):
+        return await llm_limiter.run(llm_generate_risk_reports, [all_inputs[index] for index, _ in batch])
+
+    async for batch_index, reports in iter_bounded(run_batch, batches):
+        for (index, fingerprint), report in zip(batches[batch_index], reports):
+            if incremental_state is not None and not is_error_report(report):
+                incremental_state.record_verdict(all_inputs[index]["supplier_name"], fingerprint, report)
+            yield index, report
+
+async def iter_all_suppliers_llm(suppliers, incremental_state=None):
+    """(index, report) pairs for the suppliers in completion order."""
+    # One weather request per grid cell, shared by all suppliers in it
+    await prefetch_weather([(s["state"], s["latitude"], s["longitude"]) for s in suppliers])
+
+    def inputs_for(supplier):
+        return gather_supplier_inputs(
+            supplier["supplier_name"], supplier["state"], supplier["latitude"], supplier["longitude"],
+            incremental_state=incremental_state, category=supplier.get("category_name")
+        )
+
+    # Suppliers run concurrently; per-API limiters keep each upstream within quota
+    if LLM_BATCH_SIZE > 1:
+        async for item in _iter_batched_reports(await map_bounded(inputs_for, suppliers), incremental_state):
+            yield item
+        return
+
+    async def report_for(supplier):
+        return await _report_for(await inputs_for(supplier), incremental_state)
+
+    async for item in iter_bounded(report_for, suppliers):
+        yield item
+
+async def iter_analyze_all_suppliers(suppliers, incremental=True):
+    """
+    Full-fleet LLM run shared by the endpoint, its streaming variant and the
+    background job. Reports are yielded and appended to the output file as they
+    finish; run state is saved once the run completes.
+    """
+    incremental_state = IncrementalState(INCREMENTAL_LLM_STATE_PATH)
+    if not incremental:
+        incremental_state.reset()
+    async with JSONReportWriter("output/all_suppliers_analysis_llm.json") as writer:
+        async for index, report in iter_all_suppliers_llm(suppliers, incremental_state):
+            await writer.write(report)
+            supplier = suppliers[index]
+            if report_store is not None:
+                await report_store.append(supplier["supplier_name"], report)
+            # A reused verdict is already in the history from the run that produced it
+            if incremental_state.has_new_verdict(supplier["supplier_name"]):
+                await record_verdict(report, supplier["supplier_name"], supplier["state"], supplier.get("category_name"))
+            yield index, report
+    await asyncio.to_thread(incremental_state.save)
+
+async def analyze_all_suppliers(suppliers, incremental=True):
+    """All reports in supplier order."""
+    results = [None] * len(suppliers)
+    async for index, report in iter_analyze_all_suppliers(suppliers, incremental):
+        results[index] = report
+    return results
+
+async def _all_suppliers_job(job, incremental=True):
+    suppliers = supplier_store.all()
+    await job.set_total(len(suppliers))
+    async for _, report in iter_analyze_all_suppliers(suppliers, incremental):
+        await job.add_result(report)
+
+job_manager.register("analyze-all-suppliers-llm", _all_suppliers_job)
 
 # New endpoint for individual supplier analysis
-@router.post("/analyze-supplier")
+@router.post("/analyze-supplier", dependencies=[Depends(require_inference_capacity)])
 async def analyze_individual_supplier(supplier_data: SupplierRequest):
     try:
-        articles = fetch_news(supplier_data.supplier_name)
-        processed_articles = []
-
-        for article in articles:
-            content = article.get("description") or article.get("title", "")
-            risk = analyze_risk(content)
-            sentiment = analyze_sentiment(content)
-            processed_articles.append({
-                "title": article.get("title"),
-                "url": article.get("url"),
-                "publishedAt": article.get("publishedAt"),
-                "risk_keywords": risk["keywords"],
-                "risk_score": risk["risk_score"],
-                "sentiment": sentiment["sentiment"],
-                "polarity_score": sentiment["polarity_score"]
-            })
-
-        avg_polarity = sum([a["polarity_score"] for a in processed_articles]) / len(processed_articles) if processed_articles else 0.0
-        overall_sentiment = (
-            "Negative" if avg_polarity < -0.2
-            else "Positive" if avg_polarity > 0.2
-            else "Neutral"
-        )
+        clusters, processed_articles = await score_articles(await get_news(supplier_data.supplier_name))
+
+        overall = summarize([a["polarity_score"] for a in processed_articles])
 
         response = {
             "supplier_name": supplier_data.supplier_name,
             "state": supplier_data.state,
             "city": supplier_data.city,
             "category_name": supplier_data.category_name,
-            "overall_sentiment": overall_sentiment,
-            "average_polarity_score": avg_polarity,
+            "overall_sentiment": overall["sentiment"],
+            "average_polarity_score": overall["average_polarity_score"],
             "articles": processed_articles,
             "generatedAt": datetime.utcnow().isoformat() + "Z"
         }
 
-        # Optionally save to file
-        Path("output").mkdir(exist_ok=True)
-        filename = f"output/supplier_{supplier_data.supplier_name.replace(' ', '_').lower()}_analysis.json"
-        with open(filename, "w") as f:
-            json.dump(response, f, indent=2)
+        scopes = supplier_scopes(supplier_data.supplier_name, supplier_data.state, supplier_data.category_name)
+        await record_history("record_articles", "supplier", supplier_data.supplier_name, processed_articles, scopes)
+        await index_articles(*cluster_members(clusters, processed_articles), **scopes)
+        await record_history("record_verdict", "supplier", supplier_data.supplier_name, response, scopes)
+
+        # Saved off the event loop; concurrent requests for one supplier coalesce into one write
+        if report_store is not None:
+            await report_store.append(supplier_data.supplier_name, response)
+        else:
+            await report_files.replace(f"output/supplier_{report_slug(supplier_data.supplier_name)}_analysis.json", response)
 
         return response
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing supplier: {str(e)}")
 
-@router.post("/analyze-supplier-llm")
+@router.post("/analyze-supplier-llm", dependencies=[Depends(require_inference_capacity)])
 async def analyze_supplier_llm(supplier: SupplierLLMRequest):
     try:
-        articles = fetch_news(supplier.supplier_name)
-        processed_news = []
-        for article in articles:
-            content = article.get("description") or article.get("title", "")
-            risk = analyze_risk(content)
-            sentiment = analyze_sentiment(content)
-            processed_news.append({
-                "title": article.get("title"),
-                "url": article.get("url"),
-                "publishedAt": article.get("publishedAt"),
-                "risk_keywords": risk["keywords"],
-                "risk_score": risk["risk_score"],
-                "sentiment": sentiment["sentiment"],
-                "polarity_score": sentiment["polarity_score"]
-            })
-        road_details = fetch_road_details(supplier.state, supplier.latitude, supplier.longitude)
-        # Pass the actual state to the LLM prompt by including it in the news_json
-        llm_report = llm_generate_risk_report(
-            supplier_name=supplier.supplier_name,
-            news_json={"articles": processed_news, "state": supplier.state},
-            road_json=road_details
+        return await analyze_supplier_with_llm(
+            supplier.supplier_name, supplier.state, supplier.latitude, supplier.longitude,
+            category=supplier.category_name
         )
-        return llm_report
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in LLM supplier analysis: {str(e)}")
 
-@router.get("/analyze-all-suppliers-llm")
-def analyze_all_suppliers_llm():
+@router.get("/analyze-all-suppliers-llm", dependencies=[Depends(require_capacity_unless_background)])
+async def analyze_all_suppliers_llm(incremental: bool = True, background: bool = False):
+    """
+    LLM risk reports for every supplier. By default only new articles are
+    scored and the LLM is only asked again for suppliers whose inputs changed
+    since the last run; incremental=false rebuilds everything.
+    background=true submits a job instead and returns its ID immediately (202);
+    follow it under /api/jobs/{job_id}.
+    """
     try:
-        with open("walmart_india_suppliers_final.json") as f:
-            suppliers = json.load(f)["suppliers"]
-        results = []
-        for supplier in suppliers:
-            articles = fetch_news(supplier["supplier_name"])
-            processed_news = []
-            for article in articles:
-                content = article.get("description") or article.get("title", "")
-                risk = analyze_risk(content)
-                sentiment = analyze_sentiment(content)
-                processed_news.append({
-                    "title": article.get("title"),
-                    "url": article.get("url"),
-                    "publishedAt": article.get("publishedAt"),
-                    "risk_keywords": risk["keywords"],
-                    "risk_score": risk["risk_score"],
-                    "sentiment": sentiment["sentiment"],
-                    "polarity_score": sentiment["polarity_score"]
-                })
-            road_details = fetch_road_details(supplier["state"], supplier["latitude"], supplier["longitude"])
-            # Pass the actual state to the LLM prompt by including it in the news_json
-            llm_report = llm_generate_risk_report(
-                supplier_name=supplier["supplier_name"],
-                news_json={"articles": processed_news, "state": supplier["state"]},
-                road_json=road_details
-            )
-            results.append(llm_report)
-        Path("output").mkdir(exist_ok=True)
-        with open("output/all_suppliers_analysis_llm.json", "w") as f:
-            json.dump(results, f, indent=2)
-        return results
+        if background:
+            return JSONResponse(await submit_job("analyze-all-suppliers-llm", {"incremental": incremental}), status_code=202)
+        return await analyze_all_suppliers(supplier_store.all(), incremental)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in LLM analysis for all suppliers: {str(e)}")
+
+@router.get("/analyze-all-suppliers-llm/stream", dependencies=[Depends(require_inference_capacity)])
+async def stream_all_suppliers_llm(incremental: bool = True):
+    """
+    Same run as /analyze-all-suppliers-llm, streamed as NDJSON: one report per
+    line in completion order. A failure mid-run ends the stream with an error line.
+    """
+    suppliers = supplier_store.all()
+
+    async def lines():
+        try:
+            async for _, report in iter_analyze_all_suppliers(suppliers, incremental):
+                yield json.dumps(report) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Error in LLM analysis for all suppliers: {str(e)}"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """Hit/miss counters for the news, sentiment and weather caches."""
+    return {
+        "news": news_cache.stats(),
+        "sentiment": sentiment_cache.stats(),
+        "weather": weather_cache.stats()
+    }
+
+@router.get("/suppliers")
+async def get_suppliers(
+    name: Optional[str] = None,
+    state: Optional[str] = None,
+    city: Optional[str] = None,
+    category: Optional[str] = None
+):
+    """Suppliers filtered by exact (case-insensitive) name, state, city or category."""
+    try:
+        suppliers = supplier_store.query(name=name, state=state, city=city, category=category)
+        return {
+            "total_suppliers": len(suppliers),
+            "suppliers": suppliers,
+            "retrieved_at": datetime.utcnow().isoformat() + "Z"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving suppliers: {str(e)}")
+
+@router.get("/suppliers/facets")
+async def get_supplier_facets():
+    """Distinct states, cities and categories with supplier counts."""
+    try:
+        return {field: supplier_store.values(field) for field in ("state", "city", "category")}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving supplier facets: {str(e)}")
+
+@router.post("/weather/prefetch")
+async def prefetch_all_weather():
+    """Warm the weather cache for every supplier and storage location, one request per grid cell."""
+    try:
+        points = [(s["state"], s["latitude"], s["longitude"]) for s in supplier_store.all()]
+        points += [
+            (loc["address"], loc["coordinates"]["latitude"], loc["coordinates"]["longitude"])
+            for loc in storage_store.all()
+        ]
+        cells, fetched = await prefetch_weather(points)
+        return {"points": len(points), "cells": cells, "cells_fetched": fetched, "weather_cache": weather_cache.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error prefetching weather: {str(e)}")
@@ -0,0 +1,380 @@
+import asyncio
+import heapq
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from config import ARTICLE_INDEX_ENABLED, ARTICLE_INDEX_PATH
+from db import SQLiteConnection
+from timeutil import DAY_SECONDS, iso_timestamp, published_at, utc_day
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Recency half of the default ranking decays with this time constant
+RECENCY_DAYS = 7.0
+FACET_FIELDS = ("supplier", "category", "state", "keyword", "date")
+TAG_FIELDS = ("supplier", "category", "state")
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN.findall((text or "").lower())
+
+
+class QueryError(ValueError):
+    pass
+
+
+class _QueryParser:
+    """
+    Boolean queries over the index: words, "quoted phrases", AND / OR / NOT
+    (upper case), -word for NOT and parentheses. Adjacent terms are ANDed.
+    Parses into nested tuples: ("term", token), ("phrase", tokens),
+    ("and", a, b), ("or", a, b), ("not", a).
+    """
+
+    _LEXER = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|(-)(?=\S)|([^\s()"]+))')
+
+    def __init__(self, query):
+        self.tokens = []
+        position = 0
+        query = query.strip()
+        while position < len(query):
+            match = self._LEXER.match(query, position)
+            if match is None or match.end() == position:
+                raise QueryError(f"Unbalanced quote in query at position {position}")
+            opening, closing, phrase, minus, word = match.groups()
+            if opening:
+                self.tokens.append(("(", None))
+            elif closing:
+                self.tokens.append((")", None))
+            elif phrase is not None:
+                self.tokens.append(("phrase", phrase))
+            elif minus:
+                self.tokens.append(("NOT", None))
+            elif word in ("AND", "OR", "NOT"):
+                self.tokens.append((word, None))
+            else:
+                self.tokens.append(("word", word))
+            position = match.end()
+        self.position = 0
+
+    def parse(self):
+        if not self.tokens:
+            return None
+        tree = self._or()
+        if self.position != len(self.tokens):
+            raise QueryError("Unexpected ')' in query")
+        return tree
+
+    def _peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def _or(self):
+        tree = self._and()
+        while self._peek() == "OR":
+            self.position += 1
+            tree = ("or", tree, self._and())
+        return tree
+
+    def _and(self):
+        tree = self._unary()
+        while self._peek() not in (None, "OR", ")"):
+            if self._peek() == "AND":
+                self.position += 1
+            tree = ("and", tree, self._unary())
+        return tree
+
+    def _unary(self):
+        kind = self._peek()
+        if kind == "NOT":
+            self.position += 1
+            return ("not", self._unary())
+        if kind == "(":
+            self.position += 1
+            tree = self._or()
+            if self._peek() != ")":
+                raise QueryError("Missing ')' in query")
+            self.position += 1
+            return tree
+        if kind in ("word", "phrase"):
+            text = self.tokens[self.position][1]
+            self.position += 1
+            words = tokenize(text)
+            if not words:
+                raise QueryError(f"Nothing searchable in {text!r}")
+            # "labour-unrest" is two tokens: match them as a phrase
+            return ("term", words[0]) if len(words) == 1 else ("phrase", words)
+        raise QueryError(f"Expected a search term, got {kind or 'end of query'}")
+
+
+def parse_query(query):
+    return _QueryParser(query or "").parse()
+
+
+class ArticleIndex:
+    """
+    Inverted index over every collected article: token -> {article: positions},
+    plus facet postings (supplier, category, state, risk keyword, publish date).
+
+    Articles and their facet tags are kept in SQLite so the index survives
+    restarts; postings live in memory and are rebuilt from it on first use.
+    Before each search rows added by other processes (other web workers,
+    script.py) are loaded, so every worker answers from the same data.
+
+    An article is stored once (by URL); seeing it again for another supplier
+    only adds that supplier's tags.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = SQLiteConnection(path, schema="""
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, title TEXT, description TEXT, url TEXT,
+                source TEXT, published_at REAL, risk_score REAL, polarity REAL, sentiment TEXT,
+                keywords TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS tags (
+                article_id INTEGER NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL,
+                UNIQUE (article_id, field, value)
+            );
+        """, row_factory=sqlite3.Row, shared=True)
+        self._docs = {}
+        self._postings = defaultdict(dict)
+        self._facets = {field: defaultdict(set) for field in FACET_FIELDS}
+        self._labels = {field: {} for field in FACET_FIELDS}
+        self._last_article = 0
+        self._last_tag = 0
+
+    def add(self, entries, **tags):
+        """
+        Index (article, processed) pairs: the fetched article (title,
+        description, url, ...) and its report entry (risk keywords and score,
+        sentiment). `tags` are facet values shared by the batch: supplier,
+        category, state. Returns how many articles were new.
+        """
+        tags = {field: value for field, value in tags.items() if field in TAG_FIELDS and value}
+        added = 0
+        with self._lock:
+            with self._db.connection as conn:
+                for article, processed in entries:
+                    key = article.get("url") or article.get("title")
+                    if not key:
+                        continue
+                    source = article.get("source")
+                    if isinstance(source, dict):
+                        # Raw NewsAPI articles (script.py) carry {"id", "name"}
+                        source = source.get("name")
+                    cursor = conn.execute(
+                        """INSERT OR IGNORE INTO articles (key, title, description, url, source, published_at,
+                           risk_score, polarity, sentiment, keywords) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                        (
+                            key, article.get("title"), article.get("description"), article.get("url"),
+                            source, published_at(article), processed.get("risk_score"),
+                            processed.get("polarity_score"), processed.get("sentiment"),
+                            json.dumps(processed.get("risk_keywords") or [])
+                        )
+                    )
+                    added += cursor.rowcount
+                    article_id = conn.execute("SELECT id FROM articles WHERE key = ?", (key,)).fetchone()[0]
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO tags (article_id, field, value) VALUES (?, ?, ?)",
+                        [(article_id, field, value) for field, value in tags.items()]
+                    )
+            self._sync()
+        return added
+
+    def _facet(self, field, value, doc_id):
+        key = value.lower()
+        self._facets[field][key].add(doc_id)
+        self._labels[field].setdefault(key, value)
+
+    def _sync(self):
+        """Load articles and tags added since the last sync (by any process). Caller holds the lock."""
+        conn = self._db.connection
+        for row in conn.execute("SELECT * FROM articles WHERE id > ? ORDER BY id", (self._last_article,)):
+            doc_id = row["id"]
+            doc = dict(row)
+            doc["keywords"] = json.loads(doc["keywords"])
+            doc["tags"] = {field: [] for field in TAG_FIELDS}
+            self._docs[doc_id] = doc
+            title = tokenize(doc["title"])
+            # Description positions start past a gap, so phrases don't match across the two fields
+            words = [(position, token) for position, token in enumerate(title)]
+            words += [(len(title) + 1 + position, token) for position, token in enumerate(tokenize(doc["description"]))]
+            for position, token in words:
+                self._postings[token].setdefault(doc_id, []).append(position)
+            for keyword in doc["keywords"]:
+                self._facet("keyword", keyword, doc_id)
+            if doc["published_at"] is not None:
+                self._facet("date", utc_day(doc["published_at"]), doc_id)
+            self._last_article = doc_id
+        for row in conn.execute("SELECT rowid, * FROM tags WHERE rowid > ? ORDER BY rowid", (self._last_tag,)):
+            doc = self._docs.get(row["article_id"])
+            if doc is not None:
+                doc["tags"][row["field"]].append(row["value"])
+                self._facet(row["field"], row["value"], row["article_id"])
+            self._last_tag = row["rowid"]
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _phrase(self, words):
+        first = self._postings.get(words[0], {})
+        matches = set()
+        for doc_id, positions in first.items():
+            later = [self._postings.get(word, {}).get(doc_id) for word in words[1:]]
+            if any(p is None for p in later):
+                continue
+            later = [set(p) for p in later]
+            if any(all(start + offset + 1 in p for offset, p in enumerate(later)) for start in positions):
+                matches.add(doc_id)
+        return matches
+
+    def _evaluate(self, tree):
+        kind = tree[0]
+        if kind == "term":
+            return set(self._postings.get(tree[1], ()))
+        if kind == "phrase":
+            return self._phrase(tree[1])
+        if kind == "and":
+            # NOT on the right narrows the left side instead of building the complement
+            if tree[2][0] == "not":
+                return self._evaluate(tree[1]) - self._evaluate(tree[2][1])
+            return self._evaluate(tree[1]) & self._evaluate(tree[2])
+        if kind == "or":
+            return self._evaluate(tree[1]) | self._evaluate(tree[2])
+        return set(self._docs) - self._evaluate(tree[1])
+
+    def _score(self, doc, sort, now):
+        age_days = max(0.0, now - doc["published_at"]) / DAY_SECONDS if doc["published_at"] is not None else None
+        recency = math.exp(-age_days / RECENCY_DAYS) if age_days is not None else 0.0
+        risk = min((doc["risk_score"] or 0) / 10.0, 1.0)
+        if sort == "recency":
+            return (doc["published_at"] or 0.0, risk)
+        if sort == "risk":
+            return (risk, doc["published_at"] or 0.0)
+        return (0.5 * recency + 0.5 * risk, doc["published_at"] or 0.0)
+
+    def search(self, query="", supplier=None, category=None, state=None, keyword=None,
+               since=None, until=None, sort="score", limit=20, facet_limit=10, now=None):
+        """
+        Articles matching the boolean query and every facet filter, top `limit`
+        by `sort`: "score" (recency and risk score equally), "recency" or
+        "risk". Facet counts cover all matches. since/until are YYYY-MM-DD.
+        """
+        tree = parse_query(query)
+        now = time.time() if now is None else now
+        with self._lock:
+            self._sync()
+            matches = set(self._docs) if tree is None else self._evaluate(tree)
+            for field, value in (("supplier", supplier), ("category", category), ("state", state), ("keyword", keyword)):
+                if value:
+                    matches &= self._facets[field].get(value.lower(), set())
+            if since or until:
+                matches = {
+                    doc_id for doc_id in matches
+                    if self._docs[doc_id]["published_at"] is not None
+                    and (not since or utc_day(self._docs[doc_id]["published_at"]) >= since)
+                    and (not until or utc_day(self._docs[doc_id]["published_at"]) <= until)
+                }
+            top = heapq.nlargest(limit, matches, key=lambda doc_id: self._score(self._docs[doc_id], sort, now))
+            results = [self._result(self._docs[doc_id], sort, now) for doc_id in top]
+            facets = self._facet_counts(matches, facet_limit)
+        return {"total": len(matches), "results": results, "facets": facets}
+
+    def _result(self, doc, sort, now):
+        return {
+            "title": doc["title"],
+            "description": doc["description"],
+            "url": doc["url"],
+            "source": doc["source"],
+            "publishedAt": iso_timestamp(doc["published_at"]),
+            "risk_keywords": doc["keywords"],
+            "risk_score": doc["risk_score"],
+            "sentiment": doc["sentiment"],
+            "polarity_score": doc["polarity"],
+            "suppliers": doc["tags"]["supplier"],
+            "categories": doc["tags"]["category"],
+            "states": doc["tags"]["state"],
+            "rank_score": round(self._score(doc, "score", now)[0], 4)
+        }
+
+    def _facet_counts(self, matches, facet_limit):
+        counts = {}
+        for field in FACET_FIELDS:
+            counter = Counter()
+            for key, doc_ids in self._facets[field].items():
+                n = len(doc_ids & matches)
+                if n:
+                    counter[self._labels[field][key]] = n
+            counts[field] = [{"value": value, "count": n} for value, n in counter.most_common(facet_limit)]
+        return counts
+
+
+article_index = ArticleIndex(ARTICLE_INDEX_PATH) if ARTICLE_INDEX_ENABLED else None
+
+
+async def index_articles(articles, processed, **tags):
+    """
+    Add fetched articles and their report entries (same order) to the search
+    index in a worker thread. Indexing is a side record: failures are logged
+    and never fail the analysis.
+    """
+    if article_index is None or not articles:
+        return 0
+    try:
+        return await asyncio.to_thread(article_index.add, list(zip(articles, processed)), **tags)
+    except Exception as e:
+        logger.warning("Indexing articles failed: %s", e)
+        return 0
+
+
+@router.get("/articles/search")
+async def search_articles(
+    q: str = "",
+    supplier: Optional[str] = None,
+    category: Optional[str] = None,
+    state: Optional[str] = None,
+    keyword: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    sort: str = "score",
+    limit: int = 20
+):
+    """
+    Search every collected article locally (no news API calls).
+    q supports words, "quoted phrases", AND / OR / NOT and parentheses, e.g.
+    (flood OR strike) AND NOT "strike called off". Filter by supplier,
+    category, state, risk keyword and publish date (since/until, YYYY-MM-DD);
+    results are ranked by sort=score (recency and risk), recency or risk.
+    """
+    if article_index is None:
+        raise HTTPException(status_code=404, detail="Article search is disabled (ARTICLE_INDEX_ENABLED=false)")
+    if sort not in ("score", "recency", "risk"):
+        raise HTTPException(status_code=400, detail="sort must be one of score, recency, risk")
+    for name, value in (("since", since), ("until", until)):
+        if value is not None and not re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+            raise HTTPException(status_code=400, detail=f"{name} must be a date as YYYY-MM-DD")
+    try:
+        start = time.perf_counter()
+        result = await asyncio.to_thread(
+            article_index.search, q, supplier, category, state, keyword, since, until, sort, max(1, min(limit, 200))
+        )
+        return {"query": q, **result, "took_ms": round((time.perf_counter() - start) * 1000, 2)}
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching articles: {str(e)}")
@@ -0,0 +1,6 @@
+"""ASGI entry point for benchmark runs: the app with the stand-in sentiment backend registered."""
+import stub_model
+
+stub_model.install()
+
+from main import app  # noqa: E402
@@ -0,0 +1,75 @@
+"""
+Scaled copies of the shipped supplier and storage-location datasets.
+
+Synthetic entries reuse the shipped states, cities and categories (so category
+and weather-cell sharing look like a real fleet), get unique names/IDs and
+coordinates jittered around a shipped entry. The same size and seed always
+produce the same files.
+"""
+import json
+import random
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SHIPPED_SUPPLIERS = ROOT / "walmart_india_suppliers_final.json"
+SHIPPED_LOCATIONS = ROOT / "storage_loc.json"
+
+
+def _jitter(rng, value, spread=0.5):
+    return round(value + rng.uniform(-spread, spread), 6)
+
+
+def scale_suppliers(size=None, seed=0):
+    with open(SHIPPED_SUPPLIERS) as f:
+        shipped = json.load(f)["suppliers"]
+    if size is None or size <= len(shipped):
+        return shipped[:size] if size else shipped
+    rng = random.Random(seed)
+    suppliers = list(shipped)
+    for number in range(len(shipped), size):
+        base = rng.choice(shipped)
+        suppliers.append(dict(
+            base,
+            supplier_name=f"{base['supplier_name']} Unit {number}",
+            latitude=_jitter(rng, base["latitude"]),
+            longitude=_jitter(rng, base["longitude"])
+        ))
+    return suppliers
+
+
+def scale_locations(size=None, seed=0):
+    with open(SHIPPED_LOCATIONS) as f:
+        shipped = json.load(f)
+    if size is None or size <= len(shipped):
+        return shipped[:size] if size else shipped
+    rng = random.Random(seed)
+    categories = sorted({item for location in shipped for item in location["items"]})
+    locations = list(shipped)
+    for number in range(len(shipped), size):
+        base = rng.choice(shipped)
+        coordinates = base["coordinates"]
+        locations.append({
+            "id": number + 1,
+            "address": f"Warehouse {number + 1}, {base['address'].split(', ')[-1]}",
+            "coordinates": {
+                "latitude": _jitter(rng, coordinates["latitude"]),
+                "longitude": _jitter(rng, coordinates["longitude"])
+            },
+            "items": rng.sample(categories, k=min(3, len(categories)))
+        })
+    return locations
+
+
+def write_datasets(directory, size=None, seed=0):
+    """Write scaled datasets into directory; returns (suppliers_path, locations_path, suppliers, locations)."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    suppliers = scale_suppliers(size, seed)
+    locations = scale_locations(size, seed)
+    suppliers_path = directory / "suppliers.json"
+    locations_path = directory / "storage_loc.json"
+    with open(suppliers_path, "w") as f:
+        json.dump({"suppliers": suppliers}, f)
+    with open(locations_path, "w") as f:
+        json.dump(locations, f)
+    return suppliers_path, locations_path, suppliers, locations
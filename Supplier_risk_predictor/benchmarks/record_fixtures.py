@@ -0,0 +1,84 @@
+"""
+Refresh fixtures/ from the live GNews, OpenWeatherMap and Together APIs.
+
+Uses the API keys from the environment (.env) and a few shipped suppliers and
+categories. Review the recorded files before committing them.
+
+    python benchmarks/record_fixtures.py --suppliers 3 --categories 3
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import requests
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from config import GNEWS_API_KEY, GNEWS_ENDPOINT, WEATHER_API_KEY, WEATHER_API_URL, TOGETHER_API_URL  # noqa: E402
+from datasets import scale_suppliers, scale_locations  # noqa: E402
+from llm import INSTRUCTIONS, OBJECT_FORMAT, _headers, _payload  # noqa: E402
+
+FIXTURES_DIR = BENCH_DIR / "fixtures"
+
+
+def record_news(query):
+    response = requests.get(GNEWS_ENDPOINT, params={
+        "q": query, "token": GNEWS_API_KEY, "lang": "en", "sortby": "publishedAt", "max": 3
+    }, timeout=30)
+    response.raise_for_status()
+    return {"query": query, "response": response.json()}
+
+
+def record_weather(lat, lon):
+    response = requests.get(WEATHER_API_URL, params={
+        "lat": lat, "lon": lon, "appid": WEATHER_API_KEY, "units": "metric"
+    }, timeout=30)
+    response.raise_for_status()
+    return {"lat": lat, "lon": lon, "response": response.json()}
+
+
+def record_llm(supplier, news, weather):
+    prompt = f"""{INSTRUCTIONS}
+STRICTLY FOLLOW this JSON structure. Return only valid JSON (no extra text or formatting comments):
+
+{OBJECT_FORMAT}
+Supplier: {supplier["supplier_name"]}
+News JSON: {json.dumps({"articles": news["response"].get("articles", []), "state": supplier["state"]})}
+Road/Weather JSON: {json.dumps(weather["response"])}
+Analyze the above and return the JSON as specified.
+"""
+    response = requests.post(TOGETHER_API_URL, headers=_headers(), json=_payload(prompt, 512), timeout=120)
+    response.raise_for_status()
+    return {"supplier": supplier["supplier_name"], "response": response.json()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suppliers", type=int, default=3)
+    parser.add_argument("--categories", type=int, default=3)
+    args = parser.parse_args()
+
+    if not all([GNEWS_API_KEY, WEATHER_API_KEY, os.getenv("TOGETHER_API_KEY")]):
+        parser.error("GNEWS_API_KEY, WEATHER_API_KEY and TOGETHER_API_KEY must be set")
+
+    suppliers = scale_suppliers()[:args.suppliers]
+    categories = sorted({item for location in scale_locations() for item in location["items"]})[:args.categories]
+    news, weather, llm = [], [], []
+    for supplier in suppliers:
+        news.append(record_news(supplier["supplier_name"]))
+        weather.append(record_weather(supplier["latitude"], supplier["longitude"]))
+        llm.append(record_llm(supplier, news[-1], weather[-1]))
+    news += [record_news(category) for category in categories]
+
+    for name, entries in [("gnews.json", news), ("openweathermap.json", weather), ("together.json", llm)]:
+        with open(FIXTURES_DIR / name, "w") as f:
+            json.dump(entries, f, indent=2)
+            f.write("\n")
+        print(f"Recorded {len(entries)} entries to {FIXTURES_DIR / name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Offline benchmark for the Supplier Risk Analyzer API.
+
+Each (scale, scenario) pair gets a fresh server process in its own scratch
+directory, talking to the stub upstreams and the stand-in sentiment model, so
+results don't depend on network, API quotas or warm caches from a previous
+scenario. Latency percentiles, time to first byte, requests/sec, the server's
+peak RSS and the number of upstream calls are written to a JSON file.
+
+    python benchmarks/run.py                                  # shipped, 1000 and 10000 entries
+    python benchmarks/run.py --scales shipped --scenarios supplier_lookup,analyze_supplier
+    python benchmarks/run.py --compare output/benchmarks/previous.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from datasets import write_datasets  # noqa: E402
+from stub_upstream import StubUpstream  # noqa: E402
+
+
+def _supplier_body(supplier):
+    return {
+        "supplier_name": supplier["supplier_name"],
+        "state": supplier["state"],
+        "city": supplier["city"],
+        "category_name": supplier["category_name"]
+    }
+
+
+def _supplier_llm_body(supplier):
+    return dict(_supplier_body(supplier), latitude=supplier["latitude"], longitude=supplier["longitude"])
+
+
+# requests/concurrency are per scale; fleet scenarios run the whole dataset per request
+SCENARIOS = {
+    "supplier_lookup": {
+        "method": "GET", "path": "/api/suppliers", "requests": 200, "concurrency": 16,
+        "params": lambda supplier, location: {"state": supplier["state"]}
+    },
+    "nearest_storage": {
+        "method": "GET", "path": "/api/geo/nearest-storage", "requests": 200, "concurrency": 16,
+        "params": lambda supplier, location: {"supplier_name": supplier["supplier_name"]}
+    },
+    "analyze_supplier": {
+        "method": "POST", "path": "/api/analyze-supplier", "requests": 100, "concurrency": 8,
+        "json": lambda supplier, location: _supplier_body(supplier)
+    },
+    "analyze_supplier_llm": {
+        "method": "POST", "path": "/api/analyze-supplier-llm", "requests": 50, "concurrency": 8,
+        "json": lambda supplier, location: _supplier_llm_body(supplier)
+    },
+    "storage_demand_analysis": {
+        "method": "GET", "path": "/api/storage-demand-analysis", "requests": 1, "concurrency": 1
+    },
+    "storage_demand_analysis_stream": {
+        "method": "GET", "path": "/api/storage-demand-analysis/stream", "requests": 1, "concurrency": 1
+    },
+    "all_suppliers_llm": {
+        "method": "GET", "path": "/api/analyze-all-suppliers-llm", "requests": 1, "concurrency": 1,
+        "params": lambda supplier, location: {"incremental": "false"}
+    },
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _peak_rss_mb(pid):
+    """High-water RSS of a live process (Linux); None where /proc isn't available."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+async def _wait_ready(client, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+async def _drive(client, scenario, suppliers, locations):
+    """Send the scenario's requests; returns (latencies, ttfbs, errors, wall seconds)."""
+    semaphore = asyncio.Semaphore(scenario["concurrency"])
+    latencies, ttfbs, errors = [], [], 0
+
+    async def one(number):
+        nonlocal errors
+        supplier = suppliers[number % len(suppliers)]
+        location = locations[number % len(locations)]
+        kwargs = {}
+        if "params" in scenario:
+            kwargs["params"] = scenario["params"](supplier, location)
+        if "json" in scenario:
+            kwargs["json"] = scenario["json"](supplier, location)
+        async with semaphore:
+            start = time.perf_counter()
+            async with client.stream(scenario["method"], scenario["path"], **kwargs) as response:
+                ttfbs.append(time.perf_counter() - start)
+                await response.aread()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(number) for number in range(scenario["requests"])))
+    return latencies, ttfbs, errors, time.perf_counter() - start
+
+
+async def run_scenario(name, scenario, size, args):
+    with tempfile.TemporaryDirectory(prefix="supplier-risk-bench-") as workdir:
+        suppliers_path, locations_path, suppliers, locations = write_datasets(workdir, size, args.seed)
+        with StubUpstream(args.news_latency_ms / 1000, args.weather_latency_ms / 1000, args.llm_latency_ms / 1000) as stub:
+            port = _free_port()
+            env = dict(
+                os.environ,
+                **stub.env(),
+                PYTHONPATH=os.pathsep.join([str(BENCH_DIR), str(ROOT)]),
+                SUPPLIERS_PATH=str(suppliers_path),
+                STORAGE_LOCATIONS_PATH=str(locations_path),
+                SENTIMENT_BACKEND="stub",
+                GNEWS_API_KEY="bench", WEATHER_API_KEY="bench", TOGETHER_API_KEY="bench",
+            )
+            if not args.keep_rate_limits:
+                # Measure the pipeline rather than the production API quotas
+                env.update(GNEWS_RATE_PER_SEC="0", WEATHER_RATE_PER_SEC="0", LLM_RATE_PER_SEC="0")
+            process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "bench_app:app", "--port", str(port), "--log-level", "warning"],
+                cwd=workdir, env=env
+            )
+            try:
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout) as client:
+                    await _wait_ready(client, process)
+                    calls_before = dict(stub.counts)
+                    latencies, ttfbs, errors, wall = await _drive(client, scenario, suppliers, locations)
+                    upstream_calls = {path: stub.counts[path] - calls_before.get(path, 0) for path in stub.counts}
+                peak_rss = _peak_rss_mb(process.pid)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    return {
+        "scenario": name,
+        "endpoint": f"{scenario['method']} {scenario['path']}",
+        "scale": "shipped" if size is None else size,
+        "suppliers": len(suppliers),
+        "locations": len(locations),
+        "requests": scenario["requests"],
+        "concurrency": scenario["concurrency"],
+        "errors": errors,
+        "p50_ms": _ms(_percentile(latencies, 0.5)),
+        "p95_ms": _ms(_percentile(latencies, 0.95)),
+        "mean_ms": _ms(sum(latencies) / len(latencies)) if latencies else None,
+        "ttfb_p50_ms": _ms(_percentile(ttfbs, 0.5)),
+        "requests_per_sec": round(len(latencies) / wall, 3) if wall else None,
+        "peak_rss_mb": peak_rss,
+        "upstream_calls": upstream_calls,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_scales(text):
+    return [None if scale == "shipped" else int(scale) for scale in text.split(",")]
+
+
+def _print_table(results, baseline=None):
+    previous = {(r["scenario"], str(r["scale"])): r for r in (baseline or {}).get("results", [])}
+    print(f"{'scenario':32} {'scale':>8} {'p50 ms':>10} {'p95 ms':>10} {'req/s':>9} {'rss MB':>8}  vs baseline p95")
+    for r in results:
+        change = ""
+        before = previous.get((r["scenario"], str(r["scale"])))
+        if before and before.get("p95_ms") and r["p95_ms"] is not None:
+            change = f"{(r['p95_ms'] / before['p95_ms'] - 1) * 100:+.1f}%"
+        print(
+            f"{r['scenario']:32} {str(r['scale']):>8} {r['p50_ms'] or 0:>10.1f} {r['p95_ms'] or 0:>10.1f} "
+            f"{r['requests_per_sec'] or 0:>9.2f} {r['peak_rss_mb'] or 0:>8.1f}  {change}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="shipped,1000,10000", help="comma-separated dataset sizes; 'shipped' is the bundled JSON")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--news-latency-ms", type=float, default=20)
+    parser.add_argument("--weather-latency-ms", type=float, default=10)
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--keep-rate-limits", action="store_true", help="keep the configured upstream rate limits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=1800, help="per-request timeout in seconds")
+    parser.add_argument("--output", default=None, help="results file (default output/benchmarks/benchmark-<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare p95 against")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    started = datetime.utcnow()
+    results = []
+    for size in _parse_scales(args.scales):
+        for name in args.scenarios.split(","):
+            print(f"Running {name} at scale {size or 'shipped'}...", flush=True)
+            results.append(asyncio.run(run_scenario(name, SCENARIOS[name], size, args)))
+
+    report = {
+        "generatedAt": started.isoformat() + "Z",
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "results": results,
+    }
+    output = Path(args.output or f"output/benchmarks/benchmark-{started.strftime('%Y%m%dT%H%M%SZ')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print_table(results, baseline)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
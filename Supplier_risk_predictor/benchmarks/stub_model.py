@@ -0,0 +1,46 @@
+"""
+Deterministic stand-in for the DistilBERT sentiment model.
+
+Scores come from a small keyword lexicon, so runs are reproducible and need
+no model download. An optional per-batch and per-text sleep imitates the cost
+of a real forward pass so batching and queueing still show up in the numbers.
+"""
+import os
+import re
+import time
+
+NEGATIVE = {
+    "strike", "flood", "flooding", "halt", "halted", "disrupts", "delays", "delayed", "decline", "slips",
+    "weak", "shortage", "heatwave", "threaten", "warnings", "loss", "fire", "protest", "shutdown",
+}
+POSITIVE = {
+    "rise", "record", "growth", "strong", "expand", "launches", "high", "eases", "better", "stronger",
+    "cools", "investment", "demand", "profit",
+}
+WORD = re.compile(r"[a-z']+")
+
+# Simulated inference cost, in milliseconds
+BATCH_OVERHEAD_MS = float(os.getenv("BENCH_MODEL_BATCH_MS", "5"))
+PER_TEXT_MS = float(os.getenv("BENCH_MODEL_TEXT_MS", "2"))
+
+
+class LexiconBackend:
+    """Same interface as models.TransformersBackend: predict(texts) -> [{"label", "score"}]."""
+
+    def predict(self, texts):
+        time.sleep((BATCH_OVERHEAD_MS + PER_TEXT_MS * len(texts)) / 1000)
+        results = []
+        for text in texts:
+            words = WORD.findall(text.lower())
+            balance = sum(word in POSITIVE for word in words) - sum(word in NEGATIVE for word in words)
+            # Confidence grows with the keyword balance and stays in the model's 0.5-1.0 range
+            score = min(0.99, 0.6 + 0.1 * abs(balance))
+            results.append({"label": "NEGATIVE" if balance < 0 else "POSITIVE", "score": score})
+        return results
+
+
+def install():
+    """Register the stand-in as the "stub" sentiment backend."""
+    import models
+
+    models.BACKENDS["stub"] = LexiconBackend
@@ -0,0 +1,174 @@
+"""
+Local stand-in for GNews, OpenWeatherMap and Together that replays the
+recorded responses in fixtures/.
+
+Queries that were recorded are answered verbatim. Anything else (e.g. the
+synthetic suppliers of a scaled dataset) gets a recorded response picked by a
+stable hash, with the recorded name swapped for the requested one, so every
+supplier sees distinct article text and the sentiment cache behaves like it
+would against the real APIs. Each upstream sleeps for a configurable latency.
+"""
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+NEWS_PATH = "/gnews/search"
+WEATHER_PATH = "/weather"
+LLM_PATH = "/together/chat/completions"
+
+
+def _load(name):
+    with open(FIXTURES_DIR / name) as f:
+        return json.load(f)
+
+
+def _pick(entries, key):
+    return entries[zlib.crc32(key.encode("utf-8")) % len(entries)]
+
+
+def _substitute(value, old, new):
+    """Replace a recorded name with the requested one throughout a JSON value."""
+    if isinstance(value, str):
+        return value.replace(old, new)
+    if isinstance(value, list):
+        return [_substitute(item, old, new) for item in value]
+    if isinstance(value, dict):
+        return {key: _substitute(item, old, new) for key, item in value.items()}
+    return value
+
+
+class Fixtures:
+    def __init__(self):
+        self.news = _load("gnews.json")
+        self.weather = _load("openweathermap.json")
+        self.llm = _load("together.json")
+        self._news_by_query = {entry["query"].lower(): entry["response"] for entry in self.news}
+        self._llm_by_supplier = {entry["supplier"].lower(): entry["response"] for entry in self.llm}
+
+    def news_response(self, query):
+        if query.lower() in self._news_by_query:
+            return self._news_by_query[query.lower()]
+        # Recorded empty results stay empty for the queries they were recorded for only
+        entry = _pick([e for e in self.news if e["response"]["articles"]], query)
+        return _substitute(entry["response"], entry["query"], query)
+
+    def weather_response(self, lat, lon):
+        return _pick(self.weather, f"{round(lat, 2)}:{round(lon, 2)}")["response"]
+
+    def llm_report(self, supplier):
+        response = self._llm_by_supplier.get(supplier.lower())
+        if response is None:
+            entry = _pick(self.llm, supplier)
+            response = _substitute(entry["response"], entry["supplier"], supplier)
+        return json.loads(response["choices"][0]["message"]["content"])
+
+    def llm_response(self, suppliers):
+        content = json.dumps(self.llm_report(suppliers[0]) if len(suppliers) == 1 else [
+            self.llm_report(supplier) for supplier in suppliers
+        ], indent=2)
+        return {
+            "id": "bench",
+            "object": "chat.completion",
+            "model": self.llm[0]["response"]["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}]
+        }
+
+
+class StubUpstream:
+    """Threaded HTTP server for the three upstreams; latencies are in seconds per request."""
+
+    def __init__(self, news_latency=0.0, weather_latency=0.0, llm_latency=0.0, port=0):
+        fixtures = Fixtures()
+        latencies = {NEWS_PATH: news_latency, WEATHER_PATH: weather_latency, LLM_PATH: llm_latency}
+        counts = self.counts = {path: 0 for path in latencies}
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _begin(self):
+                path = urlsplit(self.path).path
+                with lock:
+                    counts[path] = counts.get(path, 0) + 1
+                time.sleep(latencies.get(path, 0.0))
+                return path
+
+            def _send_json(self, body, status=200):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                path = self._begin()
+                query = parse_qs(urlsplit(self.path).query)
+                if path == NEWS_PATH:
+                    self._send_json(fixtures.news_response(query.get("q", [""])[0]))
+                elif path == WEATHER_PATH:
+                    self._send_json(fixtures.weather_response(float(query["lat"][0]), float(query["lon"][0])))
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                path = self._begin()
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if path != LLM_PATH:
+                    self._send_json({"error": "not found"}, 404)
+                    return
+                suppliers = re.findall(r"^Supplier: (.+)$", body["messages"][-1]["content"], re.MULTILINE)
+                response = fixtures.llm_response(suppliers or ["Unknown supplier"])
+                if body.get("stream"):
+                    self._stream(response["choices"][0]["message"]["content"])
+                else:
+                    self._send_json(response)
+
+            def _stream(self, content):
+                # OpenAI-compatible server-sent events, a few characters per delta like a real token stream
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = [
+                    {"choices": [{"index": 0, "delta": {"content": content[i:i + 16]}}]}
+                    for i in range(0, len(content), 16)
+                ]
+                for event in events:
+                    self._chunk(f"data: {json.dumps(event)}\n\n")
+                self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, text):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def env(self):
+        """Settings that point the app at this server."""
+        return {
+            "GNEWS_ENDPOINT": self.url + NEWS_PATH,
+            "WEATHER_API_URL": self.url + WEATHER_PATH,
+            "TOGETHER_API_URL": self.url + LLM_PATH,
+        }
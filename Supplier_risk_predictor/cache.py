@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from db import SQLiteConnection
+
+logger = logging.getLogger(__name__)
+
+
+def _entry_size(key, value):
+    # Rough footprint: the serialized value is what dominates for API payloads
+    return len(key) + len(json.dumps(value, default=str))
+
+
+class MemoryLRU:
+    """In-memory cache with per-entry TTL and LRU eviction bounded by approximate bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                self.current_bytes -= size
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, expires_at):
+        size = _entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            self._entries[key] = (value, expires_at, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteStore:
+    """On-disk key/value tier that survives restarts; values are stored as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = SQLiteConnection(
+            path, schema="CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.connection.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False, None, None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            with self._lock, self._db.connection as conn:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return False, None, None
+        return True, json.loads(value), expires_at
+
+    def set(self, key, value, expires_at):
+        with self._lock, self._db.connection as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), expires_at)
+            )
+
+    def purge_expired(self):
+        with self._lock, self._db.connection as conn:
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class Cache:
+    """
+    Memory LRU in front of an optional SQLite tier, with request coalescing:
+    concurrent misses for the same key share a single call to the fetch function.
+
+    The async path never touches SQLite on the event loop: disk reads run in a
+    worker thread and disk writes are queued behind the response (write-behind).
+    The sync get/set are for callers already running off the loop.
+    """
+
+    def __init__(self, ttl, max_bytes, disk_path=None):
+        self.ttl = ttl
+        self.memory = MemoryLRU(max_bytes)
+        self.disk = SQLiteStore(disk_path) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._inflight = {}
+        self._pending_writes = set()
+
+    def _record(self, found):
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def get(self, key):
+        found, value = self.memory.get(key)
+        if not found and self.disk is not None:
+            found, value, expires_at = self.disk.get(key)
+            if found:
+                self.disk_hits += 1
+                self.memory.set(key, value, expires_at)
+        self._record(found)
+        return found, value
+
+    async def aget(self, key):
+        """Like get, but the disk tier is read in a worker thread."""
+        found, value = self.memory.get(key)
+        if not found and self.disk is not None:
+            found, value, expires_at = await asyncio.to_thread(self.disk.get, key)
+            if found:
+                self.disk_hits += 1
+                self.memory.set(key, value, expires_at)
+        self._record(found)
+        return found, value
+
+    def _expires_at(self, ttl):
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() + ttl if ttl else None
+
+    def set(self, key, value, ttl=None):
+        expires_at = self._expires_at(ttl)
+        self.memory.set(key, value, expires_at)
+        if self.disk is not None:
+            self.disk.set(key, value, expires_at)
+
+    def set_nowait(self, key, value, ttl=None):
+        """Store in memory now and queue the disk write to a worker thread (must be called on the loop)."""
+        expires_at = self._expires_at(ttl)
+        self.memory.set(key, value, expires_at)
+        if self.disk is not None:
+            write = asyncio.ensure_future(asyncio.to_thread(self.disk.set, key, value, expires_at))
+            self._pending_writes.add(write)
+            write.add_done_callback(self._write_done)
+
+    def _write_done(self, write):
+        self._pending_writes.discard(write)
+        if not write.cancelled() and write.exception() is not None:
+            logger.warning("Cache disk write failed: %s", write.exception())
+
+    async def flush(self):
+        """Wait for queued disk writes."""
+        if self._pending_writes:
+            await asyncio.gather(*list(self._pending_writes), return_exceptions=True)
+
+    async def _fetch_and_store(self, key, fetch, should_cache):
+        value = await fetch()
+        if should_cache is None or should_cache(value):
+            self.set_nowait(key, value)
+        return value
+
+    async def get_or_fetch(self, key, fetch, should_cache=None):
+        """
+        Return the cached value for key, or await fetch() once and cache its result.
+
+        The fetch runs in its own task that every caller (including the first)
+        awaits through a shield, so one caller being cancelled never cancels
+        the others; the fetch itself is only cancelled once no caller is left.
+        """
+        found, value = await self.aget(key)
+        if found:
+            return value
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch, should_cache))
+            entry = self._inflight[key] = {"task": task, "waiters": 0}
+            task.add_done_callback(lambda done, entry=entry: self._fetch_done(key, entry, done))
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["task"])
+        finally:
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0 and not entry["task"].done():
+                entry["task"].cancel()
+
+    def _fetch_done(self, key, entry, task):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        # Mark retrieved so an error whose callers all left isn't reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+            "bytes": self.memory.current_bytes
+        }
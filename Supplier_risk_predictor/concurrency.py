@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from config import (
+    FANOUT_MAX_CONCURRENCY,
+    GNEWS_MAX_CONCURRENCY, GNEWS_RATE_PER_SEC, GNEWS_BURST,
+    WEATHER_MAX_CONCURRENCY, WEATHER_RATE_PER_SEC, WEATHER_BURST,
+    LLM_MAX_CONCURRENCY, LLM_RATE_PER_SEC, LLM_BURST,
+)
+
+
+class TokenBucket:
+    """
+    Async token bucket: refills at `rate` tokens per second and holds at most
+    `capacity` tokens, so short bursts go through immediately while the
+    sustained request rate stays within the upstream quota.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class UpstreamLimiter:
+    """Caps in-flight calls and request rate for a single upstream API."""
+
+    def __init__(self, name, max_concurrency, rate_per_sec, burst):
+        self.name = name
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._bucket = TokenBucket(rate_per_sec, burst)
+
+    async def run(self, func, *args, **kwargs):
+        """Call func under this API's limits; blocking functions run in a worker thread."""
+        async with self._semaphore:
+            await self._bucket.acquire()
+            if asyncio.iscoroutinefunction(func):
+                return await func(*args, **kwargs)
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+
+gnews_limiter = UpstreamLimiter("gnews", GNEWS_MAX_CONCURRENCY, GNEWS_RATE_PER_SEC, GNEWS_BURST)
+weather_limiter = UpstreamLimiter("weather", WEATHER_MAX_CONCURRENCY, WEATHER_RATE_PER_SEC, WEATHER_BURST)
+llm_limiter = UpstreamLimiter("llm", LLM_MAX_CONCURRENCY, LLM_RATE_PER_SEC, LLM_BURST)
+
+
+async def map_bounded(func, items, limit=FANOUT_MAX_CONCURRENCY):
+    """Await func(item) for every item with at most `limit` running at once, results in input order."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(item):
+        async with semaphore:
+            return await func(item)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+async def iter_bounded(func, items, limit=FANOUT_MAX_CONCURRENCY):
+    """
+    Like map_bounded, but yields (index, result) pairs as they complete so callers
+    can stream results out instead of waiting for the slowest item. Items start in
+    input order; closing the iterator early cancels whatever is still pending.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(index, item):
+        async with semaphore:
+            return index, await func(item)
+
+    tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
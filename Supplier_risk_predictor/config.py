@@ -4,8 +4,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 GNEWS_API_KEY = os.getenv("GNEWS_API_KEY")
-GNEWS_ENDPOINT = "https://gnews.io/api/v4/search"
+GNEWS_ENDPOINT = os.getenv("GNEWS_ENDPOINT", "https://gnews.io/api/v4/search")
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.openweathermap.org/data/2.5/weather")
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 NEWS_ENDPOINT = "https://newsapi.org/v2/everything"
 
@@ -17,3 +18,151 @@ RISK_KEYWORDS = [
     "political instability", "commodity price hike", "drought",
     "heatwave", "strike notice", "legal action"
 ]
+
+# Sentiment micro-batching: concurrent requests are grouped into one forward pass
+SENTIMENT_MAX_BATCH_SIZE = int(os.getenv("SENTIMENT_MAX_BATCH_SIZE", "32"))
+SENTIMENT_MAX_WAIT_MS = float(os.getenv("SENTIMENT_MAX_WAIT_MS", "10"))
+
+# Fan-out across suppliers/locations and per-upstream limits (requests per second, burst size)
+FANOUT_MAX_CONCURRENCY = int(os.getenv("FANOUT_MAX_CONCURRENCY", "16"))
+GNEWS_MAX_CONCURRENCY = int(os.getenv("GNEWS_MAX_CONCURRENCY", "8"))
+GNEWS_RATE_PER_SEC = float(os.getenv("GNEWS_RATE_PER_SEC", "2"))
+GNEWS_BURST = float(os.getenv("GNEWS_BURST", "10"))
+WEATHER_MAX_CONCURRENCY = int(os.getenv("WEATHER_MAX_CONCURRENCY", "8"))
+WEATHER_RATE_PER_SEC = float(os.getenv("WEATHER_RATE_PER_SEC", "1"))
+WEATHER_BURST = float(os.getenv("WEATHER_BURST", "10"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_RATE_PER_SEC = float(os.getenv("LLM_RATE_PER_SEC", "2"))
+LLM_BURST = float(os.getenv("LLM_BURST", "4"))
+
+# News cache: per-query TTL, memory bound for the LRU tier, optional SQLite tier ("memory" or "sqlite")
+NEWS_CACHE_TTL_SECONDS = float(os.getenv("NEWS_CACHE_TTL_SECONDS", "900"))
+NEWS_CACHE_MAX_BYTES = int(os.getenv("NEWS_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+NEWS_CACHE_BACKEND = os.getenv("NEWS_CACHE_BACKEND", "memory")
+NEWS_CACHE_PATH = os.getenv("NEWS_CACHE_PATH", "cache/news_cache.sqlite3")
+
+# Shared async HTTP client: timeouts, per-host connection pool and retry with jittered backoff
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE_SECONDS = float(os.getenv("HTTP_BACKOFF_BASE_SECONDS", "0.5"))
+HTTP_BACKOFF_MAX_SECONDS = float(os.getenv("HTTP_BACKOFF_MAX_SECONDS", "10"))
+
+# Other forms that count as each risk keyword. Listed rather than derived: rule-made
+# forms such as "striking" or "fired" usually mean something else in business news
+RISK_KEYWORD_INFLECTIONS = {
+    "strike": ["strikes", "strikers"],
+    "protest": ["protests", "protested", "protesting", "protesters", "protestors"],
+    "shutdown": ["shutdowns"],
+    "fire": ["fires"],
+    "flood": ["floods", "flooded", "flooding"],
+    "curfew": ["curfews"],
+    "roadblock": ["roadblocks"],
+    "cyclone": ["cyclones"],
+    "factory accident": ["factory accidents"],
+    "supply chain disruption": ["supply chain disruptions"],
+    "riot": ["riots", "rioting", "rioters"],
+    "earthquake": ["earthquakes"],
+    "landslide": ["landslides"],
+    "drought": ["droughts"],
+    "heatwave": ["heatwaves"],
+    "strike notice": ["strike notices"],
+    "legal action": ["legal actions"],
+}
+
+# Optional per-keyword weights for risk scoring, e.g. RISK_KEYWORD_WEIGHTS="flood=2,strike notice=3";
+# keywords not listed weigh 1
+RISK_KEYWORD_WEIGHTS = {
+    " ".join(keyword.lower().split()): float(weight)
+    for keyword, _, weight in (
+        item.partition("=") for item in os.getenv("RISK_KEYWORD_WEIGHTS", "").split(",") if item.strip()
+    )
+}
+
+# Sentiment result cache keyed by model id + text hash; TTL 0 keeps entries until evicted
+SENTIMENT_CACHE_TTL_SECONDS = float(os.getenv("SENTIMENT_CACHE_TTL_SECONDS", "0"))
+SENTIMENT_CACHE_MAX_BYTES = int(os.getenv("SENTIMENT_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+SENTIMENT_CACHE_BACKEND = os.getenv("SENTIMENT_CACHE_BACKEND", "sqlite")
+SENTIMENT_CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", "cache/sentiment_cache.sqlite3")
+
+# Load the sentiment model in the background at startup; when off, it loads on first use
+SENTIMENT_WARMUP = os.getenv("SENTIMENT_WARMUP", "true").lower() in ("1", "true", "yes")
+
+# Sentiment inference backend: "transformers" (PyTorch) or "onnx" (INT8-quantized ONNX Runtime)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "transformers")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "cache/onnx/distilbert-sst2")
+
+# How web workers share the model: "process" (one per worker), "preload" (loaded before
+# forking, shared copy-on-write) or "sidecar" (one inference process over a Unix socket)
+SENTIMENT_SERVING = os.getenv("SENTIMENT_SERVING", "process")
+SENTIMENT_SIDECAR_SOCKET = os.getenv("SENTIMENT_SIDECAR_SOCKET", "cache/sentiment.sock")
+SENTIMENT_SIDECAR_TIMEOUT_SECONDS = float(os.getenv("SENTIMENT_SIDECAR_TIMEOUT_SECONDS", "120"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Inference governance: threads running forward passes, texts allowed to wait for one
+# (new requests get 503 beyond that) and torch thread pools per forward pass. 0 intra-op
+# threads splits the cores between web workers and inference threads so they don't oversubscribe
+SENTIMENT_INFERENCE_THREADS = int(os.getenv("SENTIMENT_INFERENCE_THREADS", "1"))
+SENTIMENT_QUEUE_MAX = int(os.getenv("SENTIMENT_QUEUE_MAX", "256"))
+TORCH_INTRA_OP_THREADS = int(os.getenv("TORCH_INTRA_OP_THREADS", "0"))
+TORCH_INTER_OP_THREADS = int(os.getenv("TORCH_INTER_OP_THREADS", "1"))
+
+# Datasets, loaded once and reloaded when the file changes
+SUPPLIERS_PATH = os.getenv("SUPPLIERS_PATH", "walmart_india_suppliers_final.json")
+STORAGE_LOCATIONS_PATH = os.getenv("STORAGE_LOCATIONS_PATH", "storage_loc.json")
+
+# Cell size of the lat/lon grid used for spatial queries (1 degree is roughly 111 km)
+GEO_GRID_CELL_DEGREES = float(os.getenv("GEO_GRID_CELL_DEGREES", "1.0"))
+
+# Weather is fetched per grid cell (0.25 degrees is roughly 28 km) and cached to match OpenWeatherMap's update interval
+WEATHER_GRID_DEGREES = float(os.getenv("WEATHER_GRID_DEGREES", "0.25"))
+WEATHER_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "600"))
+WEATHER_CACHE_MAX_BYTES = int(os.getenv("WEATHER_CACHE_MAX_BYTES", str(1024 * 1024)))
+
+# Together chat completions; LLM_BATCH_SIZE > 1 packs that many suppliers into one streamed prompt
+TOGETHER_API_URL = os.getenv("TOGETHER_API_URL", "https://api.together.xyz/v1/chat/completions")
+LLM_MODEL = os.getenv("LLM_MODEL", "mistralai/Mistral-7B-Instruct-v0.1")
+LLM_MAX_TOKENS_PER_SUPPLIER = int(os.getenv("LLM_MAX_TOKENS_PER_SUPPLIER", "512"))
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "1"))
+LLM_BATCH_MAX_TOKENS = int(os.getenv("LLM_BATCH_MAX_TOKENS", "4096"))
+LLM_BATCH_MAX_RETRIES = int(os.getenv("LLM_BATCH_MAX_RETRIES", "1"))
+
+# Incremental runs: scored articles retained per supplier and where run state is kept
+INCREMENTAL_MAX_ARTICLES = int(os.getenv("INCREMENTAL_MAX_ARTICLES", "10"))
+INCREMENTAL_LLM_STATE_PATH = os.getenv("INCREMENTAL_LLM_STATE_PATH", "output/all_suppliers_llm_state.json")
+INCREMENTAL_SCRIPT_STATE_PATH = os.getenv("INCREMENTAL_SCRIPT_STATE_PATH", "output/supplier_risk_state.json")
+
+# Background jobs for the long full-fleet analyses: SQLite store and how many run at once
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "output/jobs.sqlite3")
+JOB_MAX_CONCURRENCY = int(os.getenv("JOB_MAX_CONCURRENCY", "1"))
+
+# Report files: "indent" (like json.dump indent=2) or "compact"; orjson is used when installed.
+# REPORT_STORE "files" rewrites output/supplier_<name>_analysis.json per request,
+# "partitioned" appends every report to REPORT_STORE_PATH/<date>/<supplier>.ndjson
+REPORT_JSON_FORMAT = os.getenv("REPORT_JSON_FORMAT", "indent")
+REPORT_STORE = os.getenv("REPORT_STORE", "files")
+REPORT_STORE_PATH = os.getenv("REPORT_STORE_PATH", "output/reports")
+
+# Risk history: every article score and verdict is appended here and rolled up per
+# supplier/state/category (7/30-day EWMA polarity, keyword counts, risk-level changes)
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "true").lower() in ("1", "true", "yes")
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "output/history.sqlite3")
+
+# Article search: every collected article is indexed (supplier/category/state/keyword/date
+# facets) for /api/articles/search; the SQLite file lets the index survive restarts
+ARTICLE_INDEX_ENABLED = os.getenv("ARTICLE_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+ARTICLE_INDEX_PATH = os.getenv("ARTICLE_INDEX_PATH", "output/article_index.sqlite3")
+
+# Near-duplicate articles: MinHash over title+description word shingles with LSH banding.
+# Articles at or above DEDUP_THRESHOLD estimated Jaccard similarity share a cluster and are
+# scored once; DEDUP_NUM_PERM must be a multiple of DEDUP_BANDS (changing it starts new clusters)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_DB_PATH = os.getenv("DEDUP_DB_PATH", "output/dedup.sqlite3")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "3"))
+DEDUP_RETENTION_DAYS = float(os.getenv("DEDUP_RETENTION_DAYS", "30"))
@@ -0,0 +1,51 @@
+"""
+Fixtures shared by the tests: a fixed clock, and factories for articles as
+fetched from the news API and as scored into report entries, dated relative
+to that clock.
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from timeutil import DAY_SECONDS
+
+NOW = datetime(2024, 6, 30, 12, tzinfo=timezone.utc).timestamp()
+
+
+def _published(days_ago):
+    return datetime.fromtimestamp(NOW - days_ago * DAY_SECONDS, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@pytest.fixture
+def now():
+    """The time stores are queried at; factory articles are dated days before it."""
+    return NOW
+
+
+@pytest.fixture
+def fetched_article():
+    def make(url, title, description="", days_ago=0):
+        return {
+            "title": title,
+            "description": description,
+            "url": url,
+            "publishedAt": _published(days_ago),
+            "source": "Example News"
+        }
+    return make
+
+
+@pytest.fixture
+def scored_article():
+    def make(url, polarity=-0.5, days_ago=0, keywords=(), title=None, risk_score=None):
+        return {
+            "title": title or f"Story {url}",
+            "url": url,
+            "publishedAt": _published(days_ago),
+            "risk_keywords": list(keywords),
+            "risk_score": 2 * len(keywords) if risk_score is None else risk_score,
+            "sentiment": "Negative" if polarity < 0 else "Positive",
+            "polarity_score": polarity
+        }
+    return make
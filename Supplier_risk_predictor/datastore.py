@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from config import SUPPLIERS_PATH, STORAGE_LOCATIONS_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def _key(value):
+    return " ".join(str(value).split()).lower()
+
+
+class IndexedDataset:
+    """
+    A JSON dataset loaded once and indexed by selected fields.
+
+    The file's mtime is checked on access and the records and indexes are
+    rebuilt when it changes, so edits to the JSON are picked up without a
+    restart while lookups stay dictionary hits.
+    """
+
+    def __init__(self, path, extract, fields, unique_field=None):
+        # extract: parsed JSON -> list of records
+        # fields: index name -> function(record) returning a value or a list of values
+        self.path = path
+        self.extract = extract
+        self.fields = fields
+        self.unique_field = unique_field
+        self._mtime = None
+        self._records = []
+        self._indexes = {}
+        self._unique = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with open(self.path, "r") as f:
+            records = self.extract(json.load(f))
+        indexes = {name: defaultdict(list) for name in self.fields}
+        for position, record in enumerate(records):
+            for name, get_values in self.fields.items():
+                values = get_values(record)
+                if not isinstance(values, (list, tuple, set)):
+                    values = [values]
+                for value in {_key(v) for v in values if v not in (None, "")}:
+                    indexes[name][value].append(position)
+        unique = {}
+        if self.unique_field:
+            unique = {record[self.unique_field]: record for record in records}
+        self._records, self._indexes, self._unique = records, indexes, unique
+
+    def _refresh(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        self._load()
+                    except (OSError, ValueError, KeyError) as e:
+                        # Keep serving the last good copy if the file is mid-write
+                        if self._mtime is None:
+                            raise
+                        logger.warning("Reload of %s failed, keeping previous data: %s", self.path, e)
+                        return
+                    self._mtime = mtime
+
+    def all(self):
+        self._refresh()
+        return self._records
+
+    def get(self, value):
+        """Look up a record by the unique field (e.g. a storage location id)."""
+        self._refresh()
+        return self._unique.get(value)
+
+    def query(self, **filters):
+        """Records matching every given field filter (case-insensitive); None filters are ignored."""
+        self._refresh()
+        filters = {name: value for name, value in filters.items() if value not in (None, "")}
+        if not filters:
+            return list(self._records)
+        unknown = set(filters) - set(self._indexes)
+        if unknown:
+            raise ValueError(f"Unsupported filter(s): {', '.join(sorted(unknown))}")
+        # Intersect starting from the smallest posting list
+        postings = sorted(
+            (self._indexes[name].get(_key(value), []) for name, value in filters.items()),
+            key=len
+        )
+        positions = set(postings[0])
+        for posting in postings[1:]:
+            positions.intersection_update(posting)
+        return [self._records[position] for position in sorted(positions)]
+
+    def values(self, field):
+        """Distinct indexed values of a field with their record counts."""
+        self._refresh()
+        return {value: len(positions) for value, positions in self._indexes[field].items()}
+
+
+def _address_part(record, index):
+    # Addresses end in "..., <city>, <state>"
+    parts = [part.strip() for part in record.get("address", "").split(",")]
+    return parts[index] if len(parts) >= abs(index) else None
+
+def location_state(location):
+    return _address_part(location, -1)
+
+def location_city(location):
+    return _address_part(location, -2)
+
+
+supplier_store = IndexedDataset(
+    SUPPLIERS_PATH,
+    extract=lambda data: data["suppliers"],
+    fields={
+        "name": lambda s: s.get("supplier_name"),
+        "state": lambda s: s.get("state"),
+        "city": lambda s: s.get("city"),
+        "category": lambda s: s.get("category_name"),
+    }
+)
+
+storage_store = IndexedDataset(
+    STORAGE_LOCATIONS_PATH,
+    extract=lambda data: data,
+    fields={
+        "state": location_state,
+        "city": location_city,
+        "category": lambda loc: loc.get("items", []),
+    },
+    unique_field="id"
+)
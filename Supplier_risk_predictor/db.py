@@ -0,0 +1,69 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class SQLiteConnection:
+    """
+    The SQLite connection behind one of the on-disk stores (cache tier, jobs,
+    history, article index, near-duplicate clusters).
+
+    Nothing touches the disk until the first query: the directory and file
+    are created and `schema` (then `setup(conn)`, for migrations) is run on
+    first use, so importing a module that defines a store writes nothing.
+
+    A connection must not be shared across fork(), so the connection is per
+    process: a worker forked after the parent used it opens its own. Callers
+    serialise access within a process with their own lock.
+
+    shared=True is for files several worker processes write at once: WAL
+    journaling, and a busy timeout instead of failing on a locked database.
+    """
+
+    def __init__(self, path, schema=None, setup=None, row_factory=None, shared=False):
+        self.path = path
+        self.schema = schema
+        self.setup = setup
+        self.row_factory = row_factory
+        self.shared = shared
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        if self._pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            if self.row_factory is not None:
+                connection.row_factory = self.row_factory
+            if self.shared:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA busy_timeout=5000")
+            if self.schema:
+                connection.executescript(self.schema)
+            if self.setup is not None:
+                with connection:
+                    self.setup(connection)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    @contextmanager
+    def transaction(self):
+        """
+        A transaction that takes the write lock up front, so a read-modify-write
+        can't interleave with another process's.
+        """
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection, self._pid = None, None
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+from config import (
+    DEDUP_ENABLED, DEDUP_DB_PATH, DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE,
+    DEDUP_RETENTION_DAYS
+)
+from db import SQLiteConnection
+from metrics import DUPLICATE_ARTICLES, stage_timer
+from timeutil import DAY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes; p is the smallest prime above 2**32
+_PRIME = np.uint64(4294967311)
+_TOKEN = re.compile(r"\w+")
+
+
+def _shingle_text(article):
+    return f"{article.get('title') or ''} {article.get('description') or ''}"
+
+
+def shingles(text, size=DEDUP_SHINGLE_SIZE):
+    """Word `size`-grams of the normalized text; a text shorter than that is one shingle."""
+    tokens = _TOKEN.findall(text.lower())
+    if not tokens:
+        return set()
+    if len(tokens) <= size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash signatures: for each of num_perm hash functions, the minimum hash
+    over a text's shingles. The fraction of equal positions in two signatures
+    estimates the Jaccard similarity of the shingle sets.
+
+    The hash functions come from a fixed seed, so signatures stored by one
+    process or run compare with those computed by any other.
+    """
+
+    def __init__(self, num_perm=DEDUP_NUM_PERM, seed=1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = generator.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return None
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingle_set),
+            dtype=np.uint64, count=len(shingle_set)
+        )
+        # a, x < 2**32 so a * x + b stays below 2**64
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(first == second))
+
+
+class NearDuplicateIndex:
+    """
+    Clusters of near-identical articles (syndicated copies of one story under
+    different URLs and outlets), kept in SQLite so clusters span suppliers,
+    runs and worker processes.
+
+    Signatures are split into `bands` bands; articles sharing any band's
+    bucket are candidates, and a candidate whose estimated Jaccard similarity
+    over title+description shingles reaches `threshold` joins its cluster.
+    Each cluster keeps the content of its first article, which is what gets
+    scored for every copy, so copies never reach the model on their own.
+    Clusters not seen for `retention_days` are dropped.
+    """
+
+    def __init__(self, path, threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM, bands=DEDUP_BANDS,
+                 retention_days=DEDUP_RETENTION_DAYS):
+        if num_perm % bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({num_perm}) must be a multiple of DEDUP_BANDS ({bands})")
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.retention = retention_days * DAY_SECONDS
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        self._db = SQLiteConnection(path, schema="""
+            CREATE TABLE IF NOT EXISTS clusters (
+                id TEXT PRIMARY KEY, signature BLOB NOT NULL, content TEXT NOT NULL,
+                created_at REAL NOT NULL, last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS clusters_by_last_seen ON clusters (last_seen);
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL, bucket INTEGER NOT NULL, cluster_id TEXT NOT NULL,
+                PRIMARY KEY (band, bucket, cluster_id)
+            );
+            CREATE INDEX IF NOT EXISTS buckets_by_cluster ON buckets (cluster_id);
+        """, shared=True)
+
+    def _buckets(self, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            yield band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True)
+
+    def _match(self, conn, signature, buckets):
+        candidates = set()
+        for band, bucket in buckets:
+            candidates.update(
+                row[0] for row in conn.execute(
+                    "SELECT cluster_id FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+                )
+            )
+        best, best_similarity = None, self.threshold
+        for cluster_id in candidates:
+            row = conn.execute("SELECT signature, content FROM clusters WHERE id = ?", (cluster_id,)).fetchone()
+            if row is None:
+                continue
+            stored = np.frombuffer(row[0], dtype=np.uint64)
+            # Signatures from a different DEDUP_NUM_PERM are not comparable
+            if len(stored) == len(signature) and (score := similarity(stored, signature)) >= best_similarity:
+                best, best_similarity = (cluster_id, row[1]), score
+        return best
+
+    def assign(self, articles, contents, now=None):
+        """
+        (cluster_id, content) per article: the cluster it joins, or a new one
+        it starts, and the content scored for that cluster. Copies within
+        one batch cluster together too. Articles with no title or
+        description text stay unclustered (cluster_id None, own content).
+        """
+        now = time.time() if now is None else now
+        with stage_timer("dedup"):
+            signatures = [self.hasher.signature(shingles(_shingle_text(article))) for article in articles]
+        assigned = []
+        with self._lock, self._db.transaction() as conn:
+            if now - self._pruned_at > 3600:
+                self._prune(conn, now)
+            for article, content, signature in zip(articles, contents, signatures):
+                if signature is None:
+                    assigned.append((None, content))
+                    continue
+                buckets = list(self._buckets(signature))
+                match = self._match(conn, signature, buckets)
+                if match is not None:
+                    conn.execute("UPDATE clusters SET last_seen = ? WHERE id = ?", (now, match[0]))
+                    DUPLICATE_ARTICLES.inc()
+                    assigned.append(match)
+                    continue
+                cluster_id = _cluster_id(article)
+                conn.execute(
+                    """INSERT OR REPLACE INTO clusters (id, signature, content, created_at, last_seen)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (cluster_id, signature.tobytes(), content, now, now)
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO buckets (band, bucket, cluster_id) VALUES (?, ?, ?)",
+                    [(band, bucket, cluster_id) for band, bucket in buckets]
+                )
+                assigned.append((cluster_id, content))
+        return assigned
+
+    def _prune(self, conn, now):
+        stale = [row[0] for row in conn.execute("SELECT id FROM clusters WHERE last_seen < ?", (now - self.retention,))]
+        conn.executemany("DELETE FROM buckets WHERE cluster_id = ?", [(cluster_id,) for cluster_id in stale])
+        conn.executemany("DELETE FROM clusters WHERE id = ?", [(cluster_id,) for cluster_id in stale])
+        self._pruned_at = now
+
+
+def _cluster_id(article):
+    # Named after the article that started it
+    key = article.get("url") or _shingle_text(article)
+    return "c" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+
+near_duplicates = NearDuplicateIndex(DEDUP_DB_PATH) if DEDUP_ENABLED else None
+
+
+def _group(articles, assigned):
+    groups = []
+    by_id = {}
+    for article, (cluster_id, content) in zip(articles, assigned):
+        group = by_id.get(cluster_id) if cluster_id is not None else None
+        if group is None:
+            group = {"cluster_id": cluster_id, "content": content, "articles": []}
+            groups.append(group)
+            if cluster_id is not None:
+                by_id[cluster_id] = group
+        group["articles"].append(article)
+    return groups
+
+
+def group_articles(articles, content):
+    """
+    Group fetched articles into near-duplicate clusters, in first-seen order:
+    [{"cluster_id", "content", "articles"}]. Score `content` once per cluster
+    instead of every article. content(article) gives the text to score for
+    an article that starts a cluster. With dedup disabled, or if the index
+    fails, every article is its own cluster with no ID.
+    """
+    contents = [content(article) for article in articles]
+    assigned = [(None, text) for text in contents]
+    if near_duplicates is not None and articles:
+        try:
+            assigned = near_duplicates.assign(articles, contents)
+        except Exception as e:
+            logger.warning("Near-duplicate detection failed, scoring every article: %s", e)
+    return _group(articles, assigned)
+
+
+async def cluster_articles(articles, content):
+    """group_articles() in a worker thread."""
+    return await asyncio.to_thread(group_articles, articles, content)
+
+
+def cluster_members(clusters, entries):
+    """Every article of each cluster paired with its cluster's report entry, as (articles, entries) lists."""
+    pairs = [(article, entry) for cluster, entry in zip(clusters, entries) for article in cluster["articles"]]
+    return [article for article, _ in pairs], [entry for _, entry in pairs]
@@ -0,0 +1,236 @@
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+
+from config import GEO_GRID_CELL_DEGREES
+from datastore import supplier_store, storage_store
+
+router = APIRouter()
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; arguments broadcast like NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GeoGrid:
+    """
+    Uniform lat/lon grid over a fixed set of points.
+
+    Radius queries only compute distances for points in the cells overlapping
+    the query's bounding box; nearest-neighbour queries grow the radius until
+    enough points are inside it, which makes the result exact.
+    """
+
+    def __init__(self, lats, lons, cell_degrees=GEO_GRID_CELL_DEGREES):
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.cell = cell_degrees
+        cells = defaultdict(list)
+        rows = np.floor(self.lats / self.cell).astype(int)
+        cols = np.floor(self.lons / self.cell).astype(int)
+        for index, key in enumerate(zip(rows.tolist(), cols.tolist())):
+            cells[key].append(index)
+        self.cells = {key: np.array(indexes) for key, indexes in cells.items()}
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _candidates(self, lat, lon, radius_km):
+        lat_span = radius_km / KM_PER_DEGREE
+        # Longitude degrees shrink towards the poles; clamp to avoid dividing by ~0
+        lon_span = radius_km / (KM_PER_DEGREE * max(np.cos(np.radians(min(abs(lat) + lat_span, 89.0))), 1e-3))
+        row_range = range(int(np.floor((lat - lat_span) / self.cell)), int(np.floor((lat + lat_span) / self.cell)) + 1)
+        col_range = range(int(np.floor((lon - lon_span) / self.cell)), int(np.floor((lon + lon_span) / self.cell)) + 1)
+        if len(row_range) * len(col_range) > len(self.cells):
+            # Box covers more cells than exist; scanning the occupied ones is cheaper
+            found = [indexes for (row, col), indexes in self.cells.items() if row in row_range and col in col_range]
+        else:
+            found = [self.cells[key] for key in ((row, col) for row in row_range for col in col_range) if key in self.cells]
+        return np.concatenate(found) if found else np.array([], dtype=int)
+
+    def within_radius(self, lat, lon, radius_km):
+        """(indexes, distances) of points within radius_km, nearest first."""
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        mask = distances <= radius_km
+        order = np.argsort(distances[mask], kind="stable")
+        return candidates[mask][order], distances[mask][order]
+
+    def nearest(self, lat, lon, k=1):
+        """(indexes, distances) of the k nearest points."""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.array([], dtype=int), np.array([])
+        radius = self.cell * KM_PER_DEGREE
+        while radius < np.pi * EARTH_RADIUS_KM:
+            indexes, distances = self.within_radius(lat, lon, radius)
+            if len(indexes) >= k:
+                return indexes[:k], distances[:k]
+            radius *= 2
+        distances = haversine_km(lat, lon, self.lats, self.lons)
+        order = np.argsort(distances, kind="stable")[:k]
+        return order, distances[order]
+
+
+def assign_nearest(from_lats, from_lons, to_lats, to_lons, chunk_size=4096):
+    """Nearest target for every source point, computed as chunked distance matrices."""
+    from_lats = np.asarray(from_lats, dtype=float)
+    from_lons = np.asarray(from_lons, dtype=float)
+    to_lats = np.asarray(to_lats, dtype=float)[np.newaxis, :]
+    to_lons = np.asarray(to_lons, dtype=float)[np.newaxis, :]
+    nearest = np.empty(len(from_lats), dtype=int)
+    distances = np.empty(len(from_lats))
+    for start in range(0, len(from_lats), chunk_size):
+        stop = start + chunk_size
+        matrix = haversine_km(from_lats[start:stop, np.newaxis], from_lons[start:stop, np.newaxis], to_lats, to_lons)
+        nearest[start:stop] = matrix.argmin(axis=1)
+        distances[start:stop] = matrix[np.arange(len(matrix)), nearest[start:stop]]
+    return nearest, distances
+
+
+class GeoIndexes:
+    """Grids over suppliers and storage locations, rebuilt when the datastore reloads."""
+
+    def __init__(self):
+        self._suppliers = None
+        self._locations = None
+        self.supplier_grid = None
+        self.location_grid = None
+
+    def refresh(self):
+        suppliers = supplier_store.all()
+        if suppliers is not self._suppliers:
+            self.supplier_grid = GeoGrid(
+                [s["latitude"] for s in suppliers], [s["longitude"] for s in suppliers]
+            )
+            self._suppliers = suppliers
+        locations = storage_store.all()
+        if locations is not self._locations:
+            self.location_grid = GeoGrid(
+                [loc["coordinates"]["latitude"] for loc in locations],
+                [loc["coordinates"]["longitude"] for loc in locations]
+            )
+            self._locations = locations
+        return self._suppliers, self._locations
+
+
+geo_indexes = GeoIndexes()
+
+
+def _find_supplier(supplier_name):
+    matches = supplier_store.query(name=supplier_name)
+    if not matches:
+        raise HTTPException(status_code=404, detail=f"Supplier {supplier_name!r} not found")
+    return matches[0]
+
+
+def _with_distances(records, indexes, distances):
+    return [
+        dict(records[int(index)], distance_km=round(float(distance), 2))
+        for index, distance in zip(indexes, distances)
+    ]
+
+
+@router.get("/geo/nearest-storage")
+async def nearest_storage_locations(supplier_name: str, k: int = 3):
+    """
+    Nearest storage locations to a supplier, closest first.
+    """
+    try:
+        _, locations = geo_indexes.refresh()
+        supplier = _find_supplier(supplier_name)
+        indexes, distances = geo_indexes.location_grid.nearest(supplier["latitude"], supplier["longitude"], k)
+        return {
+            "supplier": supplier,
+            "storage_locations": _with_distances(locations, indexes, distances)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding nearest storage locations: {str(e)}")
+
+
+@router.get("/geo/suppliers-near-location/{location_id}")
+async def suppliers_near_location(location_id: int, radius_km: float = 200.0):
+    """
+    Suppliers within a radius of a storage location, closest first.
+    """
+    try:
+        suppliers, _ = geo_indexes.refresh()
+        location = storage_store.get(location_id)
+        if not location:
+            raise HTTPException(status_code=404, detail=f"Storage location with ID {location_id} not found")
+        coordinates = location["coordinates"]
+        indexes, distances = geo_indexes.supplier_grid.within_radius(
+            coordinates["latitude"], coordinates["longitude"], radius_km
+        )
+        return {
+            "location": location,
+            "radius_km": radius_km,
+            "suppliers": _with_distances(suppliers, indexes, distances)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding suppliers near location: {str(e)}")
+
+
+@router.get("/geo/within-radius")
+async def within_radius(latitude: float, longitude: float, radius_km: float = 100.0):
+    """
+    Suppliers and storage locations within a radius of a point, e.g. the
+    centre of a flood or strike.
+    """
+    try:
+        suppliers, locations = geo_indexes.refresh()
+        supplier_hits = geo_indexes.supplier_grid.within_radius(latitude, longitude, radius_km)
+        location_hits = geo_indexes.location_grid.within_radius(latitude, longitude, radius_km)
+        return {
+            "center": {"latitude": latitude, "longitude": longitude},
+            "radius_km": radius_km,
+            "suppliers": _with_distances(suppliers, *supplier_hits),
+            "storage_locations": _with_distances(locations, *location_hits)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running radius query: {str(e)}")
+
+
+@router.get("/geo/supplier-assignments")
+async def supplier_assignments(state: Optional[str] = None):
+    """
+    Assign every supplier (optionally only those in one state) to its nearest
+    storage location.
+    """
+    try:
+        _, locations = geo_indexes.refresh()
+        suppliers = supplier_store.query(state=state)
+        if not suppliers or not locations:
+            return {"total_suppliers": len(suppliers), "assignments": []}
+        nearest, distances = assign_nearest(
+            [s["latitude"] for s in suppliers],
+            [s["longitude"] for s in suppliers],
+            [loc["coordinates"]["latitude"] for loc in locations],
+            [loc["coordinates"]["longitude"] for loc in locations]
+        )
+        return {
+            "total_suppliers": len(suppliers),
+            "assignments": [
+                {
+                    "supplier_name": supplier["supplier_name"],
+                    "location_id": locations[int(index)]["id"],
+                    "address": locations[int(index)]["address"],
+                    "distance_km": round(float(distance), 2)
+                }
+                for supplier, index, distance in zip(suppliers, nearest, distances)
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error assigning suppliers to storage locations: {str(e)}")
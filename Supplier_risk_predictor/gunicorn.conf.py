@@ -0,0 +1,33 @@
+"""
+Multi-worker deployment: gunicorn -c gunicorn.conf.py main:app
+
+SENTIMENT_SERVING=preload loads the sentiment model in the gunicorn master
+before it forks WEB_CONCURRENCY workers, so they share the weights
+copy-on-write. SENTIMENT_SERVING=sidecar starts one inference process that
+all workers call over a Unix socket instead.
+"""
+
+from config import SENTIMENT_SERVING, WEB_CONCURRENCY
+
+bind = "0.0.0.0:8000"
+workers = WEB_CONCURRENCY
+# uvicorn.workers is deprecated; the worker now ships as the uvicorn-worker package
+worker_class = "uvicorn_worker.UvicornWorker"
+# Import main (and so load the model) in the master, once, before forking
+preload_app = SENTIMENT_SERVING == "preload"
+
+_sidecar = None
+
+
+def on_starting(server):
+    global _sidecar
+    if SENTIMENT_SERVING == "sidecar":
+        from model_server import start_sidecar
+
+        _sidecar = start_sidecar()
+
+
+def on_exit(server):
+    from model_server import stop_sidecar
+
+    stop_sidecar(_sidecar)
@@ -0,0 +1,445 @@
+import asyncio
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from config import HISTORY_DB_PATH, HISTORY_ENABLED
+from db import SQLiteConnection
+from scoring import is_scored
+from timeutil import DAY_SECONDS, iso_timestamp, published_at, utc_day
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Time constants of the exponentially weighted polarity averages
+EWMA_WINDOWS = {"7d": 7 * DAY_SECONDS, "30d": 30 * DAY_SECONDS}
+
+
+def _observed_at(article, now):
+    """When the article was published (seconds since the epoch); missing, unparseable or future dates count as now."""
+    published = published_at(article)
+    return now if published is None else min(published, now)
+
+
+def _article_key(article):
+    return article.get("url") or article.get("title") or ""
+
+
+class HistoryStore:
+    """
+    Append-only history of article scores and supplier verdicts in SQLite,
+    with rollups kept up to date as rows arrive, so trend queries never
+    re-aggregate the raw history.
+
+    Every article or verdict is recorded under a `source` ("supplier" or
+    "storage") and a set of scopes it rolls up into, e.g. {"supplier": name,
+    "state": state, "category": category}. Per (source, scope, key) the store
+    keeps:
+    - 7- and 30-day EWMA polarity as exponentially time-decayed sums, so
+      articles can arrive in any order and in batches
+    - daily polarity sums and risk keyword counts for trend series
+    - cumulative risk keyword counts
+    - risk-level changes, the supplier's current level and, for wider
+      scopes, how many suppliers are at each level
+
+    An article is counted once per source and entity however many runs see it.
+    Writes take SQLite's write lock up front, so several worker processes
+    can share one file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = SQLiteConnection(path, schema="""
+            CREATE TABLE IF NOT EXISTS articles (
+                source TEXT NOT NULL, entity TEXT NOT NULL COLLATE NOCASE, article TEXT NOT NULL,
+                observed_at REAL NOT NULL, recorded_at REAL NOT NULL,
+                scopes TEXT NOT NULL, title TEXT, url TEXT, polarity REAL NOT NULL,
+                risk_score REAL, keywords TEXT NOT NULL,
+                PRIMARY KEY (source, entity, article)
+            );
+            CREATE TABLE IF NOT EXISTS verdicts (
+                source TEXT NOT NULL, entity TEXT NOT NULL COLLATE NOCASE, recorded_at REAL NOT NULL,
+                scopes TEXT NOT NULL, risk_level TEXT, sentiment TEXT, polarity REAL, verdict TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS verdicts_by_entity ON verdicts (source, entity, recorded_at);
+            CREATE TABLE IF NOT EXISTS risk_changes (
+                source TEXT NOT NULL, entity TEXT NOT NULL COLLATE NOCASE, changed_at REAL NOT NULL,
+                state TEXT COLLATE NOCASE, category TEXT COLLATE NOCASE,
+                from_level TEXT NOT NULL, to_level TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS risk_changes_by_time ON risk_changes (source, changed_at);
+            CREATE TABLE IF NOT EXISTS rollups (
+                source TEXT NOT NULL, scope TEXT NOT NULL, key TEXT NOT NULL COLLATE NOCASE,
+                reference_at REAL, sum_7d REAL NOT NULL DEFAULT 0, weight_7d REAL NOT NULL DEFAULT 0,
+                sum_30d REAL NOT NULL DEFAULT 0, weight_30d REAL NOT NULL DEFAULT 0,
+                articles INTEGER NOT NULL DEFAULT 0, keyword_counts TEXT NOT NULL DEFAULT '{}',
+                risk_level TEXT, risk_levels TEXT NOT NULL DEFAULT '{}',
+                risk_level_changes INTEGER NOT NULL DEFAULT 0, last_change_at REAL, updated_at REAL,
+                PRIMARY KEY (source, scope, key)
+            );
+            CREATE TABLE IF NOT EXISTS daily (
+                source TEXT NOT NULL, scope TEXT NOT NULL, key TEXT NOT NULL COLLATE NOCASE, day TEXT NOT NULL,
+                polarity_sum REAL NOT NULL, articles INTEGER NOT NULL, keyword_counts TEXT NOT NULL,
+                PRIMARY KEY (source, scope, key, day)
+            );
+        """, row_factory=sqlite3.Row, shared=True)
+
+    def _write(self, func):
+        """Run func(conn) in one transaction that holds the write lock from the start."""
+        with self._lock, self._db.transaction() as conn:
+            return func(conn)
+
+    def _rollup(self, conn, source, scope, key):
+        row = conn.execute(
+            "SELECT * FROM rollups WHERE source = ? AND scope = ? AND key = ?", (source, scope, key)
+        ).fetchone()
+        if row is not None:
+            return dict(row)
+        conn.execute("INSERT INTO rollups (source, scope, key) VALUES (?, ?, ?)", (source, scope, key))
+        return {
+            "source": source, "scope": scope, "key": key, "reference_at": None,
+            "sum_7d": 0.0, "weight_7d": 0.0, "sum_30d": 0.0, "weight_30d": 0.0,
+            "articles": 0, "keyword_counts": "{}", "risk_level": None, "risk_levels": "{}",
+            "risk_level_changes": 0, "last_change_at": None, "updated_at": None
+        }
+
+    def _save_rollup(self, conn, rollup):
+        conn.execute(
+            """UPDATE rollups SET reference_at = ?, sum_7d = ?, weight_7d = ?, sum_30d = ?, weight_30d = ?,
+               articles = ?, keyword_counts = ?, risk_level = ?, risk_levels = ?, risk_level_changes = ?,
+               last_change_at = ?, updated_at = ? WHERE source = ? AND scope = ? AND key = ?""",
+            (
+                rollup["reference_at"], rollup["sum_7d"], rollup["weight_7d"], rollup["sum_30d"], rollup["weight_30d"],
+                rollup["articles"], rollup["keyword_counts"], rollup["risk_level"], rollup["risk_levels"],
+                rollup["risk_level_changes"], rollup["last_change_at"], rollup["updated_at"],
+                rollup["source"], rollup["scope"], rollup["key"]
+            )
+        )
+
+    @staticmethod
+    def _observe(rollup, observations):
+        """Fold (time, polarity) observations into the decayed sums, all referred to the latest time seen."""
+        reference = max([t for t, _ in observations] + [rollup["reference_at"] or 0.0])
+        for window, tau in EWMA_WINDOWS.items():
+            decay = math.exp(-(reference - rollup["reference_at"]) / tau) if rollup["reference_at"] else 0.0
+            total = rollup[f"sum_{window}"] * decay
+            weight = rollup[f"weight_{window}"] * decay
+            for t, polarity in observations:
+                w = math.exp(-(reference - t) / tau)
+                total += w * polarity
+                weight += w
+            rollup[f"sum_{window}"], rollup[f"weight_{window}"] = total, weight
+        rollup["reference_at"] = reference
+
+    def record_articles(self, source, entity, articles, scopes, now=None):
+        """
+        Record scored articles (report entries with polarity_score, risk_keywords,
+        publishedAt) for an entity and fold the new ones into the rollups of
+        every (scope, key) in `scopes`. Returns how many were new.
+        """
+        now = time.time() if now is None else now
+        scopes = {scope: key for scope, key in scopes.items() if key}
+        rows = [
+            (article, _observed_at(article, now)) for article in articles
+            if is_scored(article) and _article_key(article)
+        ]
+        if not rows:
+            return 0
+
+        def write(conn):
+            fresh = []
+            for article, observed_at in rows:
+                keywords = article.get("risk_keywords") or []
+                inserted = conn.execute(
+                    """INSERT OR IGNORE INTO articles (source, entity, article, observed_at, recorded_at, scopes,
+                       title, url, polarity, risk_score, keywords) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        source, entity, _article_key(article), observed_at, now, json.dumps(scopes),
+                        article.get("title"), article.get("url"), float(article["polarity_score"]),
+                        article.get("risk_score"), json.dumps(keywords)
+                    )
+                ).rowcount
+                if inserted:
+                    fresh.append((observed_at, float(article["polarity_score"]), keywords))
+            if not fresh:
+                return 0
+            for scope, key in scopes.items():
+                rollup = self._rollup(conn, source, scope, key)
+                self._observe(rollup, [(t, polarity) for t, polarity, _ in fresh])
+                keyword_counts = Counter(json.loads(rollup["keyword_counts"]))
+                days = defaultdict(lambda: [0.0, 0, Counter()])
+                for t, polarity, keywords in fresh:
+                    keyword_counts.update(keywords)
+                    day = days[utc_day(t)]
+                    day[0] += polarity
+                    day[1] += 1
+                    day[2].update(keywords)
+                rollup.update(articles=rollup["articles"] + len(fresh), updated_at=now,
+                              keyword_counts=json.dumps(dict(keyword_counts)))
+                self._save_rollup(conn, rollup)
+                for day, (polarity_sum, count, counts) in days.items():
+                    existing = conn.execute(
+                        "SELECT polarity_sum, articles, keyword_counts FROM daily "
+                        "WHERE source = ? AND scope = ? AND key = ? AND day = ?", (source, scope, key, day)
+                    ).fetchone()
+                    if existing is not None:
+                        polarity_sum += existing["polarity_sum"]
+                        count += existing["articles"]
+                        counts = counts + Counter(json.loads(existing["keyword_counts"]))
+                    conn.execute(
+                        "INSERT OR REPLACE INTO daily (source, scope, key, day, polarity_sum, articles, keyword_counts) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (source, scope, key, day, polarity_sum, count, json.dumps(dict(counts)))
+                    )
+            return len(fresh)
+
+        return self._write(write)
+
+    def record_verdict(self, source, entity, verdict, scopes, risk_level=None, now=None):
+        """
+        Append a verdict (an LLM report, supplier or location analysis) for an
+        entity. Risk levels are tracked per supplier: one different from the
+        supplier's previous level is logged as a change and counted in the
+        rollups of the supplier and of its other scopes.
+        Returns the change as {"from", "to"}, or None.
+        """
+        now = time.time() if now is None else now
+        scopes = {scope: key for scope, key in scopes.items() if key}
+        polarity = verdict.get("average_polarity_score")
+        sentiment = verdict.get("overall_sentiment") or verdict.get("overall_location_sentiment")
+
+        def write(conn):
+            conn.execute(
+                "INSERT INTO verdicts (source, entity, recorded_at, scopes, risk_level, sentiment, polarity, verdict) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    source, entity, now, json.dumps(scopes), risk_level, sentiment, polarity,
+                    json.dumps(verdict, default=str)
+                )
+            )
+            if risk_level is None:
+                return None
+            own = self._rollup(conn, source, "supplier", entity)
+            previous = own["risk_level"]
+            if previous == risk_level:
+                return None
+            for scope, key in dict(scopes, supplier=entity).items():
+                rollup = own if scope == "supplier" else self._rollup(conn, source, scope, key)
+                if scope == "supplier":
+                    rollup["risk_level"] = risk_level
+                else:
+                    # How many of the scope's suppliers are at each level
+                    levels = Counter(json.loads(rollup["risk_levels"]))
+                    if previous is not None:
+                        levels[previous] -= 1
+                    levels[risk_level] += 1
+                    rollup["risk_levels"] = json.dumps({level: n for level, n in levels.items() if n > 0})
+                if previous is not None:
+                    rollup.update(risk_level_changes=rollup["risk_level_changes"] + 1, last_change_at=now)
+                rollup["updated_at"] = now
+                self._save_rollup(conn, rollup)
+            if previous is None:
+                return None
+            conn.execute(
+                "INSERT INTO risk_changes (source, entity, changed_at, state, category, from_level, to_level) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, entity, now, scopes.get("state"), scopes.get("category"), previous, risk_level)
+            )
+            return {"from": previous, "to": risk_level}
+
+        return self._write(write)
+
+    @staticmethod
+    def _rollup_view(row, now):
+        view = {"source": row["source"], "scope": row["scope"], "key": row["key"]}
+        for window, tau in EWMA_WINDOWS.items():
+            weight = row[f"weight_{window}"]
+            view[f"ewma_polarity_{window}"] = row[f"sum_{window}"] / weight if weight else None
+            # Articles' combined weight as of now: how much recent evidence the average rests on
+            if row["reference_at"] is not None:
+                weight *= math.exp(-max(0.0, now - row["reference_at"]) / tau)
+            view[f"effective_articles_{window}"] = round(weight, 3)
+        view.update(
+            articles=row["articles"],
+            keyword_counts=json.loads(row["keyword_counts"]),
+            risk_level=row["risk_level"],
+            risk_levels=json.loads(row["risk_levels"]),
+            risk_level_changes=row["risk_level_changes"],
+            last_change_at=iso_timestamp(row["last_change_at"]),
+            updated_at=iso_timestamp(row["updated_at"])
+        )
+        return view
+
+    def rollups(self, source, scope, key=None, limit=100, now=None):
+        """Precomputed rollups for a scope, most negative 7-day polarity first."""
+        now = time.time() if now is None else now
+        query = "SELECT * FROM rollups WHERE source = ? AND scope = ?"
+        params = [source, scope]
+        if key is not None:
+            query += " AND key = ?"
+            params.append(key)
+        query += " ORDER BY weight_7d = 0, sum_7d / weight_7d LIMIT ?"
+        with self._lock:
+            rows = self._db.connection.execute(query, (*params, limit)).fetchall()
+        return [self._rollup_view(row, now) for row in rows]
+
+    def trend(self, source, scope, key, days=30, now=None):
+        """Daily average polarity and keyword counts for the last `days` days, plus the current rollup."""
+        now = time.time() if now is None else now
+        since = utc_day(now - (days - 1) * DAY_SECONDS)
+        with self._lock:
+            rows = self._db.connection.execute(
+                "SELECT day, polarity_sum, articles, keyword_counts FROM daily "
+                "WHERE source = ? AND scope = ? AND key = ? AND day >= ? ORDER BY day",
+                (source, scope, key, since)
+            ).fetchall()
+            rollup = self._db.connection.execute(
+                "SELECT * FROM rollups WHERE source = ? AND scope = ? AND key = ?", (source, scope, key)
+            ).fetchone()
+        return {
+            "rollup": self._rollup_view(rollup, now) if rollup is not None else None,
+            "daily": [
+                {
+                    "day": row["day"],
+                    "average_polarity_score": row["polarity_sum"] / row["articles"],
+                    "articles": row["articles"],
+                    "keyword_counts": json.loads(row["keyword_counts"])
+                }
+                for row in rows
+            ]
+        }
+
+    def risk_changes(self, source="supplier", entity=None, state=None, category=None, since=None, limit=100):
+        """Risk-level changes, newest first; `since` is seconds since the epoch."""
+        query = "SELECT * FROM risk_changes WHERE source = ?"
+        params = [source]
+        for column, value in (("entity", entity), ("state", state), ("category", category)):
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        if since is not None:
+            query += " AND changed_at >= ?"
+            params.append(since)
+        query += " ORDER BY changed_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.connection.execute(query, (*params, limit)).fetchall()
+        return [
+            {
+                "entity": row["entity"], "state": row["state"], "category": row["category"],
+                "from_level": row["from_level"], "to_level": row["to_level"], "changed_at": iso_timestamp(row["changed_at"])
+            }
+            for row in rows
+        ]
+
+    def verdicts(self, source, entity, limit=50):
+        """An entity's recorded verdicts, newest first."""
+        with self._lock:
+            rows = self._db.connection.execute(
+                "SELECT recorded_at, verdict FROM verdicts WHERE source = ? AND entity = ? "
+                "ORDER BY recorded_at DESC LIMIT ?", (source, entity, limit)
+            ).fetchall()
+        return [dict(json.loads(row["verdict"]), recorded_at=iso_timestamp(row["recorded_at"])) for row in rows]
+
+
+history_store = HistoryStore(HISTORY_DB_PATH) if HISTORY_ENABLED else None
+
+
+async def record_history(method, *args, **kwargs):
+    """
+    Call a history_store method in a worker thread. History is a side record:
+    a failure is logged and never fails the analysis that produced it.
+    """
+    if history_store is None:
+        return None
+    try:
+        return await asyncio.to_thread(getattr(history_store, method), *args, **kwargs)
+    except Exception as e:
+        logger.warning("Recording %s history failed: %s", method, e)
+        return None
+
+
+def _store():
+    if history_store is None:
+        raise HTTPException(status_code=404, detail="History is disabled (HISTORY_ENABLED=false)")
+    return history_store
+
+
+SCOPES = ("supplier", "state", "category")
+
+
+@router.get("/history/rollups")
+async def get_history_rollups(
+    source: str = "supplier",
+    scope: str = "supplier",
+    key: Optional[str] = None,
+    limit: int = 100
+):
+    """
+    Precomputed rollups (7/30-day EWMA polarity, risk keyword counts, risk
+    levels and changes) per supplier, state or category, most negative first.
+    """
+    if scope not in SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(SCOPES)}")
+    try:
+        return {"rollups": await asyncio.to_thread(_store().rollups, source, scope, key, limit)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading history rollups: {str(e)}")
+
+
+@router.get("/history/trend")
+async def get_history_trend(key: str, source: str = "supplier", scope: str = "supplier", days: int = 30):
+    """Daily polarity and keyword counts over the last `days` days for one supplier, state or category."""
+    if scope not in SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(SCOPES)}")
+    try:
+        trend = await asyncio.to_thread(_store().trend, source, scope, key, max(1, min(days, 366)))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading history trend: {str(e)}")
+    if trend["rollup"] is None:
+        raise HTTPException(status_code=404, detail=f"No history for {scope} {key!r}")
+    return trend
+
+
+@router.get("/history/risk-changes")
+async def get_risk_changes(
+    supplier: Optional[str] = None,
+    state: Optional[str] = None,
+    category: Optional[str] = None,
+    days: Optional[int] = None,
+    limit: int = 100
+):
+    """Supplier risk-level changes, newest first, optionally filtered and limited to the last `days` days."""
+    since = time.time() - days * DAY_SECONDS if days else None
+    try:
+        changes = await asyncio.to_thread(
+            _store().risk_changes, "supplier", supplier, state, category, since, limit
+        )
+        return {"changes": changes}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading risk changes: {str(e)}")
+
+
+@router.get("/history/verdicts")
+async def get_verdicts(entity: str, source: str = "supplier", limit: int = 50):
+    """Recorded verdicts for one supplier (or storage location ID with source=storage), newest first."""
+    try:
+        return {"verdicts": await asyncio.to_thread(_store().verdicts, source, entity, limit)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading verdicts: {str(e)}")
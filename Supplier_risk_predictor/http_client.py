@@ -0,0 +1,118 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import (
+    HTTP_TIMEOUT_SECONDS, HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_MAX_KEEPALIVE_PER_HOST,
+    HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE_SECONDS, HTTP_BACKOFF_MAX_SECONDS,
+)
+from metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_RETRIES, UPSTREAM_ERRORS
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Failures before the request was sent, so retrying can't apply it twice
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class HTTPClientPool:
+    """
+    One keep-alive httpx.AsyncClient per upstream host, so each host gets its
+    own connection limit and a slow upstream can't starve the others.
+    """
+
+    def __init__(self):
+        self._clients = {}
+
+    def _new_client(self):
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST
+            )
+        )
+
+    def client_for(self, url):
+        host = urlsplit(url).netloc
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            client = self._clients[host] = self._new_client()
+        return client
+
+    async def close(self):
+        clients, self._clients = list(self._clients.values()), {}
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+
+http_pool = HTTPClientPool()
+
+
+def _backoff_delay(attempt, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), HTTP_BACKOFF_MAX_SECONDS)
+    # Full jitter: spreads retries from concurrent callers instead of synchronising them
+    return random.uniform(0, min(HTTP_BACKOFF_MAX_SECONDS, HTTP_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+async def request(method, url, **kwargs):
+    """
+    Send a request through the shared pool, retrying transport errors and
+    429/5xx responses with jittered exponential backoff. After the last retry
+    the final response is returned (or the transport error re-raised) so
+    callers keep handling status codes themselves.
+
+    Non-idempotent methods (POST, PATCH) are only retried on errors raised
+    before the request went out, never on e.g. a read timeout, where the
+    upstream may already be processing it.
+    """
+    client = http_pool.client_for(url)
+    host = urlsplit(url).netloc
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            UPSTREAM_ERRORS.inc(host=host, reason=type(e).__name__)
+            if attempt == HTTP_MAX_RETRIES or not (idempotent or isinstance(e, NOT_SENT_ERRORS)):
+                raise
+            UPSTREAM_RETRIES.inc(host=host)
+            await asyncio.sleep(_backoff_delay(attempt))
+            continue
+        finally:
+            UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, host=host)
+        if response.status_code >= 400:
+            UPSTREAM_ERRORS.inc(host=host, reason=str(response.status_code))
+        if response.status_code not in RETRY_STATUS_CODES or attempt == HTTP_MAX_RETRIES:
+            return response
+        UPSTREAM_RETRIES.inc(host=host)
+        await asyncio.sleep(_backoff_delay(attempt, response))
+
+
+async def get(url, **kwargs):
+    return await request("GET", url, **kwargs)
+
+async def post(url, **kwargs):
+    return await request("POST", url, **kwargs)
+
+@asynccontextmanager
+async def stream(method, url, **kwargs):
+    """Streaming request through the shared pool; not retried since the body is consumed incrementally."""
+    host = urlsplit(url).netloc
+    start = time.perf_counter()
+    try:
+        async with http_pool.client_for(url).stream(method, url, **kwargs) as response:
+            if response.status_code >= 400:
+                UPSTREAM_ERRORS.inc(host=host, reason=str(response.status_code))
+            yield response
+    except httpx.TransportError as e:
+        UPSTREAM_ERRORS.inc(host=host, reason=type(e).__name__)
+        raise
+    finally:
+        UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, host=host)
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: only runs within this process are serialised
+    fcntl = None
+
+from config import INCREMENTAL_MAX_ARTICLES
+from metrics import stage_timer
+from scoring import is_scored
+
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _state_lock(path):
+    """Serialise load-merge-save of one state file across threads and (where flock exists) processes."""
+    with _path_locks_guard:
+        lock = _path_locks.setdefault(str(path.resolve()), threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path.with_name(path.name + ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def article_key(article):
+    """Articles are identified by URL, or by a hash of title and description when there is none."""
+    url = article.get("url")
+    if url:
+        return url
+    text = f"{article.get('title') or ''}\n{article.get('description') or ''}"
+    return "sha256:" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IncrementalState:
+    """
+    Per-supplier memory between runs: the scored articles seen so far and the
+    last LLM verdict with a fingerprint of the inputs that produced it.
+
+    Each run only scores articles whose key hasn't been seen and only asks the
+    LLM again when a supplier's fingerprint changes, so a scheduled run costs
+    in proportion to the new news rather than to the number of suppliers.
+
+    Overlapping runs each load the file; save() merges this run's suppliers
+    into whatever is on disk at that moment instead of overwriting it.
+    """
+
+    def __init__(self, path, max_articles=INCREMENTAL_MAX_ARTICLES):
+        self.path = Path(path)
+        self.max_articles = max_articles
+        self.suppliers = self._load()
+        self._touched = set()
+        self._new_verdicts = set()
+        self._reset = False
+
+    def _load(self):
+        if not self.path.exists():
+            return {}
+        with open(self.path, "r") as f:
+            return json.load(f).get("suppliers", {})
+
+    def _entry(self, supplier_name):
+        return self.suppliers.setdefault(supplier_name, {"articles": [], "llm": None})
+
+    def reset(self):
+        """Start from empty; the next save replaces the file rather than merging into it."""
+        self.suppliers = {}
+        self._reset = True
+
+    def new_articles(self, supplier_name, articles):
+        """The subset of fetched articles not scored in an earlier run (as themselves or as a near-duplicate)."""
+        seen = set()
+        for article in self._entry(supplier_name)["articles"]:
+            seen.add(article["key"])
+            seen.update(article.get("aliases", ()))
+        fresh = []
+        for article in articles:
+            key = article_key(article)
+            if key not in seen:
+                seen.add(key)
+                fresh.append(article)
+        return fresh
+
+    def record_articles(self, supplier_name, articles, processed):
+        """
+        Store scored articles (processed[i] is the report entry for articles[i]), newest retained.
+        Near-duplicates (the same cluster_id) share one entry: further copies
+        are kept as its aliases, so they count as seen but are retained once.
+        Entries whose sentiment inference failed are not stored, so they are
+        scored again next run; they are returned for use in this run only.
+        """
+        entry = self._entry(supplier_name)
+        self._touched.add(supplier_name)
+        by_cluster = {article["cluster_id"]: article for article in entry["articles"] if article.get("cluster_id")}
+        earlier = set(by_cluster)
+        unscored = []
+        for article, scored in zip(articles, processed):
+            if not is_scored(scored):
+                if not any(scored is other for other in unscored):
+                    unscored.append(scored)
+                continue
+            key = article_key(article)
+            retained = by_cluster.get(scored.get("cluster_id"))
+            if retained is None:
+                retained = dict(scored, key=key)
+                entry["articles"].append(retained)
+                if scored.get("cluster_id"):
+                    by_cluster[scored["cluster_id"]] = retained
+            elif key != retained["key"] and key not in retained.get("aliases", ()):
+                retained.setdefault("aliases", []).append(key)
+                if scored["cluster_id"] in earlier:
+                    # A new copy of a story retained in an earlier run
+                    retained["copies"] = retained.get("copies", 1) + 1
+        self._trim(entry)
+        return unscored
+
+    def _trim(self, entry):
+        entry["articles"].sort(key=lambda a: a.get("publishedAt") or "", reverse=True)
+        del entry["articles"][self.max_articles:]
+
+    def articles(self, supplier_name):
+        """Retained scored articles for the supplier, newest first, without the internal keys."""
+        return [
+            {k: v for k, v in article.items() if k not in ("key", "aliases")}
+            for article in self._entry(supplier_name)["articles"]
+        ]
+
+    def fingerprint(self, supplier_name, *extra):
+        """Hash of the retained article keys plus any extra inputs (e.g. weather conditions)."""
+        keys = sorted(article["key"] for article in self._entry(supplier_name)["articles"])
+        payload = json.dumps([keys, extra], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cached_verdict(self, supplier_name, fingerprint):
+        """The last LLM report if it was produced from the same inputs, else None."""
+        llm = self._entry(supplier_name)["llm"]
+        if llm and llm["fingerprint"] == fingerprint:
+            return llm["report"]
+        return None
+
+    def record_verdict(self, supplier_name, fingerprint, report):
+        self._touched.add(supplier_name)
+        self._new_verdicts.add(supplier_name)
+        self._entry(supplier_name)["llm"] = {
+            "fingerprint": fingerprint,
+            "report": report,
+            "generatedAt": datetime.utcnow().isoformat() + "Z"
+        }
+
+    def has_new_verdict(self, supplier_name):
+        """Whether this run produced the supplier's verdict, rather than reusing one from an earlier run."""
+        return supplier_name in self._new_verdicts
+
+    def _merge_into(self, on_disk):
+        """This run's suppliers merged into the file's current contents: articles unioned by key, newer verdict kept."""
+        merged = dict(on_disk)
+        for supplier_name in self._touched:
+            ours = self.suppliers[supplier_name]
+            theirs = on_disk.get(supplier_name)
+            if theirs is None:
+                merged[supplier_name] = ours
+                continue
+            articles = {article["key"]: article for article in theirs["articles"]}
+            articles.update((article["key"], article) for article in ours["articles"])
+            llm = max(
+                (verdict for verdict in (theirs["llm"], ours["llm"]) if verdict),
+                key=lambda verdict: verdict["generatedAt"], default=None
+            )
+            entry = {"articles": list(articles.values()), "llm": llm}
+            self._trim(entry)
+            merged[supplier_name] = entry
+        return merged
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with stage_timer("file_write"), _state_lock(self.path):
+            if not self._reset:
+                self.suppliers = self._merge_into(self._load())
+            fd, temp_name = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name + ".", suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"updatedAt": datetime.utcnow().isoformat() + "Z", "suppliers": self.suppliers}, f)
+            os.replace(temp_name, self.path)
+        self._touched = set()
+        self._reset = False
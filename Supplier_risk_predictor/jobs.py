@@ -0,0 +1,332 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from config import JOBS_DB_PATH, JOB_MAX_CONCURRENCY
+from db import SQLiteConnection
+from metrics import detach_request_timings
+
+router = APIRouter()
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled", "interrupted")
+
+
+def _now():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _owner():
+    """
+    Identifies the worker process that runs a job, so crash recovery only
+    touches its own jobs. Read per call: workers forked from a preloaded
+    parent each have their own pid.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner):
+    """Whether the owning process may still be running (owners on other hosts are assumed alive)."""
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+def _add_owner_column(conn):
+    # Job files from before jobs were owner-scoped
+    columns = [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]
+    if "owner" not in columns:
+        conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+
+class JobStore:
+    """SQLite persistence for jobs and their per-item results."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = SQLiteConnection(path, schema="""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL,
+                total INTEGER, done INTEGER NOT NULL DEFAULT 0, error TEXT,
+                created_at TEXT NOT NULL, started_at TEXT, finished_at TEXT, owner TEXT
+            );
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL, seq INTEGER NOT NULL, item TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+        """, setup=_add_owner_column, row_factory=sqlite3.Row)
+
+    def create(self, kind, params):
+        job_id = uuid.uuid4().hex
+        with self._lock, self._db.connection as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, created_at, owner) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(params), _now(), _owner())
+            )
+        return job_id
+
+    def recover_interrupted(self):
+        """
+        Mark unfinished jobs whose owning process is gone as interrupted (they
+        can't be resumed). Jobs of other live workers are left alone.
+        """
+        with self._lock:
+            rows = self._db.connection.execute(
+                "SELECT id, owner FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+        orphaned = [row["id"] for row in rows if row["owner"] != _owner() and not _owner_alive(row["owner"])]
+        with self._lock, self._db.connection as conn:
+            conn.executemany(
+                "UPDATE jobs SET status = 'interrupted', finished_at = ? WHERE id = ?",
+                [(_now(), job_id) for job_id in orphaned]
+            )
+        return len(orphaned)
+
+    def update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._db.connection as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def add_result(self, job_id, item):
+        with self._lock, self._db.connection as conn:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_results WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO job_results (job_id, seq, item) VALUES (?, ?, ?)",
+                (job_id, seq, json.dumps(item, default=str))
+            )
+            conn.execute("UPDATE jobs SET done = done + 1 WHERE id = ?", (job_id,))
+        return seq
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def list(self, limit=50):
+        with self._lock:
+            rows = self._db.connection.execute(
+                "SELECT id, kind, status, total, done, created_at, finished_at FROM jobs ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def results(self, job_id, since=0):
+        with self._lock:
+            rows = self._db.connection.execute(
+                "SELECT seq, item FROM job_results WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, since)
+            ).fetchall()
+        return [(seq, json.loads(item)) for seq, item in rows]
+
+
+class JobContext:
+    """Handed to a running job so it can report its size and stream out results."""
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+
+    async def set_total(self, total):
+        await asyncio.to_thread(self.manager.store.update, self.job_id, total=total)
+        self.manager._notify(self.job_id)
+
+    async def add_result(self, item):
+        await asyncio.to_thread(self.manager.store.add_result, self.job_id, item)
+        self.manager._notify(self.job_id)
+
+
+class JobManager:
+    """
+    Runs registered long-running analyses as background asyncio tasks, at most
+    JOB_MAX_CONCURRENCY at a time; later submissions wait in 'queued'.
+    Job store reads and writes run in worker threads, never on the loop.
+    """
+
+    def __init__(self, store, max_concurrency=JOB_MAX_CONCURRENCY):
+        self.store = store
+        self.runners = {}
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._tasks = {}
+        # Bumped on every change to a job; waiters compare against the version they last saw
+        self._versions = {}
+        self._waiters = {}
+
+    def register(self, kind, runner):
+        # runner: async def runner(context, **params) -> None
+        self.runners[kind] = runner
+
+    async def submit(self, kind, params=None):
+        if kind not in self.runners:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        params = params or {}
+        job_id = await asyncio.to_thread(self.store.create, kind, params)
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id, kind, params))
+        return job_id
+
+    async def _run(self, job_id, kind, params):
+        # Jobs outlive the request that submitted them
+        detach_request_timings()
+        try:
+            async with self._semaphore:
+                await self._update(job_id, status="running", started_at=_now())
+                self._notify(job_id)
+                await self.runners[kind](JobContext(self, job_id), **params)
+            await self._update(job_id, status="completed", finished_at=_now())
+        except asyncio.CancelledError:
+            await self._update(job_id, status="cancelled", finished_at=_now())
+        except Exception as e:
+            await self._update(job_id, status="failed", error=str(e), finished_at=_now())
+        finally:
+            self._tasks.pop(job_id, None)
+            self._notify(job_id)
+
+    async def _update(self, job_id, **fields):
+        await asyncio.to_thread(self.store.update, job_id, **fields)
+
+    def cancel(self, job_id):
+        task = self._tasks.get(job_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def _notify(self, job_id):
+        self._versions[job_id] = self._versions.get(job_id, 0) + 1
+        for event in self._waiters.pop(job_id, []):
+            event.set()
+
+    def version(self, job_id):
+        """Take this before reading a job's state, then pass it to wait_for_update."""
+        return self._versions.get(job_id, 0)
+
+    async def wait_for_update(self, job_id, version, timeout):
+        """Wait until the job changes after `version`; returns at once if it already has."""
+        if self.version(job_id) != version:
+            return True
+        event = asyncio.Event()
+        self._waiters.setdefault(job_id, []).append(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters = self._waiters.get(job_id)
+            if waiters and event in waiters:
+                waiters.remove(event)
+                if not waiters:
+                    del self._waiters[job_id]
+
+    async def shutdown(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+job_manager = JobManager(JobStore(JOBS_DB_PATH))
+
+
+async def submit_job(kind, params=None):
+    """Submit a job and build the 202 response body pointing at its status and event stream."""
+    job_id = await job_manager.submit(kind, params)
+    return {
+        "job_id": job_id,
+        "status_url": f"/api/jobs/{job_id}",
+        "results_url": f"/api/jobs/{job_id}/results",
+        "events_url": f"/api/jobs/{job_id}/events"
+    }
+
+
+async def _get_job_or_404(job_id):
+    job = await asyncio.to_thread(job_manager.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.get("/jobs")
+async def list_jobs(limit: int = 50):
+    """Most recent jobs, newest first."""
+    return {"jobs": await asyncio.to_thread(job_manager.store.list, limit)}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of a job."""
+    return await _get_job_or_404(job_id)
+
+
+@router.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, since: int = 0):
+    """Results produced so far; pass the last seen seq as `since` to page through partial results."""
+    job = await _get_job_or_404(job_id)
+    results = await asyncio.to_thread(job_manager.store.results, job_id, since)
+    return {
+        "status": job["status"],
+        "done": job["done"],
+        "total": job["total"],
+        "last_seq": results[-1][0] if results else since,
+        "results": [item for _, item in results]
+    }
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, since: int = 0):
+    """Server-sent events: one `result` event per finished item, then `end` with the final status."""
+    await _get_job_or_404(job_id)
+
+    async def events():
+        seq = since
+        while True:
+            # Any update after this point wakes the wait below, even if it lands before we wait
+            version = job_manager.version(job_id)
+            for seq, item in await asyncio.to_thread(job_manager.store.results, job_id, seq):
+                yield f"id: {seq}\nevent: result\ndata: {json.dumps(item, default=str)}\n\n"
+            job = await asyncio.to_thread(job_manager.store.get, job_id)
+            if job["status"] in TERMINAL_STATUSES:
+                # Results written between the two reads are sent before the end event
+                if await asyncio.to_thread(job_manager.store.results, job_id, seq):
+                    continue
+                yield f"event: end\ndata: {json.dumps({'status': job['status'], 'error': job['error']})}\n\n"
+                return
+            if not await job_manager.wait_for_update(job_id, version, timeout=15):
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; results produced so far are kept."""
+    job = await _get_job_or_404(job_id)
+    if job["status"] in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} already {job['status']}")
+    if not job_manager.cancel(job_id):
+        # Queued/running elsewhere: another worker process owns it, or its owner died
+        # and the next startup will mark it interrupted
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is not running in this process")
+    return {"job_id": job_id, "status": "cancelling"}
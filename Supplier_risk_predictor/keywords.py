@@ -0,0 +1,158 @@
+import unicodedata
+from collections import deque
+
+
+def _is_word_char(ch):
+    # Combining marks count as word characters so Devanagari matras don't split words
+    return ch == "_" or ch.isalnum() or unicodedata.category(ch).startswith("M")
+
+
+def _normalize(keyword):
+    return " ".join(keyword.lower().split())
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a fixed keyword set.
+
+    Every text is scanned once regardless of how many keywords there are.
+    Matches must sit on word boundaries, so "fire" does not hit "firearm" and
+    "riot" does not hit "patriot". `inflections` maps a keyword to the other
+    forms that count as it ("flood" -> ["floods", "flooding"]); they are
+    added to the automaton and reported as the base keyword. Forms are
+    listed rather than derived, since a rule would also add ones with other
+    meanings ("striking", "fired").
+    """
+
+    def __init__(self, keywords, inflections=None):
+        # keywords: iterable of strings, or a mapping of keyword -> weight
+        if isinstance(keywords, dict):
+            weighted = keywords.items()
+        else:
+            weighted = ((keyword, 1.0) for keyword in keywords)
+        self.keywords = []
+        self.weights = {}
+        for keyword, weight in weighted:
+            keyword = _normalize(keyword)
+            if keyword and keyword not in self.weights:
+                self.keywords.append(keyword)
+                self.weights[keyword] = weight
+        self.inflections = {
+            _normalize(keyword): [_normalize(form) for form in forms]
+            for keyword, forms in (inflections or {}).items()
+        }
+        self._build()
+
+    def _patterns(self):
+        # (surface form, index of the keyword it reports); a form that is itself a keyword reports that keyword
+        patterns = [(keyword, index) for index, keyword in enumerate(self.keywords)]
+        seen = set(self.weights)
+        for index, keyword in enumerate(self.keywords):
+            for form in self.inflections.get(keyword, ()):
+                if form and form not in seen:
+                    seen.add(form)
+                    patterns.append((form, index))
+        return patterns
+
+    def _build(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._lengths = []
+        for pattern, (form, index) in enumerate(self._patterns()):
+            self._lengths.append((len(form), index))
+            state = 0
+            for ch in form:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(pattern)
+
+        # Breadth-first pass sets failure links and merges outputs of suffix states
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    @staticmethod
+    def _fold(text):
+        """Lowercased text plus, for each of its characters, the index of the input character it came from."""
+        folded = []
+        origin = []
+        for position, ch in enumerate(text):
+            lowered = ch.lower()
+            folded.append(lowered)
+            origin.extend([position] * len(lowered))
+        return "".join(folded), origin
+
+    def find(self, text):
+        """Return (start, end, keyword) for every boundary-respecting match, in text order.
+
+        Positions index into the text as given, even where lowercasing changes
+        its length (e.g. "İ" lowercases to two characters).
+        """
+        text, origin = self._fold(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        state = 0
+        for position, ch in enumerate(text):
+            # Collapse whitespace runs so multi-word keywords match across line breaks
+            if ch.isspace():
+                ch = " "
+                if position and text[position - 1].isspace():
+                    continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern in out[state]:
+                length, index = self._lengths[pattern]
+                end = position + 1
+                start = self._match_start(text, end, length)
+                if (start == 0 or not _is_word_char(text[start - 1])) and (
+                    end == len(text) or not _is_word_char(text[end])
+                ):
+                    # Map back to the input: the match ends after the character its last folded character came from
+                    matches.append((origin[start], origin[end - 1] + 1, self.keywords[index]))
+        matches.sort()
+        return matches
+
+    def _match_start(self, text, end, length):
+        # Walk back over `length` normalised characters, treating whitespace runs as one
+        start = end
+        remaining = length
+        while remaining:
+            start -= 1
+            if text[start].isspace():
+                while start and text[start - 1].isspace():
+                    start -= 1
+            remaining -= 1
+        return start
+
+    def scan(self, text):
+        """Match positions, per-keyword counts and the summed weight of distinct keywords."""
+        matches = self.find(text or "")
+        counts = {}
+        for _, _, keyword in matches:
+            counts[keyword] = counts.get(keyword, 0) + 1
+        return {
+            "keywords": list(counts),
+            "counts": counts,
+            "positions": [(start, end) for start, end, _ in matches],
+            "weight": sum(self.weights[keyword] for keyword in counts)
+        }
+
+    def scan_batch(self, texts):
+        return [self.scan(text) for text in texts]
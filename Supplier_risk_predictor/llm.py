@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+from typing import Literal
+
+from pydantic import BaseModel, ValidationError
+
+import http_client
+from metrics import stage_timer
+from config import (
+    TOGETHER_API_URL, LLM_MODEL, LLM_TIMEOUT_SECONDS,
+    LLM_MAX_TOKENS_PER_SUPPLIER, LLM_BATCH_MAX_TOKENS, LLM_BATCH_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+INSTRUCTIONS = """
+You are a JSON-generating API that analyzes both recent news and weather data related to suppliers.
+
+Your task is to return ONLY a valid JSON object for each supplier using the format below.
+
+- Use the news content to detect issues such as strikes, financial trouble, factory incidents, legal actions, or operational disruptions.
+- Use weather data to identify environmental threats like floods, storms, extreme heat, or rainfall affecting operations or transport.
+- Determine the overall risk level based on the severity and combined impact of both sources.
+- Assess any potential supply chain impacts and include a clear explanation in the `reason` field if disruptions are likely.
+- The state field should indicate the Indian state where the supplier is physically located (e.g., Maharashtra, Tamil Nadu, Gujarat, etc.)
+"""
+
+OBJECT_FORMAT = """{
+  "supplier": "<supplier name>",
+  "issue": "<short summary of the most relevant issue>",
+  "risk_level": "<low|medium|high>",
+  "state": "<Indian state where the supplier is located>",
+  "reason": "<detailed reason combining both news events and weather impact, if applicable>"
+}"""
+
+
+class RiskReport(BaseModel):
+    supplier: str
+    issue: str
+    risk_level: Literal["low", "medium", "high"]
+    state: str
+    reason: str
+
+
+def _headers():
+    return {
+        "Authorization": f"Bearer {os.getenv('TOGETHER_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+
+def _payload(prompt, max_tokens, stream=False):
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": "You are a JSON API."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.2
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+ERROR_ISSUES = ("LLM response error", "LLM API error")
+
+def is_error_report(report):
+    return report.get("issue") in ERROR_ISSUES
+
+def _error_report(supplier_name, issue, reason):
+    return {
+        "supplier": supplier_name,
+        "issue": issue,
+        "risk_level": "high",
+        "reason": reason
+    }
+
+async def llm_generate_risk_report(supplier_name, news_json, road_json):
+    prompt = f"""{INSTRUCTIONS}
+STRICTLY FOLLOW this JSON structure. Return only valid JSON (no extra text or formatting comments):
+
+{OBJECT_FORMAT}
+Supplier: {supplier_name}
+News JSON: {json.dumps(news_json)}
+Road/Weather JSON: {json.dumps(road_json)}
+Analyze the above and return the JSON as specified.
+"""
+    with stage_timer("llm_call"):
+        response = await http_client.post(
+            TOGETHER_API_URL, headers=_headers(), json=_payload(prompt, LLM_MAX_TOKENS_PER_SUPPLIER),
+            timeout=LLM_TIMEOUT_SECONDS
+        )
+    if response.status_code == 200:
+        try:
+            content = response.json()["choices"][0]["message"]["content"]
+            return json.loads(content)
+        except Exception as e:
+            return _error_report(supplier_name, "LLM response error", f"Failed to parse LLM response: {str(e)}")
+    else:
+        return _error_report(supplier_name, "LLM API error", f"HTTP {response.status_code}: {response.text}")
+
+
+class JSONObjectStream:
+    """
+    Incremental parser that yields each top-level JSON object as soon as its
+    closing brace arrives. Array brackets, code fences and stray text between
+    objects are skipped, so a partially valid reply still yields its good entries.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text):
+        objects = []
+        for ch in text:
+            if self._depth == 0 and ch != "{":
+                continue
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    objects.append("".join(self._buffer))
+                    self._buffer = []
+        return objects
+
+
+def _normalize_name(name):
+    return " ".join(str(name).split()).lower()
+
+def _batch_prompt(items):
+    sections = "\n".join(
+        f"""### Supplier {position}
+Supplier: {item["supplier_name"]}
+News JSON: {json.dumps(item["news_json"])}
+Road/Weather JSON: {json.dumps(item["road_json"])}
+"""
+        for position, item in enumerate(items, start=1)
+    )
+    return f"""{INSTRUCTIONS}
+Return ONLY a JSON array containing exactly one object per supplier below, in the same order,
+each STRICTLY FOLLOWING this structure (no extra text or formatting comments):
+
+{OBJECT_FORMAT}
+
+{sections}
+Analyze each supplier above and return the JSON array as specified.
+"""
+
+async def _stream_batch(items):
+    """
+    Send one streamed completion for several suppliers and return the
+    schema-valid reports keyed by normalized supplier name. Entries are parsed
+    and validated as their tokens arrive.
+    """
+    wanted = {_normalize_name(item["supplier_name"]) for item in items}
+    max_tokens = min(LLM_MAX_TOKENS_PER_SUPPLIER * len(items), LLM_BATCH_MAX_TOKENS)
+    parser = JSONObjectStream()
+    reports = {}
+    async with http_client.stream(
+        "POST", TOGETHER_API_URL, headers=_headers(),
+        json=_payload(_batch_prompt(items), max_tokens, stream=True), timeout=LLM_TIMEOUT_SECONDS
+    ) as response:
+        if response.status_code != 200:
+            await response.aread()
+            logger.warning("LLM batch request failed: HTTP %s: %s", response.status_code, response.text)
+            return reports
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content") or ""
+            except (ValueError, KeyError, IndexError):
+                continue
+            for raw in parser.feed(delta):
+                try:
+                    report = RiskReport.model_validate_json(raw)
+                except ValidationError:
+                    continue
+                key = _normalize_name(report.supplier)
+                if key in wanted and key not in reports:
+                    reports[key] = report.model_dump()
+    return reports
+
+async def llm_generate_risk_reports(items):
+    """
+    Risk reports for several suppliers using batched prompts.
+
+    items: dicts with supplier_name, news_json and road_json. Suppliers whose
+    entry is missing or fails schema validation are retried in a smaller batch;
+    anything still missing after LLM_BATCH_MAX_RETRIES goes through the
+    single-supplier prompt. Results are returned in input order.
+    """
+    reports = {}
+    pending = list(items)
+    for _ in range(LLM_BATCH_MAX_RETRIES + 1):
+        if not pending:
+            break
+        try:
+            with stage_timer("llm_call"):
+                reports.update(await _stream_batch(pending))
+        except Exception as e:
+            logger.warning("LLM batch request error: %s", e)
+        pending = [item for item in pending if _normalize_name(item["supplier_name"]) not in reports]
+    for item in pending:
+        reports[_normalize_name(item["supplier_name"])] = await llm_generate_risk_report(
+            item["supplier_name"], item["news_json"], item["road_json"]
+        )
+    return [reports[_normalize_name(item["supplier_name"])] for item in items]
@@ -1,15 +1,76 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app import router  
 from storage_analysis import router as storage_router
+from geo import router as geo_router
+from jobs import router as jobs_router, job_manager
+from history import router as history_router
+from article_index import router as article_index_router
+from config import SENTIMENT_WARMUP, SENTIMENT_SERVING, WEB_CONCURRENCY
+from sentiment import (
+    sentiment_batcher, sentiment_cache, warm_up_model, model_status, is_model_ready, preload_model
+)
+from http_client import http_pool
+from news import news_cache
+from report_writer import report_files
+from metrics import render as render_metrics, start_request_timings, server_timing_header
+
+# Under `gunicorn --preload` (see gunicorn.conf.py) this runs once in the parent, before workers fork
+if SENTIMENT_SERVING == "preload":
+    preload_model()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model in the background so the server binds immediately and
+    # endpoints that don't score text are served during warm-up
+    warmup = asyncio.create_task(warm_up_model()) if SENTIMENT_WARMUP else None
+    # Jobs left queued/running by a process that has since exited can't be resumed
+    await asyncio.to_thread(job_manager.store.recover_interrupted)
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    await job_manager.shutdown()
+    await sentiment_batcher.close()
+    await sentiment_cache.flush()
+    await news_cache.flush()
+    await report_files.flush()
+    await http_pool.close()
 
 app = FastAPI(
     title="Supplier Risk Analyzer",
     description="API for analyzing supplier risks through news sentiment analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+STREAMED_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
+
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    """
+    Per-request breakdown of pipeline stage durations in a Server-Timing header.
+
+    Headers go out before a streamed body, so on the NDJSON/SSE routes the
+    header could only cover time to first byte; it is left off those responses
+    and their stage durations are only in /metrics.
+    """
+    timings = start_request_timings()
+    start = time.perf_counter()
+    response = await call_next(request)
+    if response.headers.get("content-type", "").split(";")[0] not in STREAMED_MEDIA_TYPES:
+        response.headers["Server-Timing"] = server_timing_header(timings, time.perf_counter() - start)
+    return response
+
 app.include_router(router, prefix="/api", tags=["Suppliers"])
 app.include_router(storage_router, prefix="/api", tags=["Storage Analysis"])
+app.include_router(geo_router, prefix="/api", tags=["Geo"])
+app.include_router(jobs_router, prefix="/api", tags=["Jobs"])
+app.include_router(history_router, prefix="/api", tags=["History"])
+app.include_router(article_index_router, prefix="/api", tags=["Search"])
 
 @app.get("/")
 def root():
@@ -20,12 +81,52 @@ def root():
         "endpoints": {
             "supplier_risk_report": "/api/risk-report",
             "analyze_supplier": "/api/analyze-supplier",
+            "suppliers": "/api/suppliers",
+            "supplier_facets": "/api/suppliers/facets",
+            "cache_stats": "/api/cache-stats",
+            "weather_prefetch": "/api/weather/prefetch",
+            "readiness": "/ready",
+            "metrics": "/metrics",
             "storage_demand_analysis": "/api/storage-demand-analysis",
+            "storage_demand_analysis_stream": "/api/storage-demand-analysis/stream",
+            "all_suppliers_llm_stream": "/api/analyze-all-suppliers-llm/stream",
             "storage_locations": "/api/storage-locations",
-            "storage_location_by_id": "/api/storage-location/{location_id}"
+            "storage_location_by_id": "/api/storage-location/{location_id}",
+            "nearest_storage": "/api/geo/nearest-storage?supplier_name=...",
+            "suppliers_near_location": "/api/geo/suppliers-near-location/{location_id}",
+            "within_radius": "/api/geo/within-radius?latitude=...&longitude=...",
+            "supplier_assignments": "/api/geo/supplier-assignments",
+            "jobs": "/api/jobs",
+            "job_status": "/api/jobs/{job_id}",
+            "job_results": "/api/jobs/{job_id}/results?since=0",
+            "job_events": "/api/jobs/{job_id}/events",
+            "history_rollups": "/api/history/rollups?scope=supplier|state|category",
+            "history_trend": "/api/history/trend?key=...&days=30",
+            "history_risk_changes": "/api/history/risk-changes",
+            "history_verdicts": "/api/history/verdicts?entity=...",
+            "article_search": "/api/articles/search?q=...&supplier=...&keyword=...&sort=score|recency|risk"
         }
     }
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until the sentiment model has loaded (unless warm-up is disabled)"""
+    is_ready = is_model_ready() or not SENTIMENT_WARMUP
+    body = {"ready": is_ready, "model": model_status()}
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage latencies, upstream errors/retries, cache hit ratios and model batch sizes in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from model_server import start_sidecar, stop_sidecar
+
+    # Workers started by uvicorn are spawned, not forked, so "preload" sharing needs gunicorn.conf.py
+    sidecar = start_sidecar() if SENTIMENT_SERVING == "sidecar" else None
+    try:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WEB_CONCURRENCY)
+    finally:
+        stop_sidecar(sidecar)
\ No newline at end of file
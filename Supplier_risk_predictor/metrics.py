@@ -0,0 +1,177 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers cache hits (sub-ms) through slow LLM completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labelnames, values):
+    if not labelnames:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        labelnames = self.labelnames + ("le",)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f"{self.name}_bucket{_label_text(labelnames, key + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_label_text(labelnames, key + ('+Inf',))} {series['count']}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {series['count']}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "supplier_risk_stage_seconds", "Time spent in each pipeline stage.", ["stage"]
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "supplier_risk_upstream_request_seconds", "Latency of HTTP calls to each upstream host.", ["host"]
+)
+UPSTREAM_RETRIES = Counter(
+    "supplier_risk_upstream_retries_total", "HTTP requests retried after a transport error or 429/5xx.", ["host"]
+)
+UPSTREAM_ERRORS = Counter(
+    "supplier_risk_upstream_errors_total", "Upstream transport errors and non-2xx responses.", ["host", "reason"]
+)
+SENTIMENT_BATCH_SIZE = Histogram(
+    "supplier_risk_sentiment_batch_size", "Texts per sentiment model forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+SENTIMENT_ERRORS = Counter(
+    "supplier_risk_sentiment_errors_total", "Texts that fell back to Neutral because inference failed."
+)
+SENTIMENT_REJECTED = Counter(
+    "supplier_risk_sentiment_rejected_total", "Requests answered 503 because the inference queue was full."
+)
+DUPLICATE_ARTICLES = Counter(
+    "supplier_risk_duplicate_articles_total", "Articles scored through an earlier near-duplicate's cluster."
+)
+
+_registry = [
+    STAGE_SECONDS, UPSTREAM_REQUEST_SECONDS, UPSTREAM_RETRIES, UPSTREAM_ERRORS,
+    SENTIMENT_BATCH_SIZE, SENTIMENT_ERRORS, SENTIMENT_REJECTED, DUPLICATE_ARTICLES
+]
+_caches = {}
+
+
+def register_cache(name, cache):
+    """Expose a cache.Cache's hit/miss counters on /metrics."""
+    _caches[name] = cache
+
+
+def _render_caches():
+    series = {
+        "supplier_risk_cache_hits_total": ("counter", "Cache lookups served from memory or disk.", "hits"),
+        "supplier_risk_cache_misses_total": ("counter", "Cache lookups that went to the source.", "misses"),
+        "supplier_risk_cache_hit_ratio": ("gauge", "Hits over lookups since start.", "hit_ratio"),
+        "supplier_risk_cache_bytes": ("gauge", "Approximate in-memory size of cached values.", "bytes"),
+    }
+    stats = {name: cache.stats() for name, cache in sorted(_caches.items())}
+    lines = []
+    for metric, (kind, documentation, field) in series.items():
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{cache="{name}"}} {values[field]}' for name, values in stats.items()]
+    return lines
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    lines += _render_caches()
+    return "\n".join(lines) + "\n"
+
+
+# Per-request stage totals for the Server-Timing header; None outside a request
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request_timings():
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def detach_request_timings():
+    """Stop attributing this task's work to the request that happened to start it (for shared workers)."""
+    _request_timings.set(None)
+
+
+@contextmanager
+def request_timer(stage):
+    """Add the block's duration to the current request's Server-Timing breakdown only."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def stage_timer(stage):
+    """Record the block's duration in the stage histogram and the current request's breakdown."""
+    start = time.perf_counter()
+    try:
+        with request_timer(stage):
+            yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def server_timing_header(timings, total):
+    """Stage durations as a Server-Timing value in milliseconds; concurrent stages can sum past the total."""
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in sorted(timings.items())]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
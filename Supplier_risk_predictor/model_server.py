@@ -0,0 +1,200 @@
+"""
+Sentiment model serving shared by several web workers.
+
+SENTIMENT_SERVING selects how workers get a model:
+- "process": each worker loads its own (the default, fine for one worker)
+- "preload": the model is loaded once before workers are forked and its
+  weights are shared copy-on-write; see gunicorn.conf.py
+- "sidecar": one inference process owns the model and workers call it over a
+  Unix socket (run it with `python model_server.py`, or let main.py /
+  gunicorn.conf.py start it)
+
+Sidecar protocol: each message is a 4-byte big-endian length followed by that
+many bytes of JSON. Requests are {"op": "status"} or {"op": "analyze",
+"texts": [...]}; replies carry "model_id" and "results", or "error".
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+from config import SENTIMENT_SIDECAR_SOCKET, SENTIMENT_SIDECAR_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+
+
+def _send(sock, message):
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _receive_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Sentiment sidecar closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _receive(sock):
+    (size,) = _HEADER.unpack(_receive_exactly(sock, _HEADER.size))
+    return json.loads(_receive_exactly(sock, size))
+
+
+class SidecarModel:
+    """
+    Client for the sentiment sidecar with SentimentModel's interface.
+
+    Each calling thread keeps its own connection and reconnects once if the
+    sidecar restarted in between. Construction waits up to `timeout` seconds
+    for the sidecar to accept connections.
+    """
+
+    def __init__(self, socket_path=SENTIMENT_SIDECAR_SOCKET, timeout=SENTIMENT_SIDECAR_TIMEOUT_SECONDS):
+        self.socket_path = str(socket_path)
+        self._local = threading.local()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.model_id = self._call({"op": "status"})["model_id"]
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(f"Sentiment sidecar not reachable at {self.socket_path}")
+                time.sleep(0.2)
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _drop_connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _call(self, request):
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                _send(sock, request)
+                reply = _receive(sock)
+                break
+            except (ConnectionError, BrokenPipeError):
+                # A stale connection from before a sidecar restart: reconnect once
+                self._drop_connection()
+                if attempt:
+                    raise
+            except OSError:
+                self._drop_connection()
+                raise
+        if "error" in reply:
+            raise RuntimeError(f"Sentiment sidecar error: {reply['error']}")
+        return reply
+
+    def analyze_batch(self, texts):
+        if not texts:
+            return []
+        return self._call({"op": "analyze", "texts": list(texts)})["results"]
+
+    def analyze(self, text):
+        return self.analyze_batch([text])[0]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = _receive(self.connection)
+            except ConnectionError:
+                return
+            try:
+                if request.get("op") == "analyze":
+                    # One forward pass at a time; torch already spreads each one over the cores
+                    with self.server.inference_lock:
+                        results = self.server.model.analyze_batch(request["texts"])
+                    reply = {"model_id": self.server.model.model_id, "results": results}
+                else:
+                    reply = {"model_id": self.server.model.model_id}
+            except Exception as e:
+                logger.warning("Sentiment sidecar request failed: %s", e)
+                reply = {"error": str(e)}
+            _send(self.connection, reply)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(model, socket_path=SENTIMENT_SIDECAR_SOCKET):
+    """A server answering sidecar requests with `model`, listening on a Unix socket only this user can use."""
+    path = Path(socket_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A socket file left by a sidecar that didn't shut down cleanly would block bind()
+    path.unlink(missing_ok=True)
+    server = _Server(str(path), _Handler)
+    server.model = model
+    server.inference_lock = threading.Lock()
+    os.chmod(path, 0o600)
+    return server
+
+
+def serve(socket_path=SENTIMENT_SIDECAR_SOCKET):
+    """Load the model, then answer workers on the Unix socket until the process is stopped."""
+    from models import SentimentModel
+
+    model = SentimentModel()
+    server = make_server(model, socket_path)
+    path = Path(socket_path)
+    logger.info("Sentiment sidecar serving %s on %s", model.model_id, path)
+    # stop_sidecar() terminates the process; exit through the cleanup below
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+
+
+def start_sidecar(socket_path=SENTIMENT_SIDECAR_SOCKET):
+    """Start the sidecar in a child process; workers connect once it has loaded the model."""
+    # Spawned, not forked: the sidecar must not inherit the parent's sockets or threads
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(socket_path,), name="sentiment-sidecar", daemon=True
+    )
+    process.start()
+    return process
+
+
+def stop_sidecar(process, timeout=10):
+    if process is None or not process.is_alive():
+        return
+    process.terminate()
+    process.join(timeout)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    serve()
@@ -1,18 +1,146 @@
-from transformers import pipeline
+import logging
+import os
+from pathlib import Path
+
+from config import (
+    SENTIMENT_BACKEND, ONNX_MODEL_DIR, SENTIMENT_SERVING, SENTIMENT_INFERENCE_THREADS, WEB_CONCURRENCY,
+    TORCH_INTRA_OP_THREADS, TORCH_INTER_OP_THREADS
+)
+from metrics import SENTIMENT_ERRORS
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+
+def model_id(backend=SENTIMENT_BACKEND):
+    # Backends produce slightly different scores, so cached results are kept apart
+    return MODEL_NAME if backend == "transformers" else f"{MODEL_NAME}:{backend}-int8"
+
+
+def inference_thread_counts():
+    """
+    (intra-op, inter-op) threads for one forward pass. Unless configured, the
+    cores are split between every forward pass that can run at once on this
+    host: SENTIMENT_INFERENCE_THREADS per web worker, or one in the sidecar.
+    """
+    intra = TORCH_INTRA_OP_THREADS
+    if intra <= 0:
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+        if SENTIMENT_SERVING == "sidecar":
+            concurrent = 1
+        else:
+            concurrent = max(1, WEB_CONCURRENCY) * max(1, SENTIMENT_INFERENCE_THREADS)
+        intra = max(1, cores // concurrent)
+    return intra, max(1, TORCH_INTER_OP_THREADS)
+
+
+class TransformersBackend:
+    """PyTorch inference through the transformers pipeline."""
 
-class SentimentModel:
     def __init__(self):
-        self.model = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
+        # Imported here so processes that never score text don't pay for torch/transformers
+        import torch
+        from transformers import pipeline
+
+        intra, inter = inference_thread_counts()
+        torch.set_num_threads(intra)
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError as e:
+            # Only settable before torch's first parallel work in this process
+            logger.warning("Could not set torch inter-op threads: %s", e)
+        self.pipeline = pipeline("sentiment-analysis", model=MODEL_NAME)
+
+    def predict(self, texts):
+        return self.pipeline(texts, batch_size=len(texts), truncation=True)
+
+
+class OnnxBackend:
+    """
+    INT8 dynamically-quantized ONNX Runtime inference on CPU.
+
+    The model is exported with optimum and quantized with onnxruntime on first
+    use, then reused from ONNX_MODEL_DIR on later starts.
+    """
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR):
+        import numpy as np
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+
+        self._np = np
+        model_path = self._ensure_quantized(Path(model_dir))
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        self.id2label = AutoConfig.from_pretrained(MODEL_NAME).id2label
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads, options.inter_op_num_threads = inference_thread_counts()
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def _ensure_quantized(self, model_dir):
+        quantized = model_dir / "model.int8.onnx"
+        if quantized.exists():
+            return quantized
+        from optimum.exporters.onnx import main_export
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        main_export(MODEL_NAME, output=model_dir, task="text-classification")
+        quantize_dynamic(str(model_dir / "model.onnx"), str(quantized), weight_type=QuantType.QInt8)
+        return quantized
+
+    def predict(self, texts):
+        np = self._np
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="np")
+        feed = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+        logits = self.session.run(None, feed)[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [
+            {"label": self.id2label[int(index)], "score": float(probabilities[row, index])}
+            for row, index in enumerate(best)
+        ]
+
+
+BACKENDS = {
+    "transformers": TransformersBackend,
+    "onnx": OnnxBackend,
+}
+
+
+class SentimentModel:
+    def __init__(self, backend=SENTIMENT_BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown sentiment backend {backend!r}, expected one of {sorted(BACKENDS)}")
+        self.model_id = model_id(backend)
+        self.model = BACKENDS[backend]()
+
+    def _to_result(self, result):
+        label = result["label"]
+        score = result["score"]
+        return {
+            "sentiment": "Negative" if label == "NEGATIVE" else "Positive",
+            "polarity_score": -score if label == "NEGATIVE" else score
+        }
 
     def analyze(self, text):
         try:
-            result = self.model(text[:512])[0]
-            label = result["label"]
-            score = result["score"]
-            return {
-                "sentiment": "Negative" if label == "NEGATIVE" else "Positive",
-                "polarity_score": -score if label == "NEGATIVE" else score
-            }
+            return self._to_result(self.model.predict([text[:512]])[0])
         except Exception as e:
-            print("Sentiment analysis error:", e)
+            logger.warning("Sentiment analysis error: %s", e)
+            SENTIMENT_ERRORS.inc()
             return {"sentiment": "Neutral", "polarity_score": 0.0}
+
+    def analyze_batch(self, texts):
+        """Run one padded forward pass over a list of texts, results in input order."""
+        if not texts:
+            return []
+        try:
+            results = self.model.predict([text[:512] for text in texts])
+            return [self._to_result(result) for result in results]
+        except Exception as e:
+            # Fall back to per-text inference so one bad input doesn't neutralise the batch
+            logger.warning("Batched sentiment analysis error, retrying per text: %s", e)
+            return [self.analyze(text) for text in texts]
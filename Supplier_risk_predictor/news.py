@@ -1,16 +1,33 @@
-import requests
-from config import GNEWS_API_KEY, GNEWS_ENDPOINT
-import time 
+import logging
 
-def fetch_news(supplier_name):
-    time.sleep(1)  
-    response = requests.get(GNEWS_ENDPOINT, params={
-        "q": supplier_name,
-        "token": GNEWS_API_KEY,
-        "lang": "en",
-        "sortby": "publishedAt",
-        "max": 3
-    })
+import http_client
+from cache import Cache
+from concurrency import gnews_limiter
+from metrics import register_cache, stage_timer
+from config import (
+    GNEWS_API_KEY, GNEWS_ENDPOINT,
+    NEWS_CACHE_TTL_SECONDS, NEWS_CACHE_MAX_BYTES, NEWS_CACHE_BACKEND, NEWS_CACHE_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+news_cache = Cache(
+    ttl=NEWS_CACHE_TTL_SECONDS,
+    max_bytes=NEWS_CACHE_MAX_BYTES,
+    disk_path=NEWS_CACHE_PATH if NEWS_CACHE_BACKEND == "sqlite" else None
+)
+register_cache("news", news_cache)
+
+async def fetch_news(supplier_name):
+    # Rate limiting lives in concurrency.gnews_limiter; callers go through get_news
+    with stage_timer("news_fetch"):
+        response = await http_client.get(GNEWS_ENDPOINT, params={
+            "q": supplier_name,
+            "token": GNEWS_API_KEY,
+            "lang": "en",
+            "sortby": "publishedAt",
+            "max": 3
+        })
     if response.status_code == 200:
         data = response.json()
         articles = data.get("articles", [])
@@ -25,9 +42,20 @@ def fetch_news(supplier_name):
                 "source": article.get("source", {}).get("name", "")
             })
         return formatted_articles
-    print(f"Error fetching news for {supplier_name}: {response.status_code}")
+    logger.warning("Error fetching news for %s: HTTP %s", supplier_name, response.status_code)
     return []
 
+def news_cache_key(query):
+    return "gnews:" + " ".join(query.split()).lower()
 
-
-
+async def get_news(query):
+    """
+    Cached, rate-limited news lookup. Concurrent callers asking for the same
+    query share one GNews request; empty results are not cached since
+    fetch_news also returns [] on upstream errors.
+    """
+    return await news_cache.get_or_fetch(
+        news_cache_key(query),
+        lambda: gnews_limiter.run(fetch_news, query),
+        should_cache=bool
+    )
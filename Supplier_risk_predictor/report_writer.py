@@ -0,0 +1,321 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+import tempfile
+import textwrap
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from config import REPORT_JSON_FORMAT
+from metrics import STAGE_SECONDS
+
+try:
+    import orjson
+except ImportError:  # Optional: faster serialization when installed
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Entries are buffered and handed to a worker thread in chunks of about this size
+FLUSH_BYTES = 64 * 1024
+
+
+def dumps(value, compact=None):
+    """
+    Serialize a report value: indented like json.dump(..., indent=2), or
+    compact when REPORT_JSON_FORMAT=compact. Uses orjson when it's installed.
+    """
+    if compact is None:
+        compact = REPORT_JSON_FORMAT == "compact"
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | (0 if compact else orjson.OPT_INDENT_2)
+        return orjson.dumps(value, default=str, option=option).decode("utf-8")
+    if compact:
+        return json.dumps(value, default=str, separators=(",", ":"))
+    return json.dumps(value, default=str, indent=2)
+
+
+def report_slug(name):
+    """File-name-safe form of a supplier name ("Tata Consumer Products" -> "tata_consumer_products")."""
+    return re.sub(r"[^\w.-]+", "_", name.strip().lower()).strip("._") or "unnamed"
+
+
+def _write_atomically(path, text):
+    """Write text under a unique temporary name in the target directory, then rename it into place."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        # mkstemp creates the file owner-only; reports are meant to be shared
+        os.chmod(fd, 0o644)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+class ReportFiles:
+    """
+    Report file writes that never block the event loop: serialization and disk
+    I/O run in a worker thread, one at a time per target path.
+
+    replace() rewrites a whole file atomically (temp file + rename). Writes to a
+    path that queue up while one is in progress are coalesced, so only the
+    newest value is written and every caller waiting on an older one is
+    released by it. append() adds records as JSON lines; records queued while a
+    write is in progress go out together in one write.
+
+    Both return a future that resolves once the data is on disk (or raises the
+    write error), so callers can await it or move on.
+    """
+
+    _EMPTY = object()
+
+    def __init__(self):
+        self._pending = {}
+        # Drain tasks are referenced until done, so none is collected mid-write
+        self._drains = set()
+
+    def _target(self, path):
+        path = Path(path)
+        key = os.path.abspath(path)
+        target = self._pending.get(key)
+        if target is None:
+            target = self._pending[key] = {
+                "path": path, "replace": self._EMPTY, "compact": None, "lines": [], "waiters": [], "writing": []
+            }
+            drain = asyncio.ensure_future(self._drain(key))
+            self._drains.add(drain)
+            drain.add_done_callback(self._drained)
+        future = asyncio.get_running_loop().create_future()
+        target["waiters"].append(future)
+        return target, future
+
+    def replace(self, path, value, compact=None):
+        target, future = self._target(path)
+        target["replace"] = value
+        target["compact"] = compact
+        target["lines"] = []
+        return future
+
+    def append(self, path, records):
+        target, future = self._target(path)
+        target["lines"].extend(records)
+        return future
+
+    def _drained(self, drain):
+        self._drains.discard(drain)
+        if not drain.cancelled() and drain.exception() is not None:
+            logger.error("Report file writer failed: %s", drain.exception())
+
+    async def _drain(self, key):
+        while True:
+            target = self._pending[key]
+            if target["replace"] is self._EMPTY and not target["lines"]:
+                del self._pending[key]
+                return
+            waiters = target["writing"] = target["waiters"]
+            value, compact, records = target["replace"], target["compact"], target["lines"]
+            target.update(replace=self._EMPTY, compact=None, lines=[], waiters=[])
+            try:
+                await asyncio.to_thread(self._flush, target["path"], value, compact, records)
+            except Exception as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                        # Retrieved here so callers that don't await don't log an unhandled error
+                        waiter.exception()
+            else:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+    def _flush(self, path, value, compact, records):
+        start = time.perf_counter()
+        if value is not self._EMPTY:
+            _write_atomically(path, dumps(value, compact) + "\n")
+        if records:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(dumps(record, compact=True) + "\n" for record in records))
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="file_write")
+
+    async def flush(self):
+        """Wait until everything queued so far is written and the drain tasks have finished."""
+        waiters = [
+            waiter for target in self._pending.values() for waiter in target["writing"] + target["waiters"]
+        ]
+        pending = waiters + list(self._drains)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+report_files = ReportFiles()
+
+
+class PartitionedReportStore:
+    """
+    Append-only report history, one JSON line per report in
+    <root>/<YYYY-MM-DD>/<supplier slug>.ndjson. Nothing is ever rewritten, so
+    a supplier's history is kept across runs and concurrent writers can't
+    clobber each other.
+    """
+
+    def __init__(self, root, files=report_files):
+        self.root = Path(root)
+        self.files = files
+
+    def partition(self, supplier_name, date=None):
+        date = date or datetime.utcnow().strftime("%Y-%m-%d")
+        return self.root / date / f"{report_slug(supplier_name)}.ndjson"
+
+    def append(self, supplier_name, report, date=None):
+        """Queue a report for the supplier's partition; returns a future that resolves once it's written."""
+        return self.files.append(self.partition(supplier_name, date), [report])
+
+    def read(self, supplier_name, date=None):
+        """Reports stored for a supplier on one date (today by default), oldest first."""
+        path = self.partition(supplier_name, date)
+        if not path.exists():
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+class JSONReportWriter:
+    """
+    Writes a JSON report one entry at a time, so a fleet run never holds the
+    whole report in memory. Entries form a top-level array, or the `key` array
+    inside an object that starts with `header` and ends with `count_field`
+    (the number of entries written) and then any fields put in `footer` before
+    the block exits. Indented output matches json.dump(..., indent=2).
+
+    Used as `async with`: entries are serialized on the loop but buffered and
+    written by a worker thread, so disk I/O never blocks other requests.
+
+    The file is built under a unique temporary name and renamed into place on a
+    clean exit from the `async with` block, so readers never see a half-written
+    report. When runs for the same path overlap, the one that started last
+    wins: an older run finishing afterwards discards its file instead of
+    replacing the newer report.
+    """
+
+    _generations = itertools.count(1)
+    _committed = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path, key=None, header=None, count_field=None, compact=None):
+        self.path = Path(path)
+        self.key = key
+        self.header = header or {}
+        self.count_field = count_field
+        self.footer = {}
+        self.compact = REPORT_JSON_FORMAT == "compact" if compact is None else compact
+        self.count = 0
+        self._temp_path = None
+        self._generation = None
+        self._file = None
+        self._buffer = []
+        self._buffered = 0
+        self._write_seconds = 0.0
+        self._indent = "    " if key else "  "
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name + ".", suffix=".tmp")
+        self._temp_path = Path(temp_name)
+        os.chmod(fd, 0o644)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+
+    async def __aenter__(self):
+        self._generation = next(self._generations)
+        await asyncio.to_thread(self._open)
+        if not self.key:
+            self._queue("[")
+        elif self.compact:
+            self._queue("{" + "".join(f"{json.dumps(name)}:{self._dump(value)}," for name, value in self.header.items()))
+            self._queue(f"{json.dumps(self.key)}:[")
+        else:
+            self._queue("{\n")
+            for name, value in self.header.items():
+                self._queue(f"  {json.dumps(name)}: {self._dump(value)},\n")
+            self._queue(f"  {json.dumps(self.key)}: [")
+        return self
+
+    def _dump(self, value):
+        if self.compact:
+            return dumps(value, compact=True)
+        return dumps(value, compact=False).replace("\n", "\n  ")
+
+    def _queue(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+
+    def _write_buffer(self, chunks):
+        start = time.perf_counter()
+        self._file.write("".join(chunks))
+        return time.perf_counter() - start
+
+    async def _flush(self):
+        chunks, self._buffer, self._buffered = self._buffer, [], 0
+        if chunks:
+            self._write_seconds += await asyncio.to_thread(self._write_buffer, chunks)
+
+    async def write(self, entry):
+        if self.compact:
+            self._queue(("" if self.count == 0 else ",") + dumps(entry, compact=True))
+        else:
+            self._queue("\n" if self.count == 0 else ",\n")
+            self._queue(textwrap.indent(dumps(entry, compact=False), self._indent))
+        self.count += 1
+        if self._buffered >= FLUSH_BYTES:
+            await self._flush()
+
+    def _discard(self):
+        self._file.close()
+        self._temp_path.unlink(missing_ok=True)
+
+    def _commit(self):
+        start = time.perf_counter()
+        self._file.close()
+        target = str(self.path.resolve())
+        with self._lock:
+            if self._committed.get(target, 0) > self._generation:
+                self._temp_path.unlink(missing_ok=True)
+            else:
+                os.replace(self._temp_path, self.path)
+                self._committed[target] = self._generation
+        return time.perf_counter() - start
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Shielded so a cancelled run still removes its temporary file
+            await asyncio.shield(asyncio.to_thread(self._discard))
+            return False
+        if self.compact:
+            self._queue("]")
+            if self.key:
+                if self.count_field:
+                    self._queue(f",{json.dumps(self.count_field)}:{self.count}")
+                for name, value in self.footer.items():
+                    self._queue(f",{json.dumps(name)}:{self._dump(value)}")
+                self._queue("}")
+        else:
+            self._queue(f"\n{self._indent[:-2]}]" if self.count else "]")
+            if self.key:
+                if self.count_field:
+                    self._queue(f",\n  {json.dumps(self.count_field)}: {self.count}")
+                for name, value in self.footer.items():
+                    self._queue(f",\n  {json.dumps(name)}: {self._dump(value)}")
+                self._queue("\n}")
+        await self._flush()
+        commit_seconds = await asyncio.to_thread(self._commit)
+        # Observed once per report: the sum of all incremental writes plus finalisation
+        STAGE_SECONDS.observe(self._write_seconds + commit_seconds, stage="file_write")
+        return False
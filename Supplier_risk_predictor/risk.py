@@ -1,7 +1,24 @@
-from config import RISK_KEYWORDS
+from config import RISK_KEYWORDS, RISK_KEYWORD_INFLECTIONS, RISK_KEYWORD_WEIGHTS
+from keywords import KeywordMatcher
+from metrics import stage_timer
+
+# Built once at import; scan cost does not grow with the number of keywords
+risk_matcher = KeywordMatcher(
+    {kw: RISK_KEYWORD_WEIGHTS.get(kw, 1.0) for kw in RISK_KEYWORDS}, RISK_KEYWORD_INFLECTIONS
+)
+
+def _to_risk(scan):
+    score = min(int(round(scan["weight"] * 2)), 10)
+    return {
+        "keywords": scan["keywords"],
+        "keyword_counts": scan["counts"],
+        "positions": scan["positions"],
+        "risk_score": score
+    }
 
 def analyze_risk(text):
-    text_lower = text.lower()
-    risk_hits = [kw for kw in RISK_KEYWORDS if kw in text_lower]
-    score = min(len(risk_hits) * 2, 10)
-    return {"keywords": risk_hits, "risk_score": score}
+    return _to_risk(risk_matcher.scan(text))
+
+def analyze_risk_batch(texts):
+    with stage_timer("keyword_scan"):
+        return [_to_risk(scan) for scan in risk_matcher.scan_batch(texts)]
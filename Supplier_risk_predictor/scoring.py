@@ -0,0 +1,125 @@
+import numpy as np
+
+# Mean polarity beyond ±SENTIMENT_THRESHOLD is Positive/Negative; beyond ±HIGH_CONFIDENCE_THRESHOLD the trend is High confidence
+SENTIMENT_THRESHOLD = 0.2
+HIGH_CONFIDENCE_THRESHOLD = 0.5
+
+
+def is_scored(result):
+    """Whether sentiment inference succeeded: the model only yields Positive/Negative, so Neutral means it failed."""
+    return result.get("sentiment") != "Neutral" and result.get("polarity_score") is not None
+
+
+def classify(means, counts):
+    """
+    (sentiment, demand_trend, confidence) label arrays for per-group mean
+    polarities. Groups without any scores are Neutral, Stable and Low confidence.
+    """
+    means = np.asarray(means, dtype=float)
+    counts = np.asarray(counts)
+    positive = means > SENTIMENT_THRESHOLD
+    negative = means < -SENTIMENT_THRESHOLD
+    sentiment = np.where(positive, "Positive", np.where(negative, "Negative", "Neutral"))
+    demand_trend = np.where(positive, "Increasing", np.where(negative, "Decreasing", "Stable"))
+    confidence = np.where(np.abs(means) > HIGH_CONFIDENCE_THRESHOLD, "High", "Medium")
+    confidence = np.where(counts == 0, "Low", confidence)
+    return sentiment, demand_trend, confidence
+
+
+def _factorize(column):
+    """Integer codes for a column of hashable values, plus the distinct values in first-seen order."""
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in column), dtype=np.int64, count=len(column))
+    return codes, list(index)
+
+
+def group_means(values, keys):
+    """
+    Mean and count of `values` per distinct combination of the key columns.
+    Returns (group key columns, means, counts).
+    """
+    values = np.asarray(values, dtype=float)
+    if not keys:
+        count = len(values)
+        mean = values.sum() / count if count else 0.0
+        return [], np.array([mean]), np.array([count])
+    combined = np.zeros(len(values), dtype=np.int64)
+    uniques = []
+    for key in keys:
+        codes, distinct = _factorize(key)
+        combined = combined * len(distinct) + codes
+        uniques.append(distinct)
+    groups, inverse = np.unique(combined, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    counts = np.bincount(inverse, minlength=len(groups))
+    sums = np.bincount(inverse, weights=values, minlength=len(groups))
+    # Unpack the mixed-radix group codes back into one code per key column
+    key_columns = []
+    for distinct in reversed(uniques):
+        groups, codes = np.divmod(groups, len(distinct))
+        key_columns.append([distinct[code] for code in codes.tolist()])
+    return key_columns[::-1], sums / counts, counts
+
+
+def _rows(fields, key_columns, means, counts):
+    sentiment, demand_trend, confidence = classify(means, counts)
+    rows = []
+    for i in range(len(means)):
+        row = {field: str(column[i]) for field, column in zip(fields, key_columns)}
+        row.update(
+            average_polarity_score=float(means[i]),
+            article_count=int(counts[i]),
+            sentiment=str(sentiment[i]),
+            demand_trend=str(demand_trend[i]),
+            confidence=str(confidence[i])
+        )
+        rows.append(row)
+    return rows
+
+
+def summarize(polarities):
+    """Mean polarity, article count and labels for a single group of scores."""
+    _, means, counts = group_means(polarities, [])
+    return _rows([], [], means, counts)[0]
+
+
+class ArticleScores:
+    """
+    Columnar table of article polarity scores tagged with grouping fields
+    (e.g. supplier, state, city, category). Rows are appended as plain lists and
+    aggregated with NumPy, so group-bys stay cheap at hundreds of thousands of articles.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._polarity = []
+        self._tags = {field: [] for field in self.fields}
+
+    def __len__(self):
+        return len(self._polarity)
+
+    def add(self, polarity, **tags):
+        self.extend([polarity], **tags)
+
+    def extend(self, polarities, **tags):
+        """Append scores that share the same tag values."""
+        polarities = list(polarities)
+        self._polarity.extend(polarities)
+        for field in self.fields:
+            self._tags[field].extend([tags.get(field)] * len(polarities))
+
+    def group_by(self, *fields, start=0, stop=None):
+        """
+        One row per distinct combination of `fields` with its mean polarity,
+        count and labels, over rows start:stop (all rows by default).
+        """
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {sorted(unknown)}")
+        polarity = self._polarity[start:stop]
+        if not fields:
+            return [summarize(polarity)]
+        if not polarity:
+            return []
+        key_columns, means, counts = group_means(polarity, [self._tags[field][start:stop] for field in fields])
+        return _rows(fields, key_columns, means, counts)
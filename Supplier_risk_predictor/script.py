@@ -1,4 +1,5 @@
 import json
+import sys
 import requests
 from datetime import datetime
 from pathlib import Path
@@ -6,22 +7,20 @@ from transformers import pipeline
 import os
 from dotenv import load_dotenv
 
+from config import INCREMENTAL_SCRIPT_STATE_PATH
+from incremental import IncrementalState
+from scoring import ArticleScores
+from risk import analyze_risk_batch
+from history import history_store
+from article_index import article_index
+from dedup import group_articles, cluster_members
+
 # --- Load Supplier Data ---
 with open("walmart_india_suppliers_final.json") as f:
     data = json.load(f)
 
 suppliers = data["suppliers"]
 
-# --- Expanded Risk Keywords ---
-RISK_KEYWORDS = [
-    "strike", "protest", "labour unrest", "shutdown", "fire", "flood",
-    "bharat bandh", "curfew", "rain havoc", "roadblock", "cyclone",
-    "factory accident", "supply chain disruption", "violence", "riot",
-    "earthquake", "landslide", "corruption", "economic slowdown",
-    "political instability", "commodity price hike", "drought",
-    "heatwave", "strike notice", "legal action"
-]
-
 # --- Hugging Face Sentiment Pipeline ---
 sentiment_pipeline = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
 
@@ -31,16 +30,6 @@ load_dotenv()  # Load environment variables from .env file if exists
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")  # Replace with your actual API key
 NEWS_ENDPOINT = "https://newsapi.org/v2/everything"
 
-# --- Risk Analysis ---
-def analyze_risk(text):
-    text_lower = text.lower()
-    risk_hits = [kw for kw in RISK_KEYWORDS if kw in text_lower]
-    score = min(len(risk_hits) * 2, 10)  # cap at 10
-    return {
-        "keywords": risk_hits,
-        "risk_score": score
-    }
-
 # --- Sentiment Analysis ---
 def analyze_sentiment(text):
     try:
@@ -71,17 +60,27 @@ def fetch_news_for_supplier(supplier_name):
         return []
 
 # --- Main Risk Evaluation Loop ---
+# Articles scored in earlier runs are reused; pass --full to rescore everything
+state = IncrementalState(INCREMENTAL_SCRIPT_STATE_PATH)
+if "--full" in sys.argv:
+    state.reset()
+
 risk_results = []
+scores = ArticleScores(fields=("supplier", "state", "city", "category"))
 for supplier in suppliers:
     name = supplier["supplier_name"]
     print(f"\n🔍 Processing: {name}")
-    articles = fetch_news_for_supplier(name)
+    articles = state.new_articles(name, fetch_news_for_supplier(name))
+    print(f"   {len(articles)} new article(s)")
     processed_articles = []
 
-    for article in articles:
-        content = article.get("description") or article.get("title", "")
-        risk = analyze_risk(content)
-        sentiment = analyze_sentiment(content)
+    # Syndicated copies of one story are scored once, through their near-duplicate cluster
+    clusters = group_articles(articles, lambda article: article.get("description") or article.get("title", ""))
+    # Same keyword matcher and weights as the API
+    risks = analyze_risk_batch([cluster["content"] for cluster in clusters])
+    for cluster, risk in zip(clusters, risks):
+        article = cluster["articles"][0]
+        sentiment = analyze_sentiment(cluster["content"])
         processed_articles.append({
             "title": article.get("title"),
             "url": article.get("url"),
@@ -89,41 +88,65 @@ for supplier in suppliers:
             "risk_keywords": risk["keywords"],
             "risk_score": risk["risk_score"],
             "sentiment": sentiment["sentiment"],
-            "polarity_score": sentiment["polarity_score"]
+            "polarity_score": sentiment["polarity_score"],
+            "cluster_id": cluster["cluster_id"],
+            "copies": len(cluster["articles"])
         })
 
-    
-
-    polarity_scores = [a["polarity_score"] for a in processed_articles]
-    average_polarity = sum(polarity_scores) / len(polarity_scores) if polarity_scores else 0.0
-
-    # --- Determine overall sentiment label ---
-    if average_polarity < -0.2:
-        overall_sentiment = "Negative"
-    elif average_polarity > 0.2:
-        overall_sentiment = "Positive"
-    else:
-        overall_sentiment = "Neutral"
+    members, member_entries = cluster_members(clusters, processed_articles)
+    if article_index is not None:
+        article_index.add(
+            list(zip(members, member_entries)),
+            supplier=name, state=supplier["state"], category=supplier["category_name"]
+        )
+    unscored = state.record_articles(name, members, member_entries)
+    processed_articles = state.articles(name) + unscored
+    if history_store is not None:
+        history_store.record_articles(
+            "supplier", name, processed_articles,
+            {"supplier": name, "state": supplier["state"], "category": supplier["category_name"]}
+        )
+
+    scores.extend(
+        [a["polarity_score"] for a in processed_articles],
+        supplier=name, state=supplier["state"], city=supplier["city"], category=supplier["category_name"]
+    )
 
     result = {
         "supplier_name": name,
         "state": supplier["state"],
         "city": supplier["city"],
         "category": supplier["category_name"],
-        "overall_sentiment": overall_sentiment,
-        "average_polarity_score": average_polarity,
         "articles": processed_articles
     }
     risk_results.append(result)
 
+# --- Overall sentiment per supplier and rollups, in one vectorized pass each ---
+by_supplier = {row["supplier"]: row for row in scores.group_by("supplier")}
+for result in risk_results:
+    summary = by_supplier.get(result["supplier_name"], {"sentiment": "Neutral", "average_polarity_score": 0.0})
+    articles = result.pop("articles")
+    result.update(
+        overall_sentiment=summary["sentiment"],
+        average_polarity_score=summary["average_polarity_score"],
+        articles=articles
+    )
+    if history_store is not None:
+        history_store.record_verdict(
+            "supplier", result["supplier_name"], {key: value for key, value in result.items() if key != "articles"},
+            {"supplier": result["supplier_name"], "state": result["state"], "category": result["category"]}
+        )
+
 # --- Save Risk Report ---
 output = {
     "generatedAt": datetime.utcnow().isoformat() + "Z",
-    "supplier_risk_report": risk_results
+    "supplier_risk_report": risk_results,
+    "rollups": {level: scores.group_by(level) for level in ("state", "city", "category")}
 }
 
 Path("output").mkdir(exist_ok=True)
 with open("output/supplier_risk_report.json", "w") as f:
     json.dump(output, f, indent=2)
+state.save()
 
 print("\n✅ Supplier risk report saved to output/supplier_risk_report.json")
@@ -1,6 +1,271 @@
-from models import SentimentModel
+import asyncio
+import gc
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-sentiment_model = SentimentModel()  # This loads only once
+from fastapi import HTTPException
+
+from cache import Cache
+from config import (
+    SENTIMENT_MAX_BATCH_SIZE, SENTIMENT_MAX_WAIT_MS,
+    SENTIMENT_CACHE_TTL_SECONDS, SENTIMENT_CACHE_MAX_BYTES, SENTIMENT_CACHE_BACKEND, SENTIMENT_CACHE_PATH,
+    SENTIMENT_SERVING, SENTIMENT_INFERENCE_THREADS, SENTIMENT_QUEUE_MAX
+)
+from models import SentimentModel, model_id
+from scoring import is_scored
+from model_server import SidecarModel
+from metrics import (
+    SENTIMENT_BATCH_SIZE, SENTIMENT_REJECTED, register_cache, stage_timer, request_timer, detach_request_timings
+)
+
+logger = logging.getLogger(__name__)
+
+# The model is loaded once per process, either by the startup warm-up or on first use.
+# In sidecar mode the "model" is a client for the shared inference process.
+_model = None
+_model_lock = threading.Lock()
+_model_state = {"status": "not_loaded", "error": None, "load_seconds": None}
+
+def get_sentiment_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model_state.update(status="loading", error=None)
+                started = time.perf_counter()
+                try:
+                    _model = SidecarModel() if SENTIMENT_SERVING == "sidecar" else SentimentModel()
+                except Exception as e:
+                    _model_state.update(status="failed", error=str(e))
+                    raise
+                if _model.model_id != model_id():
+                    # Cached results are keyed by the configured model, not the one the sidecar serves
+                    logger.warning("Sentiment model %s differs from configured %s", _model.model_id, model_id())
+                _model_state.update(status="ready", load_seconds=round(time.perf_counter() - started, 3))
+    return _model
+
+def preload_model():
+    """
+    Load the model in the parent process before workers are forked, so they
+    share its weights copy-on-write instead of each loading a copy.
+    """
+    get_sentiment_model()
+    # Keep the collector from touching (and so copying) the objects loaded so far
+    gc.freeze()
+
+async def warm_up_model():
+    try:
+        await asyncio.to_thread(get_sentiment_model)
+    except Exception as e:
+        logger.error("Sentiment model warm-up failed: %s", e)
+
+def model_status():
+    return dict(_model_state, model_id=model_id())
+
+def is_model_ready():
+    return _model is not None
+
+# Content-addressed results: the same article text scored by the same model is never re-run
+sentiment_cache = Cache(
+    ttl=SENTIMENT_CACHE_TTL_SECONDS,
+    max_bytes=SENTIMENT_CACHE_MAX_BYTES,
+    disk_path=SENTIMENT_CACHE_PATH if SENTIMENT_CACHE_BACKEND == "sqlite" else None
+)
+register_cache("sentiment", sentiment_cache)
+
+def sentiment_cache_key(text):
+    normalized = " ".join(text.split()).lower()
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{model_id()}:{digest}"
 
 def analyze_sentiment(text):
-    return sentiment_model.analyze(text)
+    return analyze_sentiment_batch([text])[0]
+
+def analyze_sentiment_batch(texts):
+    """
+    Blocking: cache lookups (including the SQLite tier) and the forward pass
+    run in the calling thread. For scripts and worker threads only; async
+    code uses analyze_sentiments(), which keeps both off the event loop.
+    """
+    keys = [sentiment_cache_key(text) for text in texts]
+    results = [sentiment_cache.get(key) for key in keys]
+    missing = [i for i, (found, _) in enumerate(results) if not found]
+    computed = []
+    if missing:
+        SENTIMENT_BATCH_SIZE.observe(len(missing))
+        with stage_timer("sentiment_inference"):
+            computed = get_sentiment_model().analyze_batch([texts[i] for i in missing])
+    output = [value for _, value in results]
+    for i, result in zip(missing, computed):
+        output[i] = result
+        if is_scored(result):
+            sentiment_cache.set(keys[i], result)
+    return output
+
+
+# Forward passes get their own threads, so they never hold up the default executor
+# that cache lookups, report writes and other blocking I/O share
+inference_executor = ThreadPoolExecutor(
+    max_workers=max(1, SENTIMENT_INFERENCE_THREADS), thread_name_prefix="sentiment-inference"
+)
+
+
+class MicroBatcher:
+    """
+    Gathers sentiment requests from concurrent handlers into batches.
+
+    A batch is flushed when it reaches max_batch_size or when max_wait_ms has
+    passed since its first request arrived. Forward passes run on `executor`,
+    at most `concurrency` at a time (one per executor thread), so the event loop keeps serving other
+    requests meanwhile; the model is resolved there too, so a batch arriving
+    during warm-up just waits.
+
+    At most max_queue texts wait for a forward pass. Callers block once it is
+    full; saturated() lets an endpoint turn new requests away up front instead.
+    """
+
+    def __init__(
+        self, model_loader, max_batch_size=SENTIMENT_MAX_BATCH_SIZE, max_wait_ms=SENTIMENT_MAX_WAIT_MS,
+        max_queue=SENTIMENT_QUEUE_MAX, executor=inference_executor, concurrency=SENTIMENT_INFERENCE_THREADS
+    ):
+        self.model_loader = model_loader
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue = max(1, max_queue)
+        self.executor = executor
+        self.concurrency = max(1, concurrency)
+        self._queue = None
+        self._loop = None
+        self._worker = None
+        self._running = set()
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            # A queue belongs to one event loop; requests queued on an old loop went with it
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._loop = loop
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            # Keep the queue: texts still waiting in it are served by the new worker
+            if self._worker is not None and not self._worker.cancelled() and self._worker.exception():
+                logger.error("Sentiment batch worker died, restarting: %s", self._worker.exception())
+            self._worker = asyncio.create_task(self._run())
+
+    def saturated(self):
+        return self._queue is not None and self._queue.full()
+
+    async def submit(self, text):
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        try:
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except BaseException:
+            # Taken off the queue but never scored: don't leave their callers waiting
+            for _, future in batch:
+                future.cancel()
+            raise
+        return batch
+
+    async def _run(self):
+        # The worker serves every request; time spent here is not the starting request's
+        detach_request_timings()
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            # Collect only once a thread is free: texts arriving meanwhile make the next batch fuller
+            await slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                slots.release()
+                raise
+            task = asyncio.create_task(self._infer(batch))
+            self._running.add(task)
+            task.add_done_callback(lambda done: (self._running.discard(done), slots.release()))
+
+    async def _infer(self, batch):
+        texts = [text for text, _ in batch]
+        SENTIMENT_BATCH_SIZE.observe(len(texts))
+        try:
+            with stage_timer("sentiment_inference"):
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, lambda: self.model_loader().analyze_batch(texts)
+                )
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for task in list(self._running):
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                future.cancel()
+
+
+sentiment_batcher = MicroBatcher(get_sentiment_model)
+
+async def require_inference_capacity():
+    """
+    Route dependency for endpoints that score text: answers 503 while the
+    inference queue is full, before the handler starts any work. Requests
+    already admitted (and background jobs) wait for room instead.
+    """
+    if sentiment_batcher.saturated():
+        SENTIMENT_REJECTED.inc()
+        raise HTTPException(
+            status_code=503, detail="Sentiment inference is at capacity, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+async def require_capacity_unless_background(background: bool = False):
+    """require_inference_capacity() for endpoints that can submit a job instead; a submitted job just queues."""
+    if not background:
+        await require_inference_capacity()
+
+async def analyze_sentiment_async(text):
+    return await sentiment_cache.get_or_fetch(
+        sentiment_cache_key(text),
+        lambda: sentiment_batcher.submit(text),
+        should_cache=is_scored
+    )
+
+async def analyze_sentiments(texts):
+    """Score many texts concurrently; cache misses share batches with other in-flight requests."""
+    with request_timer("sentiment_inference"):
+        return list(await asyncio.gather(*(analyze_sentiment_async(text) for text in texts)))
@@ -1,20 +1,37 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
 from pydantic import BaseModel
 import json
 from datetime import datetime
-from pathlib import Path
-from typing import List, Dict, Any
+from typing import Optional, List, Dict, Any
 
-from news import fetch_news
-from sentiment import analyze_sentiment
+from news import get_news, news_cache_key
+from sentiment import analyze_sentiments, require_inference_capacity, require_capacity_unless_background
+from concurrency import iter_bounded
+from datastore import storage_store, location_state, location_city
+from scoring import ArticleScores, summarize
+from jobs import job_manager, submit_job
+from report_writer import JSONReportWriter
+from risk import analyze_risk_batch
+from history import record_history
+from article_index import index_articles
+from dedup import cluster_articles, cluster_members
 
 router = APIRouter()
 
-# Load storage locations data
-def load_storage_locations():
+# Storage locations are served from the indexed in-memory store
+def load_storage_locations(**filters):
     try:
-        with open("storage_loc.json", "r") as f:
-            return json.load(f)
+        return storage_store.query(**filters)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Storage locations data not found")
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=500, detail="Invalid storage locations data format")
+
+def find_storage_location(location_id):
+    try:
+        return storage_store.get(location_id)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Storage locations data not found")
     except json.JSONDecodeError:
@@ -44,134 +61,244 @@ class StorageAnalysisResponse(BaseModel):
     average_polarity_score: float
     analysis_timestamp: str
 
-@router.get("/storage-demand-analysis", response_model=List[StorageAnalysisResponse])
-async def analyze_storage_demand():
+def _content(article):
+    return article.get("description") or article.get("title", "")
+
+async def score_category_news(product_category):
+    """
+    Fetch and score the news for one product category and add the scores to
+    the risk history and the article search index. Returns the number of
+    articles found and one polarity per near-duplicate cluster with usable
+    content, so a syndicated story counts once.
+    """
+    articles = await get_news(product_category)
+    if not articles:
+        return 0, []
+    # Near-duplicate copies share a cluster; sentiment runs once per cluster, in one batched call
+    clusters = await cluster_articles([article for article in articles if _content(article)], _content)
+    sentiment_results = await analyze_sentiments([cluster["content"] for cluster in clusters])
+    risks = analyze_risk_batch([cluster["content"] for cluster in clusters])
+    records = [
+        {
+            "title": cluster["articles"][0].get("title"),
+            "url": cluster["articles"][0].get("url"),
+            "publishedAt": cluster["articles"][0].get("publishedAt"),
+            "risk_keywords": risk["keywords"],
+            "risk_score": risk["risk_score"],
+            **result,
+            "cluster_id": cluster["cluster_id"],
+            "copies": len(cluster["articles"])
+        }
+        for cluster, result, risk in zip(clusters, sentiment_results, risks)
+    ]
+    await record_history("record_articles", "storage", product_category, records, {"category": product_category})
+    await index_articles(*cluster_members(clusters, records), category=product_category)
+    return len(articles), [result["polarity_score"] for result in sentiment_results]
+
+def _prediction(product_category, summary, news_count):
+    return DemandPrediction(
+        product_category=product_category,
+        sentiment=summary["sentiment"],
+        polarity_score=summary["average_polarity_score"],
+        demand_trend=summary["demand_trend"],
+        confidence=summary["confidence"],
+        recent_news_count=news_count
+    )
+
+def new_location_scores():
+    """Article scores for one run, tagged so any rollup is a group_by away."""
+    return ArticleScores(fields=("location_id", "category", "state", "city"))
+
+# Category scoring in flight, shared by overlapping runs: news query -> {"task", "runs"}
+_inflight_categories = {}
+
+def _category_done(key, entry, task):
+    if _inflight_categories.get(key) is entry:
+        del _inflight_categories[key]
+    # Mark retrieved: a failure whose locations were all cancelled isn't an unhandled error
+    if not task.cancelled():
+        task.exception()
+
+def plan_category_scoring(storage_locations):
+    """
+    Start one news fetch and scoring per distinct product category across all the given
+    locations (spellings that map to the same news query count once), joining
+    any another run already has in flight.
+    Returns the tasks keyed by news query; pass them to release_category_scoring when done.
+    """
+    categories = {}
+    for location in storage_locations:
+        for product_category in location["items"]:
+            categories.setdefault(news_cache_key(product_category), product_category)
+    planned = {}
+    for key, product_category in categories.items():
+        entry = _inflight_categories.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(score_category_news(product_category))
+            entry = _inflight_categories[key] = {"task": task, "runs": 0}
+            task.add_done_callback(lambda done, key=key, entry=entry: _category_done(key, entry, done))
+        entry["runs"] += 1
+        planned[key] = entry["task"]
+    return planned
+
+def release_category_scoring(planned):
+    """Drop this run's claim on its categories; unfinished ones no other run needs are cancelled."""
+    for key, task in planned.items():
+        entry = _inflight_categories.get(key)
+        if entry is None or entry["task"] is not task:
+            continue
+        entry["runs"] -= 1
+        if entry["runs"] == 0 and not task.done():
+            task.cancel()
+
+async def analyze_location(location, planned=None, scores=None):
+    """
+    Roll up the location's category scores; `planned` comes from
+    plan_category_scoring and `scores` is the run's ArticleScores, which
+    receives this location's articles.
+    """
+    if planned is None:
+        planned = plan_category_scoring([location])
+        try:
+            return await analyze_location(location, planned, scores)
+        finally:
+            release_category_scoring(planned)
+    if scores is None:
+        scores = new_location_scores()
+    # Shielded: one location being cancelled must not cancel scoring other locations share
+    category_results = await asyncio.gather(
+        *(asyncio.shield(planned[news_cache_key(product_category)]) for product_category in location["items"])
+    )
+
+    # Appended in one go (no await in between), so this location's rows are contiguous
+    first_row = len(scores)
+    state, city = location_state(location), location_city(location)
+    for product_category, (_, polarities) in zip(location["items"], category_results):
+        scores.extend(polarities, location_id=location["id"], category=product_category, state=state, city=city)
+    by_category = {row["category"]: row for row in scores.group_by("category", start=first_row)}
+    overall = scores.group_by(start=first_row)[0]
+
+    # Categories without scored articles are Neutral, Stable and Low confidence
+    location_predictions = [
+        _prediction(product_category, by_category.get(product_category) or summarize([]), news_count)
+        for product_category, (news_count, _) in zip(location["items"], category_results)
+    ]
+
+    # Create response for this location
+    return StorageAnalysisResponse(
+        location_id=location["id"],
+        address=location["address"],
+        coordinates=location["coordinates"],
+        demand_predictions=location_predictions,
+        overall_location_sentiment=overall["sentiment"],
+        average_polarity_score=overall["average_polarity_score"],
+        analysis_timestamp=datetime.utcnow().isoformat() + "Z"
+    )
+
+def storage_rollups(scores):
+    """Sentiment and demand rollups of a run's articles by state, city and product category."""
+    return {level: scores.group_by(level) for level in ("state", "city", "category")}
+
+async def iter_storage_demand_analysis(storage_locations):
+    """
+    (index, result) pairs in completion order; each result is appended to the
+    output file as it arrives and the file, ending with state/city/category
+    rollups, is moved into place when the run completes.
+    """
+    async with JSONReportWriter(
+        "output/storage_demand_analysis.json",
+        key="storage_demand_analysis",
+        header={"generatedAt": datetime.utcnow().isoformat() + "Z"},
+        count_field="total_locations"
+    ) as writer:
+        # Each distinct category is fetched and scored once, then fanned out to its locations
+        planned = plan_category_scoring(storage_locations)
+        scores = new_location_scores()
+        try:
+            async for index, result in iter_bounded(
+                lambda location: analyze_location(location, planned, scores), storage_locations
+            ):
+                await writer.write(result.dict())
+                await record_history(
+                    "record_verdict", "storage", str(result.location_id), result.dict(),
+                    {"state": location_state(storage_locations[index])}
+                )
+                yield index, result
+        finally:
+            release_category_scoring(planned)
+        writer.footer["rollups"] = storage_rollups(scores)
+
+async def run_storage_demand_analysis(storage_locations):
+    """All location results in input order."""
+    analysis_results = [None] * len(storage_locations)
+    async for index, result in iter_storage_demand_analysis(storage_locations):
+        analysis_results[index] = result
+    return analysis_results
+
+async def _storage_demand_job(job):
+    storage_locations = load_storage_locations()
+    await job.set_total(len(storage_locations))
+    async for _, result in iter_storage_demand_analysis(storage_locations):
+        await job.add_result(result.dict())
+
+job_manager.register("storage-demand-analysis", _storage_demand_job)
+
+@router.get(
+    "/storage-demand-analysis",
+    response_model=List[StorageAnalysisResponse],
+    dependencies=[Depends(require_capacity_unless_background)]
+)
+async def analyze_storage_demand(background: bool = False):
     """
     Analyze all storage locations and predict demand trends for their product categories
     based on recent news sentiment analysis.
+    background=true submits a job instead and returns its ID immediately (202);
+    follow it under /api/jobs/{job_id}.
     """
     try:
-        storage_locations = load_storage_locations()
-        analysis_results = []
-
-        for location in storage_locations:
-            location_predictions = []
-            location_polarities = []
-
-            # Analyze each product category in the location
-            for product_category in location["items"]:
-                # Fetch news for the product category
-                articles = fetch_news(product_category)
-                
-                if not articles:
-                    # If no news found, create a neutral prediction
-                    prediction = DemandPrediction(
-                        product_category=product_category,
-                        sentiment="Neutral",
-                        polarity_score=0.0,
-                        demand_trend="Stable",
-                        confidence="Low",
-                        recent_news_count=0
-                    )
-                    location_predictions.append(prediction)
-                    location_polarities.append(0.0)
-                    continue
-
-                # Analyze sentiment for each article
-                article_sentiments = []
-                for article in articles:
-                    content = article.get("description") or article.get("title", "")
-                    if content:
-                        sentiment_result = analyze_sentiment(content)
-                        article_sentiments.append(sentiment_result["polarity_score"])
-
-                # Calculate average sentiment for this product category
-                if article_sentiments:
-                    avg_polarity = sum(article_sentiments) / len(article_sentiments)
-                    location_polarities.append(avg_polarity)
-                    
-                    # Determine sentiment and demand trend
-                    if avg_polarity > 0.2:
-                        sentiment = "Positive"
-                        demand_trend = "Increasing"
-                        confidence = "High" if avg_polarity > 0.5 else "Medium"
-                    elif avg_polarity < -0.2:
-                        sentiment = "Negative"
-                        demand_trend = "Decreasing"
-                        confidence = "High" if avg_polarity < -0.5 else "Medium"
-                    else:
-                        sentiment = "Neutral"
-                        demand_trend = "Stable"
-                        confidence = "Medium"
-                else:
-                    avg_polarity = 0.0
-                    sentiment = "Neutral"
-                    demand_trend = "Stable"
-                    confidence = "Low"
-
-                prediction = DemandPrediction(
-                    product_category=product_category,
-                    sentiment=sentiment,
-                    polarity_score=avg_polarity,
-                    demand_trend=demand_trend,
-                    confidence=confidence,
-                    recent_news_count=len(articles)
-                )
-                location_predictions.append(prediction)
-
-            # Calculate overall location sentiment
-            if location_polarities:
-                overall_polarity = sum(location_polarities) / len(location_polarities)
-                overall_sentiment = (
-                    "Positive" if overall_polarity > 0.2
-                    else "Negative" if overall_polarity < -0.2
-                    else "Neutral"
-                )
-            else:
-                overall_polarity = 0.0
-                overall_sentiment = "Neutral"
-
-            # Create response for this location
-            location_analysis = StorageAnalysisResponse(
-                location_id=location["id"],
-                address=location["address"],
-                coordinates=location["coordinates"],
-                demand_predictions=location_predictions,
-                overall_location_sentiment=overall_sentiment,
-                average_polarity_score=overall_polarity,
-                analysis_timestamp=datetime.utcnow().isoformat() + "Z"
-            )
-            
-            analysis_results.append(location_analysis)
-
-        # Save analysis results to file
-        Path("output").mkdir(exist_ok=True)
-        output_data = {
-            "generatedAt": datetime.utcnow().isoformat() + "Z",
-            "total_locations": len(analysis_results),
-            "storage_demand_analysis": [result.dict() for result in analysis_results]
-        }
-        
-        with open("output/storage_demand_analysis.json", "w") as f:
-            json.dump(output_data, f, indent=2)
-
-        return analysis_results
+        if background:
+            return JSONResponse(await submit_job("storage-demand-analysis"), status_code=202)
+        return await run_storage_demand_analysis(load_storage_locations())
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing storage demand: {str(e)}")
 
+@router.get("/storage-demand-analysis/stream", dependencies=[Depends(require_inference_capacity)])
+async def stream_storage_demand_analysis():
+    """
+    Same analysis as /storage-demand-analysis, streamed as NDJSON: one location
+    per line in completion order. A failure mid-run ends the stream with an error line.
+    """
+    storage_locations = load_storage_locations()
+
+    async def lines():
+        try:
+            async for _, result in iter_storage_demand_analysis(storage_locations):
+                yield json.dumps(result.dict()) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Error analyzing storage demand: {str(e)}"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/storage-locations")
-async def get_all_storage_locations():
+async def get_all_storage_locations(
+    state: Optional[str] = None,
+    city: Optional[str] = None,
+    category: Optional[str] = None
+):
     """
-    Get all storage locations with their basic information.
+    Get all storage locations with their basic information, optionally
+    filtered by state, city or stocked product category.
     """
     try:
-        storage_locations = load_storage_locations()
+        storage_locations = load_storage_locations(state=state, city=city, category=category)
         return {
             "total_locations": len(storage_locations),
             "locations": storage_locations,
             "retrieved_at": datetime.utcnow().isoformat() + "Z"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving storage locations: {str(e)}")
 
@@ -181,12 +308,13 @@ async def get_storage_location(location_id: int):
     Get a specific storage location by ID.
     """
     try:
-        storage_locations = load_storage_locations()
-        location = next((loc for loc in storage_locations if loc["id"] == location_id), None)
+        location = find_storage_location(location_id)
         
         if not location:
             raise HTTPException(status_code=404, detail=f"Storage location with ID {location_id} not found")
         
         return location
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving storage location: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the article search index: boolean and phrase queries, facet
+filters and counts, top-k ranking by recency and risk score, and articles
+indexed by one process showing up in another's searches.
+"""
+
+import pytest
+
+from article_index import ArticleIndex, QueryError, parse_query
+
+
+@pytest.fixture
+def pair(fetched_article, scored_article):
+    """A fetched article and its report entry, as index_articles() receives them."""
+    def make(url, title, description="", days_ago=0, keywords=(), risk_score=None):
+        article = fetched_article(url, title, description, days_ago)
+        return article, scored_article(url, -0.5, days_ago, keywords, title=title, risk_score=risk_score)
+    return make
+
+
+@pytest.fixture
+def index(tmp_path, pair):
+    index = ArticleIndex(str(tmp_path / "index.sqlite3"))
+    index.add([
+        pair("a", "Workers strike at Surat textile mill", "Labour unrest halts looms", 1, ["strike", "labour unrest"]),
+        pair("b", "Flood warning for Gujarat", "Heavy rain havoc expected near Surat", 3, ["flood", "rain havoc"]),
+        pair("c", "Strike called off after talks", "Mill reopens on Monday", 0, ["strike"]),
+    ], supplier="Welspun India Ltd", state="Gujarat", category="Apparel & Textiles")
+    index.add([
+        pair("d", "Port strike delays shipments", "Dock workers walk out in Chennai", 10, ["strike"]),
+    ], supplier="Ashok Leyland", state="Tamil Nadu", category="Automotive")
+    return index
+
+
+def urls(result):
+    return sorted(article["url"] for article in result["results"])
+
+
+def test_boolean_and_phrase_queries(index, now):
+    assert urls(index.search("strike", now=now)) == ["a", "c", "d"]
+    assert urls(index.search("strike AND surat", now=now)) == ["a"]
+    assert urls(index.search("strike surat", now=now)) == ["a"]
+    assert urls(index.search("flood OR port", now=now)) == ["b", "d"]
+    assert urls(index.search('strike NOT "called off"', now=now)) == ["a", "d"]
+    assert urls(index.search('strike -"called off"', now=now)) == ["a", "d"]
+    assert urls(index.search("(flood OR mill) AND -strike", now=now)) == ["b"]
+    # Description text is searchable; a phrase must be contiguous and in order
+    assert urls(index.search('"labour unrest"', now=now)) == ["a"]
+    assert urls(index.search('"unrest labour"', now=now)) == []
+    # Hyphenated words are matched as a phrase
+    assert urls(index.search("rain-havoc", now=now)) == ["b"]
+
+
+def test_phrases_do_not_span_title_and_description(index, now):
+    # "...textile mill" ends the title of "a", "Labour unrest..." starts its description
+    assert urls(index.search('"mill labour"', now=now)) == []
+
+
+def test_facet_filters_and_counts(index, now):
+    result = index.search("strike", state="gujarat", now=now)
+    assert urls(result) == ["a", "c"]
+    assert result["facets"]["supplier"] == [{"value": "Welspun India Ltd", "count": 2}]
+    assert {"value": "strike", "count": 2} in result["facets"]["keyword"]
+    assert urls(index.search(keyword="flood", now=now)) == ["b"]
+    assert urls(index.search(category="Automotive", now=now)) == ["d"]
+    assert urls(index.search(since="2024-06-29", now=now)) == ["a", "c"]
+    assert urls(index.search(until="2024-06-27", now=now)) == ["b", "d"]
+
+
+def test_top_k_ranking(index, now):
+    by_recency = index.search("strike", sort="recency", limit=2, now=now)
+    assert [article["url"] for article in by_recency["results"]] == ["c", "a"]
+    assert by_recency["total"] == 3
+    # "a" and "b" have the same risk score; the more recent one wins the tie
+    by_risk = index.search(sort="risk", limit=1, now=now)
+    assert [article["url"] for article in by_risk["results"]] == ["a"]
+    # The default blends both: the old, low-risk port story ranks last
+    ranked = [article["url"] for article in index.search("strike", now=now)["results"]]
+    assert ranked[-1] == "d"
+
+
+def test_article_seen_again_only_adds_tags(index, pair, now):
+    assert index.add([pair("a", "Workers strike at Surat textile mill")], supplier="Arvind Ltd") == 0
+    (article,) = index.search("surat textile", now=now)["results"]
+    assert article["suppliers"] == ["Welspun India Ltd", "Arvind Ltd"]
+    assert urls(index.search("strike", supplier="arvind ltd", now=now)) == ["a"]
+    assert len(index) == 4
+
+
+def test_other_processes_writes_are_picked_up(tmp_path, index, pair, now):
+    # Another worker (or script.py) sharing the same file
+    other = ArticleIndex(index.path)
+    assert len(other) == 0
+    assert urls(other.search("strike", now=now)) == ["a", "c", "d"]
+    index.add([pair("e", "Factory fire in Pune")], supplier="Tata Motors")
+    assert urls(other.search("fire", now=now)) == ["e"]
+
+
+@pytest.mark.parametrize("query", ['"unterminated', "(strike", "strike)", "AND", "strike OR", "!!!"])
+def test_invalid_queries(query):
+    with pytest.raises(QueryError):
+        parse_query(query)
+
+
+def test_empty_query_matches_everything(index, now):
+    assert parse_query("  ") is None
+    assert index.search(now=now)["total"] == 4
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Tests for the two-tier cache: TTL, the LRU byte bound, the SQLite tier and
+request coalescing (including a cancelled leader).
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from cache import Cache, MemoryLRU, _entry_size
+
+
+def test_memory_entry_expires_after_ttl():
+    lru = MemoryLRU(max_bytes=10_000)
+    lru.set("fresh", {"v": 1}, time.time() + 60)
+    lru.set("stale", {"v": 2}, time.time() - 1)
+    assert lru.get("fresh") == (True, {"v": 1})
+    assert lru.get("stale") == (False, None)
+    assert lru.current_bytes == _entry_size("fresh", {"v": 1})
+
+
+def test_cache_ttl_zero_never_expires():
+    cache = Cache(ttl=0, max_bytes=10_000)
+    cache.set("key", "value")
+    assert cache.get("key") == (True, "value")
+
+
+def test_lru_evicts_least_recently_used_past_byte_bound():
+    size = _entry_size("a", "x" * 10)
+    lru = MemoryLRU(max_bytes=size * 2)
+    lru.set("a", "x" * 10, None)
+    lru.set("b", "x" * 10, None)
+    lru.get("a")  # "b" becomes the least recently used
+    lru.set("c", "x" * 10, None)
+    assert lru.get("a")[0] and lru.get("c")[0]
+    assert lru.get("b") == (False, None)
+    assert lru.current_bytes <= lru.max_bytes
+
+
+def test_lru_skips_entries_larger_than_bound():
+    lru = MemoryLRU(max_bytes=8)
+    lru.set("key", "far too large for the bound", None)
+    assert len(lru) == 0 and lru.current_bytes == 0
+
+
+def test_sqlite_tier_survives_new_cache(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    Cache(ttl=60, max_bytes=10_000, disk_path=str(path)).set("key", {"sentiment": "Positive"})
+
+    reopened = Cache(ttl=60, max_bytes=10_000, disk_path=str(path))
+    assert reopened.get("key") == (True, {"sentiment": "Positive"})
+    assert reopened.disk_hits == 1
+    # Promoted to memory: the second lookup doesn't touch disk
+    assert reopened.get("key") == (True, {"sentiment": "Positive"})
+    assert reopened.disk_hits == 1
+
+
+def test_sqlite_tier_drops_expired_rows(tmp_path):
+    cache = Cache(ttl=60, max_bytes=10_000, disk_path=str(tmp_path / "cache.sqlite3"))
+    cache.disk.set("key", "value", time.time() - 1)
+    assert cache.get("key") == (False, None)
+    assert cache.disk.get("key") == (False, None, None)
+
+
+def test_sqlite_tier_creates_nothing_until_used(tmp_path):
+    path = tmp_path / "cache" / "cache.sqlite3"
+    cache = Cache(ttl=60, max_bytes=10_000, disk_path=str(path))
+    assert not path.parent.exists()
+    cache.set("key", "value")
+    assert path.exists()
+
+
+def test_sqlite_connection_is_reopened_in_a_forked_worker(tmp_path):
+    cache = Cache(ttl=60, max_bytes=10_000, disk_path=str(tmp_path / "cache.sqlite3"))
+    cache.set("key", "value")
+    parent_connection = cache.disk._db.connection
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Worker forked after the parent opened the store (as under gunicorn --preload)
+        ok = cache.disk._db.connection is not parent_connection and cache.disk.get("key")[1] == "value"
+        os.write(write, b"1" if ok else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b"1"
+    assert cache.disk._db.connection is parent_connection
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = Cache(ttl=60, max_bytes=10_000)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert calls == 1
+    assert cache.get("key") == (True, "value")
+
+
+def test_should_cache_false_is_not_stored():
+    cache = Cache(ttl=60, max_bytes=10_000)
+
+    async def fetch():
+        return {"sentiment": "Neutral"}
+
+    asyncio.run(cache.get_or_fetch("key", fetch, should_cache=lambda value: value["sentiment"] != "Neutral"))
+    assert cache.get("key") == (False, None)
+
+
+def test_fetch_error_reaches_every_waiter():
+    cache = Cache(ttl=60, max_bytes=10_000)
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch("key", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache._inflight == {}
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    cache = Cache(ttl=60, max_bytes=10_000)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_fetch("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_fetch("key", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == "value"
+    assert calls == 1
+    assert cache.get("key") == (True, "value")
+
+
+def test_fetch_cancelled_once_every_caller_leaves():
+    cache = Cache(ttl=60, max_bytes=10_000)
+    finished = False
+
+    async def fetch():
+        nonlocal finished
+        await asyncio.sleep(1)
+        finished = True
+        return "value"
+
+    async def main():
+        caller = asyncio.ensure_future(cache.get_or_fetch("key", fetch))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+        return cache._inflight
+
+    assert asyncio.run(main()) == {}
+    assert not finished
+
+
+def test_async_path_uses_disk_off_the_loop(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def fetch():
+        return {"sentiment": "Negative"}
+
+    async def main():
+        cache = Cache(ttl=60, max_bytes=10_000, disk_path=path)
+        await cache.get_or_fetch("key", fetch)
+        await cache.flush()
+        assert cache._pending_writes == set()
+
+        reopened = Cache(ttl=60, max_bytes=10_000, disk_path=path)
+        return await reopened.aget("key"), reopened.disk_hits
+
+    assert asyncio.run(main()) == ((True, {"sentiment": "Negative"}), 1)
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for category-level scoring in the storage analysis: one fetch per
+distinct news query across locations and overlapping runs, and scoring only
+being cancelled once no run or location still needs it.
+"""
+
+import asyncio
+
+import pytest
+
+import storage_analysis
+from storage_analysis import analyze_location, plan_category_scoring, release_category_scoring
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Replaces news fetching and scoring; records each category scored and whether it finished."""
+    calls = {"started": [], "finished": []}
+
+    async def score_category_news(product_category):
+        calls["started"].append(product_category)
+        await asyncio.sleep(0.05)
+        calls["finished"].append(product_category)
+        return 2, [0.6, 0.4]
+
+    monkeypatch.setattr(storage_analysis, "score_category_news", score_category_news)
+    monkeypatch.setattr(storage_analysis, "_inflight_categories", {})
+    return calls
+
+
+def location(location_id, *items):
+    return {
+        "id": location_id, "address": f"Warehouse {location_id}, Pune, Maharashtra",
+        "coordinates": {"latitude": 18.5, "longitude": 73.8}, "items": list(items)
+    }
+
+
+def test_each_news_query_is_scored_once_per_run(scored):
+    locations = [location(1, "Dairy", "Snacks"), location(2, "dairy ", "Snacks")]
+
+    async def run():
+        planned = plan_category_scoring(locations)
+        try:
+            return await asyncio.gather(*(analyze_location(loc, planned) for loc in locations))
+        finally:
+            release_category_scoring(planned)
+
+    results = asyncio.run(run())
+    assert sorted(scored["started"]) == ["Dairy", "Snacks"]
+    assert [p.product_category for p in results[1].demand_predictions] == ["dairy ", "Snacks"]
+    assert results[1].demand_predictions[0].recent_news_count == 2
+    assert results[0].average_polarity_score == pytest.approx(0.5)
+    assert storage_analysis._inflight_categories == {}
+
+
+def test_overlapping_runs_share_scoring_until_the_last_releases(scored):
+    async def run():
+        first = plan_category_scoring([location(1, "Dairy")])
+        second = plan_category_scoring([location(2, "Dairy", "Snacks")])
+        assert first["gnews:dairy"] is second["gnews:dairy"]
+        release_category_scoring(first)
+        await asyncio.sleep(0)
+        # The second run still needs Dairy
+        assert not second["gnews:dairy"].cancelled()
+        release_category_scoring(second)
+        await asyncio.sleep(0)
+        return second
+
+    second = asyncio.run(run())
+    assert all(task.cancelled() for task in second.values())
+    assert scored["finished"] == []
+
+
+def test_release_after_finishing_keeps_the_result(scored):
+    async def run():
+        planned = plan_category_scoring([location(1, "Dairy")])
+        result = await planned["gnews:dairy"]
+        release_category_scoring(planned)
+        # A later run starts a fresh fetch rather than joining the finished one
+        later = plan_category_scoring([location(2, "Dairy")])
+        assert later["gnews:dairy"] is not planned["gnews:dairy"]
+        await later["gnews:dairy"]
+        return result
+
+    assert asyncio.run(run()) == (2, [0.6, 0.4])
+    assert scored["finished"] == ["Dairy", "Dairy"]
+
+
+def test_cancelled_location_does_not_cancel_shared_category(scored):
+    locations = [location(1, "Dairy"), location(2, "Dairy")]
+
+    async def run():
+        planned = plan_category_scoring(locations)
+        try:
+            cancelled = asyncio.ensure_future(analyze_location(locations[0], planned))
+            other = asyncio.ensure_future(analyze_location(locations[1], planned))
+            await asyncio.sleep(0.01)
+            cancelled.cancel()
+            return await other
+        finally:
+            release_category_scoring(planned)
+
+    result = asyncio.run(run())
+    assert result.demand_predictions[0].recent_news_count == 2
+    assert scored["started"] == ["Dairy"] and scored["finished"] == ["Dairy"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for near-duplicate article detection: MinHash similarity estimates,
+LSH clustering of syndicated copies within a batch and across runs, and
+incremental state retaining one entry per cluster.
+"""
+
+import numpy as np
+import pytest
+
+from dedup import MinHasher, NearDuplicateIndex, _group, cluster_members, shingles, similarity
+from incremental import IncrementalState
+
+STORY = (
+    "Workers at the Welspun India textile plant in Anjar went on strike on Monday demanding higher wages, "
+    "halting production on several looms as talks with management stalled"
+)
+
+
+def article(url, title, description=STORY):
+    return {"title": title, "description": description, "url": url}
+
+
+def content(item):
+    return item["description"] or item["title"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return NearDuplicateIndex(str(tmp_path / "dedup.sqlite3"))
+
+
+def test_similarity_estimates_jaccard():
+    hasher = MinHasher(num_perm=256)
+    first = shingles("one two three four five six seven eight nine ten")
+    second = shingles("one two three four five six seven eight nine eleven")
+    exact = len(first & second) / len(first | second)
+    assert similarity(hasher.signature(first), hasher.signature(second)) == pytest.approx(exact, abs=0.1)
+    assert similarity(hasher.signature(first), hasher.signature(first)) == 1.0
+    assert hasher.signature(set()) is None
+
+
+def test_signatures_are_stable_across_instances():
+    text = shingles(STORY)
+    assert np.array_equal(MinHasher().signature(text), MinHasher().signature(text))
+
+
+def test_syndicated_copies_share_a_cluster(index):
+    batch = [
+        article("https://a.example/strike", "Welspun workers strike at Anjar plant"),
+        article("https://b.example/welspun", "Welspun India workers strike at Anjar plant",
+                STORY.replace("stalled", "stalled.") + " (PTI)"),
+        article("https://c.example/flood", "Floods in Assam", "Heavy rain flooded tea estates across upper Assam"),
+    ]
+    assigned = index.assign(batch, [content(item) for item in batch])
+    assert assigned[0][0] == assigned[1][0]
+    assert assigned[2][0] not in (None, assigned[0][0])
+    # Every copy is scored with the content of the article that started the cluster
+    assert assigned[1][1] == STORY
+
+    groups = _group(batch, assigned)
+    assert [len(group["articles"]) for group in groups] == [2, 1]
+    members, entries = cluster_members(groups, ["strike entry", "flood entry"])
+    assert [item["url"] for item in members] == [item["url"] for item in batch]
+    assert entries == ["strike entry", "strike entry", "flood entry"]
+
+
+def test_clusters_persist_across_runs(index):
+    (first,) = index.assign([article("https://a.example/strike", "Welspun strike")], [STORY])
+    # A later run (or another worker) sees a copy from a different outlet
+    later = NearDuplicateIndex(index.path)
+    (copy,) = later.assign([article("https://z.example/1", "Welspun strike at Anjar")], ["different text"])
+    assert copy == first
+
+
+def test_empty_articles_are_not_clustered(index):
+    assert index.assign([{"title": "", "description": None}], ["x"]) == [(None, "x")]
+
+
+def test_stale_clusters_are_pruned(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dedup.sqlite3"), retention_days=1)
+    (old,) = index.assign([article("https://a.example/strike", "Welspun strike")], [STORY], now=0)
+    index._pruned_at = 0
+    (new,) = index.assign([article("https://b.example/strike", "Welspun strike")], [STORY], now=3 * 86400)
+    assert new[0] != old[0]
+
+
+def test_incremental_state_keeps_one_entry_per_cluster(tmp_path):
+    state = IncrementalState(tmp_path / "state.json")
+    entry = {"title": "Strike", "publishedAt": "2024-06-01", "sentiment": "Negative", "polarity_score": -0.8,
+             "cluster_id": "c1", "copies": 2}
+    copies = [article("https://a.example/1", "Strike"), article("https://b.example/1", "Strike")]
+    assert state.record_articles("S", copies, [entry, entry]) == []
+    assert len(state.articles("S")) == 1
+    assert "aliases" not in state.articles("S")[0]
+    # Both copies count as seen; a third outlet's copy next run joins the retained entry
+    assert state.new_articles("S", copies) == []
+    third = article("https://c.example/1", "Strike")
+    state.record_articles("S", [third], [dict(entry, copies=1)])
+    (retained,) = state.articles("S")
+    assert retained["copies"] == 3
+    assert state.new_articles("S", copies + [third]) == []
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
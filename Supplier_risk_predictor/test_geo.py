@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the geo helpers: haversine distances, grid radius and
+nearest-neighbour queries checked against a brute-force scan, and chunked
+nearest-target assignment.
+"""
+
+import numpy as np
+import pytest
+
+from geo import GeoGrid, assign_nearest, haversine_km
+
+# Spread over India, where the suppliers and storage locations are
+rng = np.random.RandomState(7)
+LATS = rng.uniform(8.0, 32.0, 500)
+LONS = rng.uniform(68.0, 92.0, 500)
+
+
+def test_haversine_known_distances_and_broadcasting():
+    # Mumbai to Delhi is about 1,150 km as the crow flies
+    assert haversine_km(19.0760, 72.8777, 28.7041, 77.1025) == pytest.approx(1153, abs=5)
+    assert haversine_km(0, 0, 0, 180) == pytest.approx(np.pi * 6371.0088)
+    assert haversine_km(10, 20, 10, 20) == 0
+    distances = haversine_km(0, 0, [0, 0, 1], [0, 1, 0])
+    assert distances.shape == (3,)
+    assert distances[1] == pytest.approx(distances[2])
+
+
+@pytest.mark.parametrize("radius_km", [5, 150, 900])
+def test_within_radius_matches_brute_force(radius_km):
+    grid = GeoGrid(LATS, LONS, cell_degrees=1.0)
+    lat, lon = 20.3, 78.9
+    indexes, distances = grid.within_radius(lat, lon, radius_km)
+    expected = np.flatnonzero(haversine_km(lat, lon, LATS, LONS) <= radius_km)
+    assert sorted(indexes.tolist()) == sorted(expected.tolist())
+    assert list(distances) == sorted(distances)
+
+
+def test_points_across_a_cell_boundary_are_found():
+    # 0.01 degrees apart but in different cells (and different signs)
+    grid = GeoGrid([0.995, 1.005, -0.005], [0.995, 1.005, -0.005], cell_degrees=1.0)
+    indexes, distances = grid.within_radius(1.0, 1.0, 2)
+    assert sorted(indexes.tolist()) == [0, 1]
+    assert grid.nearest(0.001, 0.001, k=1)[0].tolist() == [2]
+
+
+@pytest.mark.parametrize("k", [1, 5, 500, 600])
+def test_nearest_matches_brute_force(k):
+    grid = GeoGrid(LATS, LONS, cell_degrees=0.5)
+    lat, lon = 12.97, 77.59
+    indexes, distances = grid.nearest(lat, lon, k)
+    brute = np.sort(haversine_km(lat, lon, LATS, LONS))[:k]
+    assert len(indexes) == min(k, len(LATS))
+    np.testing.assert_allclose(distances, brute)
+
+
+def test_nearest_far_outside_the_points():
+    grid = GeoGrid(LATS, LONS, cell_degrees=1.0)
+    # The far side of the globe: the radius keeps doubling until it covers everything
+    indexes, distances = grid.nearest(-20.0, -100.0, k=2)
+    brute = np.argsort(haversine_km(-20.0, -100.0, LATS, LONS))[:2]
+    assert indexes.tolist() == brute.tolist()
+
+
+def test_empty_grid():
+    grid = GeoGrid([], [])
+    assert len(grid) == 0
+    for indexes, distances in (grid.within_radius(20.0, 78.0, 500), grid.nearest(20.0, 78.0, k=3)):
+        assert len(indexes) == 0 and len(distances) == 0
+
+
+def test_assign_nearest_matches_brute_force_across_chunks():
+    targets_lat, targets_lon = LATS[:40], LONS[:40]
+    nearest, distances = assign_nearest(LATS, LONS, targets_lat, targets_lon, chunk_size=64)
+    matrix = haversine_km(LATS[:, None], LONS[:, None], targets_lat[None, :], targets_lon[None, :])
+    assert nearest.tolist() == matrix.argmin(axis=1).tolist()
+    np.testing.assert_allclose(distances, matrix.min(axis=1))
+    # Every target is its own nearest
+    assert nearest[:40].tolist() == list(range(40))
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
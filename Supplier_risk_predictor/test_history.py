@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the risk history store: articles counted once across runs,
+time-decayed EWMA polarity, daily trend buckets, keyword counts and
+risk-level changes rolled up per supplier, state and category.
+"""
+
+import math
+
+import pytest
+
+from history import HistoryStore
+
+SCOPES = {"supplier": "Welspun India Ltd", "state": "Gujarat", "category": "Apparel & Textiles"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / "history.sqlite3"))
+
+
+def rollup(store, scope, key, now):
+    (row,) = store.rollups("supplier", scope, key, now=now)
+    return row
+
+
+def test_articles_are_counted_once_across_runs(store, now, scored_article):
+    articles = [scored_article("a", -0.8, keywords=["strike"]), scored_article("b", 0.6)]
+    assert store.record_articles("supplier", "Welspun India Ltd", articles, SCOPES, now=now) == 2
+    # A later run sees the same articles again plus one new one
+    again = articles + [scored_article("c", -0.4, keywords=["flood"])]
+    assert store.record_articles("supplier", "Welspun India Ltd", again, SCOPES, now=now + 60) == 1
+    row = rollup(store, "supplier", "Welspun India Ltd", now)
+    assert row["articles"] == 3
+    assert row["keyword_counts"] == {"strike": 1, "flood": 1}
+    assert rollup(store, "state", "Gujarat", now)["articles"] == 3
+
+
+def test_failed_scores_are_not_recorded(store, now, scored_article):
+    failed = dict(scored_article("a", 0.0), sentiment="Neutral")
+    assert store.record_articles("supplier", "Welspun India Ltd", [failed], SCOPES, now=now) == 0
+    assert store.rollups("supplier", "supplier", now=now) == []
+
+
+def test_ewma_weights_recent_articles_more(store, now, scored_article):
+    articles = [scored_article("old", 1.0, days_ago=14), scored_article("new", -1.0, days_ago=0)]
+    store.record_articles("supplier", "Welspun India Ltd", articles, SCOPES, now=now)
+    row = rollup(store, "supplier", "Welspun India Ltd", now)
+    for window, tau in (("7d", 7), ("30d", 30)):
+        old_weight = math.exp(-14 / tau)
+        assert row[f"ewma_polarity_{window}"] == pytest.approx((old_weight - 1.0) / (old_weight + 1.0))
+    # The shorter window forgets the old positive article faster
+    assert row["ewma_polarity_7d"] < row["ewma_polarity_30d"] < 0
+
+
+def test_ewma_does_not_depend_on_arrival_order(tmp_path, now, scored_article):
+    articles = [
+        scored_article("a", 0.9, days_ago=20), scored_article("b", -0.3, days_ago=3), scored_article("c", 0.1, days_ago=1)
+    ]
+    in_order = HistoryStore(str(tmp_path / "one.sqlite3"))
+    for item in articles:
+        in_order.record_articles("supplier", "S", [item], {"supplier": "S"}, now=now)
+    reversed_order = HistoryStore(str(tmp_path / "two.sqlite3"))
+    reversed_order.record_articles("supplier", "S", articles[::-1], {"supplier": "S"}, now=now)
+    (first,) = in_order.rollups("supplier", "supplier", now=now)
+    (second,) = reversed_order.rollups("supplier", "supplier", now=now)
+    assert first["ewma_polarity_7d"] == pytest.approx(second["ewma_polarity_7d"])
+    assert first["ewma_polarity_30d"] == pytest.approx(second["ewma_polarity_30d"])
+
+
+def test_trend_has_daily_buckets(store, now, scored_article):
+    articles = [
+        scored_article("a", -0.5, days_ago=2, keywords=["strike"]),
+        scored_article("b", -0.7, days_ago=2, keywords=["strike", "fire"]),
+        scored_article("c", 0.4, days_ago=0),
+        scored_article("old", 0.9, days_ago=60),
+    ]
+    store.record_articles("supplier", "Welspun India Ltd", articles, SCOPES, now=now)
+    trend = store.trend("supplier", "category", "apparel & textiles", days=30, now=now)
+    assert [(day["day"], day["articles"]) for day in trend["daily"]] == [("2024-06-28", 2), ("2024-06-30", 1)]
+    assert trend["daily"][0]["average_polarity_score"] == pytest.approx(-0.6)
+    assert trend["daily"][0]["keyword_counts"] == {"strike": 2, "fire": 1}
+    assert trend["rollup"]["articles"] == 4
+
+
+def test_risk_level_changes_roll_up(store, now):
+    other = {"supplier": "Arvind Ltd", "state": "Gujarat", "category": "Apparel & Textiles"}
+    assert store.record_verdict("supplier", "Welspun India Ltd", {"risk_level": "low"}, SCOPES, "low", now=now) is None
+    store.record_verdict("supplier", "Arvind Ltd", {"risk_level": "low"}, other, "low", now=now)
+    # Same level again is not a change
+    assert store.record_verdict("supplier", "Welspun India Ltd", {}, SCOPES, "low", now=now + 10) is None
+    change = store.record_verdict("supplier", "Welspun India Ltd", {}, SCOPES, "high", now=now + 20)
+    assert change == {"from": "low", "to": "high"}
+
+    supplier = rollup(store, "supplier", "Welspun India Ltd", now)
+    assert (supplier["risk_level"], supplier["risk_level_changes"]) == ("high", 1)
+    state = rollup(store, "state", "Gujarat", now)
+    assert state["risk_levels"] == {"low": 1, "high": 1}
+    assert state["risk_level_changes"] == 1
+
+    (logged,) = store.risk_changes(state="gujarat")
+    assert (logged["entity"], logged["from_level"], logged["to_level"]) == ("Welspun India Ltd", "low", "high")
+    assert store.risk_changes(category="Food") == []
+    assert len(store.verdicts("supplier", "Welspun India Ltd")) == 3
+
+
+def test_rollups_sorted_most_negative_first(store, now, scored_article):
+    for name, polarity in (("A", 0.5), ("B", -0.9), ("C", -0.1)):
+        store.record_articles("supplier", name, [scored_article(name, polarity)], {"supplier": name}, now=now)
+    assert [row["key"] for row in store.rollups("supplier", "supplier", now=now)] == ["B", "C", "A"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
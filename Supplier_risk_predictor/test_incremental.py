@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental runs: which articles count as new, fingerprints and
+cached LLM verdicts, failed scores not being retained, and saves from
+overlapping runs (threads and processes) merging instead of overwriting.
+"""
+
+import json
+import multiprocessing
+
+import pytest
+
+from incremental import IncrementalState, article_key
+
+
+def article(url, title="Flood at the plant", published="2024-06-01"):
+    return {"url": url, "title": title, "description": "", "publishedAt": published}
+
+
+def scored(item, polarity=-0.7):
+    return {"title": item["title"], "url": item["url"], "publishedAt": item["publishedAt"],
+            "sentiment": "Negative", "polarity_score": polarity}
+
+
+def test_article_key_falls_back_to_text_hash():
+    assert article_key({"url": "https://a.example/1"}) == "https://a.example/1"
+    untitled = article_key({"title": "Strike", "description": "Plant shut"})
+    assert untitled.startswith("sha256:")
+    assert untitled == article_key({"url": "", "title": "Strike", "description": "Plant shut"})
+
+
+def test_only_unseen_articles_are_new(tmp_path):
+    state = IncrementalState(tmp_path / "state.json")
+    first = [article("https://a.example/1"), article("https://a.example/2")]
+    assert state.new_articles("Acme", first) == first
+    state.record_articles("Acme", first, [scored(item) for item in first])
+    state.save()
+
+    reopened = IncrementalState(tmp_path / "state.json")
+    fetched = first + [article("https://a.example/3"), article("https://a.example/3")]
+    assert [item["url"] for item in reopened.new_articles("Acme", fetched)] == ["https://a.example/3"]
+    assert reopened.new_articles("Other", first) == first
+
+
+def test_failed_scores_are_returned_but_not_retained(tmp_path):
+    state = IncrementalState(tmp_path / "state.json")
+    items = [article("https://a.example/1"), article("https://a.example/2")]
+    failed = {"title": items[1]["title"], "sentiment": "Neutral", "polarity_score": 0.0}
+    unscored = state.record_articles("Acme", items, [scored(items[0]), failed])
+    assert unscored == [failed]
+    assert [item["url"] for item in state.articles("Acme")] == ["https://a.example/1"]
+    # Scored again next run
+    assert state.new_articles("Acme", items) == [items[1]]
+
+
+def test_cached_verdict_reused_only_for_the_same_inputs(tmp_path):
+    state = IncrementalState(tmp_path / "state.json")
+    items = [article("https://a.example/1")]
+    state.record_articles("Acme", items, [scored(items[0])])
+    fingerprint = state.fingerprint("Acme", {"weather": "Rain"})
+    assert state.cached_verdict("Acme", fingerprint) is None
+    state.record_verdict("Acme", fingerprint, {"risk_level": "High"})
+    state.save()
+
+    reopened = IncrementalState(tmp_path / "state.json")
+    assert reopened.fingerprint("Acme", {"weather": "Rain"}) == fingerprint
+    assert reopened.cached_verdict("Acme", fingerprint) == {"risk_level": "High"}
+    assert state.has_new_verdict("Acme") and not reopened.has_new_verdict("Acme")
+    # New weather or a new article changes the inputs
+    assert reopened.fingerprint("Acme", {"weather": "Clear"}) != fingerprint
+    more = [article("https://a.example/2")]
+    reopened.record_articles("Acme", more, [scored(more[0])])
+    assert reopened.cached_verdict("Acme", reopened.fingerprint("Acme", {"weather": "Rain"})) is None
+
+
+def test_overlapping_runs_merge_on_save(tmp_path):
+    path = tmp_path / "state.json"
+    older, newer = IncrementalState(path), IncrementalState(path)
+    one, two = article("https://a.example/1"), article("https://a.example/2")
+    older.record_articles("Acme", [one], [scored(one)])
+    older.record_verdict("Acme", "f1", {"run": "older"})
+    newer.record_articles("Acme", [two], [scored(two)])
+    newer.record_articles("Beta", [one], [scored(one)])
+    newer.record_verdict("Acme", "f2", {"run": "newer"})
+    newer.save()
+    older.save()
+
+    merged = IncrementalState(path)
+    assert sorted(item["url"] for item in merged.articles("Acme")) == [one["url"], two["url"]]
+    assert merged.articles("Beta")
+    # The verdict generated last wins, whichever run saved last
+    assert merged.cached_verdict("Acme", "f2") == {"run": "newer"}
+
+
+def test_reset_replaces_instead_of_merging(tmp_path):
+    path = tmp_path / "state.json"
+    state = IncrementalState(path)
+    one = article("https://a.example/1")
+    state.record_articles("Acme", [one], [scored(one)])
+    state.save()
+
+    full = IncrementalState(path)
+    full.reset()
+    full.save()
+    assert json.loads(path.read_text())["suppliers"] == {}
+
+
+def _save_supplier(path, index):
+    state = IncrementalState(path)
+    item = article(f"https://a.example/{index}")
+    state.record_articles(f"Supplier {index}", [item], [scored(item)])
+    state.save()
+
+
+def test_concurrent_processes_lose_no_suppliers(tmp_path):
+    path = tmp_path / "state.json"
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_save_supplier, args=(path, index)) for index in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert sorted(json.loads(path.read_text())["suppliers"]) == sorted(f"Supplier {index}" for index in range(8))
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
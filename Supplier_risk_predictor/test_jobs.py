@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for background jobs: submission and concurrency, results and
+progress, failure and cancellation, recovery of jobs whose worker died,
+and the server-sent event stream.
+"""
+
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+
+import pytest
+
+import jobs
+from jobs import JobManager, JobStore
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return JobManager(JobStore(str(tmp_path / "jobs.sqlite3")), max_concurrency=1)
+
+
+async def finished(manager, job_id):
+    while job_id in manager._tasks:
+        await asyncio.sleep(0.01)
+    return manager.store.get(job_id)
+
+
+def test_job_runs_and_streams_results(manager):
+    async def runner(job, count):
+        await job.set_total(count)
+        for i in range(count):
+            await job.add_result({"item": i})
+
+    manager.register("count", runner)
+
+    async def run():
+        job_id = await manager.submit("count", {"count": 3})
+        return job_id, await finished(manager, job_id)
+
+    job_id, job = asyncio.run(run())
+    assert (job["status"], job["total"], job["done"], job["params"]) == ("completed", 3, 3, {"count": 3})
+    assert manager.store.results(job_id) == [(1, {"item": 0}), (2, {"item": 1}), (3, {"item": 2})]
+    assert manager.store.results(job_id, since=2) == [(3, {"item": 2})]
+
+
+def test_jobs_beyond_the_limit_wait_queued(manager):
+    release = None
+
+    async def runner(job):
+        await release.wait()
+
+    manager.register("wait", runner)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        first = await manager.submit("wait")
+        second = await manager.submit("wait")
+        await asyncio.sleep(0.1)
+        statuses = (manager.store.get(first)["status"], manager.store.get(second)["status"])
+        release.set()
+        await finished(manager, second)
+        return statuses, manager.store.get(second)["status"]
+
+    assert asyncio.run(run()) == (("running", "queued"), "completed")
+
+
+def test_failed_and_cancelled_jobs(manager):
+    async def fail(job):
+        raise RuntimeError("upstream down")
+
+    async def slow(job):
+        await job.add_result({"partial": True})
+        await asyncio.sleep(60)
+
+    manager.register("fail", fail)
+    manager.register("slow", slow)
+
+    async def run():
+        failed = await finished(manager, await manager.submit("fail"))
+        job_id = await manager.submit("slow")
+        while not manager.store.results(job_id):
+            await asyncio.sleep(0.01)
+        assert manager.cancel(job_id)
+        return failed, await finished(manager, job_id), job_id
+
+    failed, cancelled, job_id = asyncio.run(run())
+    assert (failed["status"], failed["error"]) == ("failed", "upstream down")
+    assert cancelled["status"] == "cancelled"
+    # Results produced before the cancel are kept
+    assert manager.store.results(job_id) == [(1, {"partial": True})]
+    assert not manager.cancel(job_id)
+    with pytest.raises(ValueError):
+        asyncio.run(manager.submit("unknown"))
+
+
+def test_recovery_only_touches_jobs_of_dead_workers(manager):
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    store = manager.store
+    dead, other_host, ours = (store.create("count", {}) for _ in range(3))
+    store.update(dead, owner=f"{socket.gethostname()}:{exited.pid}")
+    store.update(other_host, owner="elsewhere:1")
+    store.update(ours, status="running")
+
+    assert store.recover_interrupted() == 1
+    assert store.get(dead)["status"] == "interrupted"
+    assert store.get(other_host)["status"] == "queued"
+    assert store.get(ours)["status"] == "running"
+
+
+def test_event_stream_sends_results_then_end(manager, monkeypatch):
+    monkeypatch.setattr(jobs, "job_manager", manager)
+
+    async def runner(job):
+        for i in range(2):
+            await asyncio.sleep(0.05)
+            await job.add_result({"item": i})
+
+    manager.register("events", runner)
+
+    async def run():
+        job_id = await manager.submit("events")
+        response = await jobs.stream_job_events(job_id)
+        return [chunk async for chunk in response.body_iterator]
+
+    chunks = asyncio.run(run())
+    assert [json.loads(chunk.split("data: ")[1]) for chunk in chunks[:2]] == [{"item": 0}, {"item": 1}]
+    assert chunks[0].startswith("id: 1\nevent: result\n")
+    assert chunks[-1] == 'event: end\ndata: {"status": "completed", "error": null}\n\n'
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the Aho-Corasick risk keyword matcher: word boundaries, inflected
+forms, multi-word keywords and positions in the original text.
+"""
+
+import pytest
+
+from config import RISK_KEYWORDS, RISK_KEYWORD_INFLECTIONS
+from keywords import KeywordMatcher
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return KeywordMatcher(RISK_KEYWORDS, RISK_KEYWORD_INFLECTIONS)
+
+
+def keywords_in(matcher, text):
+    return [keyword for _, _, keyword in matcher.find(text)]
+
+
+@pytest.mark.parametrize("text, keyword", [
+    ("Fields flooded overnight", "flood"),
+    ("Flooding halts transport", "flood"),
+    ("Floods in the region", "flood"),
+    ("Strikers block the gates", "strike"),
+    ("Strikes called off", "strike"),
+    ("Protesters gather at the plant", "protest"),
+    ("Farmers protested the levy", "protest"),
+    ("Rioting spread overnight", "riot"),
+    ("Two droughts in a row", "drought"),
+])
+def test_inflected_forms_count_as_base_keyword(matcher, text, keyword):
+    assert keywords_in(matcher, text) == [keyword]
+
+
+@pytest.mark.parametrize("text", [
+    "A firearm was recovered",
+    "A patriot speech",
+    "Floodlights installed at the depot",
+    "Strikeouts lead the inning",
+    # Only listed forms count: these share a stem but not a meaning
+    "A striking rise in quarterly sales",
+    "The board fired its auditor",
+])
+def test_substrings_inside_other_words_do_not_match(matcher, text):
+    assert keywords_in(matcher, text) == []
+
+
+def test_multi_word_keyword_spans_whitespace_runs(matcher):
+    assert keywords_in(matcher, "Labour\n  unrest at the mill") == ["labour unrest"]
+    # Overlapping keywords are all reported
+    assert keywords_in(matcher, "Strike notices served") == ["strike", "strike notice"]
+
+
+def test_positions_index_the_original_text(matcher):
+    # "İ" lowercases to two characters; positions must still point into the input
+    text = "İfire fire"
+    assert matcher.find(text) == [(6, 10, "fire")]
+    start, end, _ = matcher.find(text)[0]
+    assert text[start:end] == "fire"
+
+
+def test_positions_cover_inflected_form(matcher):
+    text = "Roads FLOODED after rain"
+    (start, end, keyword), = matcher.find(text)
+    assert (text[start:end], keyword) == ("FLOODED", "flood")
+
+
+def test_scan_counts_and_weights():
+    matcher = KeywordMatcher({"strike": 2.0, "flood": 1.5}, {"strike": ["strikes"], "flood": ["flooding"]})
+    result = matcher.scan("Strike, strikes and flooding")
+    assert result["counts"] == {"strike": 2, "flood": 1}
+    assert result["weight"] == 3.5
+    assert matcher.scan(None)["keywords"] == []
+
+
+def test_without_inflections_only_keywords_match():
+    matcher = KeywordMatcher(["flood"])
+    assert keywords_in(matcher, "flood floods flooded") == ["flood"]
+
+
+def test_inflections_are_normalized_like_keywords():
+    matcher = KeywordMatcher(["Strike  Notice"], {"strike notice": ["Strike\tNotices"]})
+    assert keywords_in(matcher, "Two strike notices served") == ["strike notice"]
+
+
+def test_inflection_that_is_itself_a_keyword_reports_that_keyword():
+    matcher = KeywordMatcher(["strike", "strikes"], {"strike": ["strikes", "strikers"]})
+    assert keywords_in(matcher, "strikes strikers") == ["strikes", "strike"]
+
+
+def test_every_listed_inflection_belongs_to_a_keyword():
+    assert set(RISK_KEYWORD_INFLECTIONS) <= set(RISK_KEYWORDS)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
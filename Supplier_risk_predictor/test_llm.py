@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the streamed LLM batch path: the incremental JSON object parser and
+llm_generate_risk_reports' validate / retry / single-prompt fallback, against
+an httpx.MockTransport standing in for Together.
+"""
+
+import asyncio
+import json
+import re
+
+import httpx
+import pytest
+
+import llm
+from http_client import http_pool
+
+
+def report(supplier, risk_level="medium"):
+    return {
+        "supplier": supplier,
+        "issue": "Port strike",
+        "risk_level": risk_level,
+        "state": "Maharashtra",
+        "reason": "Strike at {the} \"port\" delays shipments"
+    }
+
+
+def sse(content, chunk=7):
+    """An OpenAI-style event stream delivering content a few characters per delta."""
+    events = [
+        "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": content[i:i + chunk]}}]})
+        for i in range(0, len(content), chunk)
+    ]
+    return "\n\n".join(events + ["data: [DONE]"]) + "\n\n"
+
+
+class FakeTogether:
+    """Answers batch (streamed) prompts from `batch_replies` in turn and single prompts with a valid report."""
+
+    def __init__(self, batch_replies):
+        self.batch_replies = list(batch_replies)
+        self.batches = []
+        self.singles = []
+
+    def __call__(self, request):
+        body = json.loads(request.content)
+        suppliers = re.findall(r"^Supplier: (.+)$", body["messages"][-1]["content"], re.MULTILINE)
+        if body.get("stream"):
+            self.batches.append(suppliers)
+            reply = self.batch_replies.pop(0)(suppliers)
+            return httpx.Response(200, text=sse(reply), headers={"Content-Type": "text/event-stream"})
+        self.singles.append(suppliers[0])
+        content = json.dumps(report(suppliers[0], "low"))
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+@pytest.fixture
+def together(monkeypatch):
+    def install(batch_replies):
+        fake = FakeTogether(batch_replies)
+        monkeypatch.setattr(http_pool, "_clients", {})
+        monkeypatch.setattr(http_pool, "_new_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(fake)))
+        return fake
+    return install
+
+
+def items(*names):
+    return [{"supplier_name": name, "news_json": {"articles": []}, "road_json": {}} for name in names]
+
+
+def test_stream_parser_handles_split_tokens_and_braces_in_strings():
+    tricky = {"supplier": "B", "note": 'a } and { and " quote'}
+    text = "```json\n[" + json.dumps(report("A")) + ",\n" + json.dumps(tricky) + "]\n```"
+    parser = llm.JSONObjectStream()
+    objects = []
+    for i in range(0, len(text), 3):
+        objects += parser.feed(text[i:i + 3])
+    assert [json.loads(obj)["supplier"] for obj in objects] == ["A", "B"]
+    assert json.loads(objects[1])["note"] == 'a } and { and " quote'
+
+
+def test_stream_parser_skips_stray_text_between_objects():
+    parser = llm.JSONObjectStream()
+    assert parser.feed('Sure! {"a": 1} then {"b": {"c": 2}') == ['{"a": 1}']
+    assert parser.feed('} done') == ['{"b": {"c": 2}}']
+
+
+def test_batch_reports_in_input_order(together):
+    fake = together([lambda suppliers: json.dumps([report(name) for name in reversed(suppliers)])])
+    results = asyncio.run(llm.llm_generate_risk_reports(items("Alpha Foods", "Beta Textiles")))
+    assert [r["supplier"] for r in results] == ["Alpha Foods", "Beta Textiles"]
+    assert fake.batches == [["Alpha Foods", "Beta Textiles"]] and fake.singles == []
+
+
+def test_invalid_entry_is_retried_in_a_smaller_batch(together):
+    fake = together([
+        lambda suppliers: json.dumps([report(suppliers[0]), report(suppliers[1], risk_level="severe")]),
+        lambda suppliers: json.dumps([report(suppliers[0])]),
+    ])
+    results = asyncio.run(llm.llm_generate_risk_reports(items("Alpha Foods", "Beta Textiles")))
+    assert fake.batches == [["Alpha Foods", "Beta Textiles"], ["Beta Textiles"]]
+    assert [r["risk_level"] for r in results] == ["medium", "medium"]
+    assert fake.singles == []
+
+
+def test_entry_still_invalid_after_retries_falls_back_to_single_prompt(together, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_BATCH_MAX_RETRIES", 1)
+    fake = together([
+        lambda suppliers: json.dumps([report(suppliers[0]), {"supplier": suppliers[1]}]),
+        lambda suppliers: "not json at all",
+    ])
+    results = asyncio.run(llm.llm_generate_risk_reports(items("Alpha Foods", "Beta Textiles")))
+    assert fake.batches == [["Alpha Foods", "Beta Textiles"], ["Beta Textiles"]]
+    assert fake.singles == ["Beta Textiles"]
+    assert [r["risk_level"] for r in results] == ["medium", "low"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
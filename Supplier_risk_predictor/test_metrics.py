@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the metrics module and the Server-Timing middleware: Prometheus
+text for counters, histograms and caches, per-request stage breakdowns, and
+streamed responses going out without the header.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+from cache import Cache
+from metrics import Counter, Histogram, request_timer, server_timing_header, stage_timer, start_request_timings
+
+
+def test_counter_renders_labelled_series_sorted_and_escaped():
+    counter = Counter("test_errors_total", "Errors seen.", ["host", "reason"])
+    counter.inc(host="gnews.io", reason="429")
+    counter.inc(2, host="gnews.io", reason="429")
+    counter.inc(host='a"b', reason="x\ny")
+    assert counter.render() == [
+        "# HELP test_errors_total Errors seen.",
+        "# TYPE test_errors_total counter",
+        'test_errors_total{host="a\\"b",reason="x\\ny"} 1',
+        'test_errors_total{host="gnews.io",reason="429"} 3',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Durations.", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage="news")
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{stage="news",le="0.1"} 1',
+        'test_seconds_bucket{stage="news",le="1.0"} 2',
+        'test_seconds_bucket{stage="news",le="+Inf"} 3',
+        'test_seconds_sum{stage="news"} 5.55',
+        'test_seconds_count{stage="news"} 3',
+    ]
+
+
+def test_unlabelled_histogram():
+    histogram = Histogram("test_batch_size", "Texts per batch.", buckets=(1, 8))
+    histogram.observe(4)
+    assert 'test_batch_size_bucket{le="8"} 1' in histogram.render()
+    assert "test_batch_size_count 1" in histogram.render()
+
+
+def test_metrics_endpoint_includes_stages_and_caches(monkeypatch):
+    monkeypatch.setattr(metrics, "_caches", {})
+    cache = Cache(ttl=60, max_bytes=10_000)
+    cache.set("key", "value")
+    cache.get("key")
+    cache.get("missing")
+    metrics.register_cache("test", cache)
+    with stage_timer("test_stage"):
+        pass
+
+    response = TestClient(main.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE supplier_risk_stage_seconds histogram" in body
+    assert 'supplier_risk_stage_seconds_count{stage="test_stage"}' in body
+    assert 'supplier_risk_cache_hits_total{cache="test"} 1' in body
+    assert 'supplier_risk_cache_misses_total{cache="test"} 1' in body
+    assert 'supplier_risk_cache_hit_ratio{cache="test"} 0.5' in body
+    assert body.endswith("\n")
+
+
+def test_request_timer_only_records_inside_a_request():
+    with request_timer("outside"):
+        pass
+    timings = start_request_timings()
+    with request_timer("news"):
+        pass
+    with request_timer("news"):
+        pass
+    assert list(timings) == ["news"]
+    assert server_timing_header({"news": 0.0123, "llm": 1.5}, 2.0) == "llm;dur=1500.0, news;dur=12.3, total;dur=2000.0"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.middleware("http")(main.add_server_timing)
+
+    @app.get("/scored")
+    async def scored():
+        with stage_timer("news_fetch"):
+            await asyncio.sleep(0.01)
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            with stage_timer("news_fetch"):
+                yield "{}\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    async def events():
+        return StreamingResponse(iter(["data: {}\n\n"]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_server_timing_header_breaks_down_stages(client):
+    header = client.get("/scored").headers["Server-Timing"]
+    stages = dict(entry.split(";dur=") for entry in header.split(", "))
+    assert list(stages) == ["news_fetch", "total"]
+    assert 10 <= float(stages["news_fetch"]) <= float(stages["total"])
+
+
+@pytest.mark.parametrize("path", ["/stream", "/events"])
+def test_streamed_responses_have_no_server_timing(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the sentiment sidecar: the Unix socket protocol, per-thread
+connections, reconnecting after a sidecar restart and error propagation,
+with a stub model in place of DistilBERT.
+"""
+
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from model_server import SidecarModel, make_server
+
+
+class StubModel:
+    model_id = "stub-model"
+
+    def __init__(self):
+        self.batches = []
+
+    def analyze_batch(self, texts):
+        self.batches.append(list(texts))
+        if "explode" in texts:
+            raise ValueError("bad input")
+        return [{"sentiment": "Positive", "polarity_score": len(text) / 100} for text in texts]
+
+
+@pytest.fixture
+def sidecar(tmp_path):
+    servers = []
+
+    def start(model=None):
+        server = make_server(model or StubModel(), tmp_path / "sentiment.sock")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_results_come_back_in_order(sidecar, tmp_path):
+    server = sidecar()
+    client = SidecarModel(tmp_path / "sentiment.sock", timeout=5)
+    assert client.model_id == "stub-model"
+    assert client.analyze_batch(["ab", "abcd"]) == [
+        {"sentiment": "Positive", "polarity_score": 0.02},
+        {"sentiment": "Positive", "polarity_score": 0.04},
+    ]
+    assert client.analyze("abc")["polarity_score"] == 0.03
+    assert client.analyze_batch([]) == []
+    assert server.model.batches == [["ab", "abcd"], ["abc"]]
+
+
+def test_concurrent_threads_use_their_own_connections(sidecar, tmp_path):
+    sidecar()
+    client = SidecarModel(tmp_path / "sentiment.sock", timeout=5)
+    texts = ["x" * n for n in range(40)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(client.analyze, texts))
+    assert [result["polarity_score"] for result in results] == [len(text) / 100 for text in texts]
+
+
+def test_model_errors_are_raised_to_the_caller(sidecar, tmp_path):
+    sidecar()
+    client = SidecarModel(tmp_path / "sentiment.sock", timeout=5)
+    with pytest.raises(RuntimeError, match="bad input"):
+        client.analyze_batch(["fine", "explode"])
+    # The connection is still usable afterwards
+    assert client.analyze("ok")["sentiment"] == "Positive"
+
+
+def test_reconnects_when_the_connection_went_stale(sidecar, tmp_path):
+    server = sidecar()
+    client = SidecarModel(tmp_path / "sentiment.sock", timeout=5)
+    # Stand-in for a connection to a sidecar that has since restarted: the peer is gone
+    stale, peer = socket.socketpair()
+    peer.close()
+    client._local.sock = stale
+    assert client.analyze("after")["sentiment"] == "Positive"
+    assert server.model.batches == [["after"]]
+
+
+def test_unreachable_sidecar_times_out(tmp_path):
+    with pytest.raises(RuntimeError, match="not reachable"):
+        SidecarModel(tmp_path / "missing.sock", timeout=0.3)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
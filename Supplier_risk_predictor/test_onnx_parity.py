@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Parity test for the ONNX Runtime sentiment backend against the PyTorch backend.
+
+Needs transformers, torch, onnxruntime and optimum installed, plus access to
+the Hugging Face model (or a warm local cache). The first run exports and
+quantizes the model into ONNX_MODEL_DIR.
+"""
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("optimum")
+
+from models import SentimentModel
+
+# INT8 quantization shifts confidences a little; labels must still agree
+POLARITY_TOLERANCE = 0.05
+
+SAMPLE_TEXTS = [
+    "Workers at the textile plant went on strike, halting production for a week.",
+    "The company reported record quarterly profits and expanded its export orders.",
+    "Floods in the region have disrupted road transport and delayed shipments.",
+    "New warehouse opens ahead of the festive season, boosting regional supply.",
+    "Regulators launched legal action over alleged corruption in procurement.",
+    "Demand for consumer electronics remains strong as prices ease.",
+    "A factory fire destroyed raw material stocks worth several crores.",
+    "The supplier won an industry award for sustainable manufacturing.",
+]
+
+
+@pytest.fixture(scope="module")
+def backends():
+    try:
+        return SentimentModel("transformers"), SentimentModel("onnx")
+    except OSError as e:
+        # Offline with no cached copy of the model (huggingface_hub raises OSError subclasses)
+        pytest.skip(f"Sentiment model unavailable: {e}")
+
+
+def test_labels_match(backends):
+    torch_model, onnx_model = backends
+    torch_results = torch_model.analyze_batch(SAMPLE_TEXTS)
+    onnx_results = onnx_model.analyze_batch(SAMPLE_TEXTS)
+    for text, expected, actual in zip(SAMPLE_TEXTS, torch_results, onnx_results):
+        assert actual["sentiment"] == expected["sentiment"], text
+
+
+def test_polarity_within_tolerance(backends):
+    torch_model, onnx_model = backends
+    torch_results = torch_model.analyze_batch(SAMPLE_TEXTS)
+    onnx_results = onnx_model.analyze_batch(SAMPLE_TEXTS)
+    for text, expected, actual in zip(SAMPLE_TEXTS, torch_results, onnx_results):
+        assert abs(actual["polarity_score"] - expected["polarity_score"]) <= POLARITY_TOLERANCE, text
+
+
+def test_batch_matches_single(backends):
+    _, onnx_model = backends
+    batched = onnx_model.analyze_batch(SAMPLE_TEXTS)
+    for text, result in zip(SAMPLE_TEXTS, batched):
+        single = onnx_model.analyze(text)
+        assert single["sentiment"] == result["sentiment"]
+        assert abs(single["polarity_score"] - result["polarity_score"]) <= POLARITY_TOLERANCE
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
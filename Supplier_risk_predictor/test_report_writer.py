@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Tests for report writing off the event loop: the streaming JSONReportWriter,
+coalesced atomic replaces, JSON-lines appends and the partitioned store.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from report_writer import JSONReportWriter, PartitionedReportStore, ReportFiles, report_slug
+
+
+async def write_report(path, entries, **kwargs):
+    async with JSONReportWriter(path, **kwargs) as writer:
+        for entry in entries:
+            await writer.write(entry)
+        return writer
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_array_report_matches_json_dump(tmp_path, compact):
+    path = tmp_path / "report.json"
+    entries = [{"supplier": "A", "score": 0.5}, {"supplier": "B", "tags": ["x", "y"]}]
+    asyncio.run(write_report(path, entries, compact=compact))
+    assert json.loads(path.read_text()) == entries
+    if not compact:
+        assert path.read_text() == json.dumps(entries, indent=2)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_keyed_report_with_header_count_and_footer(tmp_path, compact):
+    path = tmp_path / "report.json"
+
+    async def run():
+        async with JSONReportWriter(path, key="rows", header={"generatedAt": "now"},
+                                    count_field="total", compact=compact) as writer:
+            await writer.write({"id": 1})
+            writer.footer["rollups"] = {"state": []}
+
+    asyncio.run(run())
+    expected = {"generatedAt": "now", "rows": [{"id": 1}], "total": 1, "rollups": {"state": []}}
+    assert json.loads(path.read_text()) == expected
+    if not compact:
+        assert path.read_text() == json.dumps(expected, indent=2)
+
+
+def test_empty_report(tmp_path):
+    path = tmp_path / "report.json"
+    asyncio.run(write_report(path, []))
+    assert json.loads(path.read_text()) == []
+
+
+def test_failed_run_keeps_previous_report_and_leaves_no_temp_file(tmp_path):
+    path = tmp_path / "report.json"
+    asyncio.run(write_report(path, [{"run": 1}]))
+
+    async def failing():
+        async with JSONReportWriter(path) as writer:
+            await writer.write({"run": 2})
+            raise RuntimeError("upstream failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(failing())
+    assert json.loads(path.read_text()) == [{"run": 1}]
+    assert [p.name for p in tmp_path.iterdir()] == ["report.json"]
+
+
+def test_report_is_renamed_into_place_only_on_clean_exit(tmp_path):
+    path = tmp_path / "report.json"
+
+    async def cancelled():
+        async with JSONReportWriter(path) as writer:
+            await writer.write({"run": 1})
+            await writer._flush()
+            # Written so far under the temporary name only
+            assert not path.exists()
+            assert [p.suffix for p in tmp_path.iterdir()] == [".tmp"]
+            raise asyncio.CancelledError
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancelled())
+    assert list(tmp_path.iterdir()) == []
+
+    asyncio.run(write_report(path, [{"run": 2}]))
+    assert json.loads(path.read_text()) == [{"run": 2}]
+    assert [p.name for p in tmp_path.iterdir()] == ["report.json"]
+
+
+def test_overlapping_runs_last_started_wins(tmp_path):
+    path = tmp_path / "report.json"
+
+    async def run():
+        older = JSONReportWriter(path)
+        newer = JSONReportWriter(path)
+        await older.__aenter__()
+        await newer.__aenter__()
+        await older.write({"run": "older"})
+        await newer.write({"run": "newer"})
+        await newer.__aexit__(None, None, None)
+        await older.__aexit__(None, None, None)
+
+    asyncio.run(run())
+    assert json.loads(path.read_text()) == [{"run": "newer"}]
+    assert [p.name for p in tmp_path.iterdir()] == ["report.json"]
+
+
+def test_queued_replaces_coalesce_to_newest(tmp_path, monkeypatch):
+    path = tmp_path / "supplier.json"
+    files = ReportFiles()
+    writes = []
+    flush = files._flush
+    monkeypatch.setattr(files, "_flush", lambda *args: (writes.append(args[1]), flush(*args)))
+
+    async def run():
+        futures = [files.replace(path, {"version": version}) for version in range(5)]
+        await asyncio.gather(*futures)
+
+    asyncio.run(run())
+    # All five were queued before the writer ran, so only the newest is written
+    assert writes == [{"version": 4}]
+    assert json.loads(path.read_text()) == {"version": 4}
+
+
+def test_write_error_reaches_awaiting_caller(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    files = ReportFiles()
+
+    async def run():
+        await files.replace(blocker / "report.json", {"a": 1})
+
+    with pytest.raises(OSError):
+        asyncio.run(run())
+
+
+def test_flush_waits_for_unawaited_writes(tmp_path):
+    files = ReportFiles()
+
+    async def run():
+        # Nobody awaits these; the writer keeps its drain task until the write is done
+        files.append(tmp_path / "a.ndjson", [{"n": 1}])
+        files.replace(tmp_path / "b.json", {"n": 2})
+        assert len(files._drains) == 2
+        await files.flush()
+        assert not files._drains
+
+    asyncio.run(run())
+    assert (tmp_path / "a.ndjson").read_text() == '{"n":1}\n'
+    assert json.loads((tmp_path / "b.json").read_text()) == {"n": 2}
+
+
+def test_partitioned_store_appends_history(tmp_path):
+    store = PartitionedReportStore(tmp_path, files=ReportFiles())
+
+    async def run():
+        await asyncio.gather(
+            store.append("Tata Consumer Products", {"run": 1}, date="2024-05-01"),
+            store.append("Tata Consumer Products", {"run": 2}, date="2024-05-01"),
+        )
+        await store.append("Tata Consumer Products", {"run": 3}, date="2024-05-02")
+
+    asyncio.run(run())
+    assert store.partition("Tata Consumer Products", "2024-05-01") == \
+        tmp_path / "2024-05-01" / "tata_consumer_products.ndjson"
+    assert store.read("Tata Consumer Products", "2024-05-01") == [{"run": 1}, {"run": 2}]
+    assert store.read("Tata Consumer Products", "2024-05-02") == [{"run": 3}]
+    assert store.read("Unknown", "2024-05-01") == []
+
+
+def test_report_slug():
+    assert report_slug("Tata Consumer Products") == "tata_consumer_products"
+    assert report_slug("../etc/passwd") == "etc_passwd"
+    assert report_slug("  ") == "unnamed"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
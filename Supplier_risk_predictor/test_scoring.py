@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar scoring helpers: grouped means over several key
+columns, sentiment/trend/confidence labels, single-group summaries and
+ArticleScores group-bys over row ranges.
+"""
+
+import numpy as np
+import pytest
+
+from risk import analyze_risk_batch
+from scoring import ArticleScores, classify, group_means, is_scored, summarize
+
+
+def test_group_means_over_two_key_columns():
+    keys, means, counts = group_means(
+        [0.5, -0.5, 1.0, 0.25],
+        [["MH", "MH", "KA", "MH"], ["Dairy", "Dairy", "Dairy", "Snacks"]]
+    )
+    groups = {(state, category): (mean, count) for state, category, mean, count in zip(*keys, means, counts)}
+    assert groups == {("MH", "Dairy"): (0.0, 2), ("KA", "Dairy"): (1.0, 1), ("MH", "Snacks"): (0.25, 1)}
+
+
+def test_group_means_without_keys():
+    assert group_means([0.2, 0.4], []) == ([], pytest.approx([0.3]), [2])
+    keys, means, counts = group_means([], [])
+    assert means.tolist() == [0.0] and counts.tolist() == [0]
+
+
+def test_classify_thresholds():
+    sentiment, trend, confidence = classify([0.6, 0.3, 0.2, -0.3, -0.6, 0.0], [3, 3, 3, 3, 3, 0])
+    assert sentiment.tolist() == ["Positive", "Positive", "Neutral", "Negative", "Negative", "Neutral"]
+    assert trend.tolist() == ["Increasing", "Increasing", "Stable", "Decreasing", "Decreasing", "Stable"]
+    assert confidence.tolist() == ["High", "Medium", "Medium", "Medium", "High", "Low"]
+
+
+def test_summarize():
+    assert summarize([0.9, 0.7]) == {
+        "average_polarity_score": pytest.approx(0.8), "article_count": 2,
+        "sentiment": "Positive", "demand_trend": "Increasing", "confidence": "High"
+    }
+    assert summarize([]) == {
+        "average_polarity_score": 0.0, "article_count": 0,
+        "sentiment": "Neutral", "demand_trend": "Stable", "confidence": "Low"
+    }
+
+
+def test_group_by_row_range():
+    scores = ArticleScores(fields=("supplier", "state"))
+    scores.extend([0.5, 0.7], supplier="A", state="MH")
+    start = len(scores)
+    scores.extend([-0.9], supplier="B", state="MH")
+    scores.add(-0.3, supplier="A", state="KA")
+
+    assert [(row["state"], row["article_count"]) for row in scores.group_by("state")] == [("MH", 3), ("KA", 1)]
+    # Only the rows added after `start`, as a streaming run reports per supplier
+    rows = scores.group_by("supplier", start=start)
+    assert {row["supplier"]: row["average_polarity_score"] for row in rows} == {"A": -0.3, "B": -0.9}
+    assert scores.group_by("supplier", start=len(scores)) == []
+    assert scores.group_by(start=0, stop=2)[0]["average_polarity_score"] == pytest.approx(0.6)
+    with pytest.raises(ValueError):
+        scores.group_by("city")
+
+
+def test_group_by_matches_python_means():
+    rng = np.random.RandomState(3)
+    states = rng.choice(["MH", "KA", "TN", "DL"], 200).tolist()
+    polarities = rng.uniform(-1, 1, 200).tolist()
+    scores = ArticleScores(fields=("state",))
+    for polarity, state in zip(polarities, states):
+        scores.add(polarity, state=state)
+    for row in scores.group_by("state"):
+        expected = [p for p, s in zip(polarities, states) if s == row["state"]]
+        assert row["article_count"] == len(expected)
+        assert row["average_polarity_score"] == pytest.approx(sum(expected) / len(expected))
+
+
+def test_is_scored():
+    assert is_scored({"sentiment": "Negative", "polarity_score": -0.8})
+    assert not is_scored({"sentiment": "Neutral", "polarity_score": 0.0})
+    assert not is_scored({"sentiment": "Positive", "polarity_score": None})
+
+
+def test_risk_batch_scores_whole_keywords():
+    risks = analyze_risk_batch(["Flood and curfew in Chennai", "Quarterly results", ""])
+    assert risks[0]["keywords"] == ["flood", "curfew"] and risks[0]["risk_score"] == 4
+    assert risks[1]["keywords"] == [] and risks[1]["risk_score"] == 0
+    assert risks[2]["risk_score"] == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tests for inference governance in the sentiment micro-batcher: forward passes
+on the dedicated executor, the event loop staying responsive, concurrent
+batches and the bounded queue that turns new requests away with 503.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+import models
+import sentiment
+from sentiment import MicroBatcher
+
+
+class SlowModel:
+    """Blocks like a CPU-bound forward pass and records the thread it ran on."""
+
+    def __init__(self, seconds=0.05):
+        self.seconds = seconds
+        self.batches = []
+        self.threads = set()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def analyze_batch(self, texts):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.batches.append(list(texts))
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.active -= 1
+        if "explode" in texts:
+            raise ValueError("bad batch")
+        return [{"sentiment": "Positive", "polarity_score": float(len(text))} for text in texts]
+
+
+def batcher_for(model, **kwargs):
+    kwargs.setdefault("max_wait_ms", 5)
+    concurrency = kwargs.setdefault("concurrency", 1)
+    executor = ThreadPoolExecutor(concurrency, thread_name_prefix="test-inference")
+    return MicroBatcher(lambda: model, executor=executor, **kwargs)
+
+
+def test_batches_run_on_the_inference_executor():
+    model = SlowModel()
+    batcher = batcher_for(model)
+
+    async def run():
+        results = await asyncio.gather(*(batcher.submit(text) for text in ["a", "bb", "ccc"]))
+        await batcher.close()
+        return results
+
+    results = asyncio.run(run())
+    assert [result["polarity_score"] for result in results] == [1.0, 2.0, 3.0]
+    assert model.batches == [["a", "bb", "ccc"]]
+    assert all(name.startswith("test-inference") for name in model.threads)
+
+
+def test_event_loop_keeps_ticking_during_inference():
+    batcher = batcher_for(SlowModel(seconds=0.3))
+
+    async def run():
+        inference = asyncio.ensure_future(batcher.submit("text"))
+        await asyncio.sleep(0.02)
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        tick = time.perf_counter() - start
+        await inference
+        await batcher.close()
+        return tick
+
+    assert asyncio.run(run()) < 0.1
+
+
+def test_concurrency_allows_overlapping_batches():
+    model = SlowModel(seconds=0.1)
+    batcher = batcher_for(model, max_batch_size=1, concurrency=2)
+
+    async def run():
+        await asyncio.gather(*(batcher.submit(text) for text in ["a", "b", "c", "d"]))
+        await batcher.close()
+
+    asyncio.run(run())
+    assert model.max_active == 2
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    batcher = batcher_for(SlowModel())
+
+    async def run():
+        results = await asyncio.gather(batcher.submit("fine"), batcher.submit("explode"), return_exceptions=True)
+        await batcher.close()
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_full_queue_rejects_new_requests_with_503(monkeypatch):
+    model = SlowModel(seconds=0.2)
+    batcher = batcher_for(model, max_batch_size=1, max_queue=2)
+    monkeypatch.setattr(sentiment, "sentiment_batcher", batcher)
+
+    async def run():
+        # One text in the forward pass, two waiting (the queue is full), one more blocked on put
+        submitted = [asyncio.ensure_future(batcher.submit(str(i))) for i in range(4)]
+        await asyncio.sleep(0.05)
+        assert batcher.saturated()
+        with pytest.raises(HTTPException) as rejected:
+            await sentiment.require_inference_capacity()
+        # Submitting a background job only queues it, so it isn't turned away
+        await sentiment.require_capacity_unless_background(background=True)
+        # Callers already admitted wait for room instead of failing
+        results = await asyncio.gather(*submitted)
+        assert not batcher.saturated()
+        await sentiment.require_inference_capacity()
+        await batcher.close()
+        return rejected.value, results
+
+    rejected, results = asyncio.run(run())
+    assert rejected.status_code == 503 and rejected.headers == {"Retry-After": "1"}
+    assert len(results) == 4
+
+
+def test_restarted_worker_serves_texts_already_queued():
+    model = SlowModel(seconds=0.1)
+    batcher = batcher_for(model, max_batch_size=1)
+
+    async def run():
+        first = asyncio.ensure_future(batcher.submit("a"))
+        await asyncio.sleep(0.02)
+        # The worker waits for the busy thread while "bb" sits in the queue
+        waiting = asyncio.ensure_future(batcher.submit("bb"))
+        await asyncio.sleep(0.01)
+        batcher._worker.cancel()
+        await asyncio.sleep(0)
+        results = await asyncio.gather(first, waiting, batcher.submit("ccc"))
+        await batcher.close()
+        return results
+
+    assert [result["polarity_score"] for result in asyncio.run(run())] == [1.0, 2.0, 3.0]
+
+
+def test_thread_counts_split_cores(monkeypatch):
+    monkeypatch.setattr(models, "TORCH_INTRA_OP_THREADS", 0)
+    monkeypatch.setattr(models, "SENTIMENT_SERVING", "process")
+    monkeypatch.setattr(models, "WEB_CONCURRENCY", 2)
+    monkeypatch.setattr(models, "SENTIMENT_INFERENCE_THREADS", 2)
+    monkeypatch.setattr(models.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    assert models.inference_thread_counts() == (2, 1)
+    monkeypatch.setattr(models, "SENTIMENT_SERVING", "sidecar")
+    assert models.inference_thread_counts() == (8, 1)
+    monkeypatch.setattr(models, "TORCH_INTRA_OP_THREADS", 3)
+    assert models.inference_thread_counts() == (3, 1)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+
+DAY_SECONDS = 86400.0
+
+
+def iso_timestamp(timestamp):
+    """Seconds since the epoch as the reports' UTC ISO form ("2024-06-30T12:00:00Z"); None stays None."""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+def utc_day(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+
+def published_at(article):
+    """An article's publishedAt as seconds since the epoch (naive times are UTC), or None if missing or unparseable."""
+    try:
+        published = datetime.fromisoformat(article["publishedAt"].replace("Z", "+00:00"))
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return None
+    if published.tzinfo is None:
+        published = published.replace(tzinfo=timezone.utc)
+    return published.timestamp()
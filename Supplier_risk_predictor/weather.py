@@ -0,0 +1,72 @@
+import math
+
+import http_client
+from cache import Cache
+from concurrency import weather_limiter, map_bounded
+from metrics import register_cache, stage_timer
+from config import (
+    WEATHER_API_KEY, WEATHER_API_URL,
+    WEATHER_GRID_DEGREES, WEATHER_CACHE_TTL_SECONDS, WEATHER_CACHE_MAX_BYTES
+)
+
+# OpenWeatherMap refreshes current conditions roughly every 10 minutes,
+# so one lookup per grid cell per TTL window is all the data there is
+weather_cache = Cache(ttl=WEATHER_CACHE_TTL_SECONDS, max_bytes=WEATHER_CACHE_MAX_BYTES)
+register_cache("weather", weather_cache)
+
+def grid_cell(lat, lon, size=WEATHER_GRID_DEGREES):
+    return math.floor(lat / size), math.floor(lon / size)
+
+def cell_center(cell, size=WEATHER_GRID_DEGREES):
+    row, col = cell
+    return round((row + 0.5) * size, 4), round((col + 0.5) * size, 4)
+
+async def fetch_road_details(state, lat, lon):
+    params = {
+        "lat": lat,
+        "lon": lon,
+        "appid": WEATHER_API_KEY,
+        "units": "metric"
+    }
+    with stage_timer("weather_fetch"):
+        response = await http_client.get(WEATHER_API_URL, params=params)
+    if response.status_code == 200:
+        data = response.json()
+        return {
+            "weather": data.get("weather", [{}])[0].get("description", "N/A"),
+            "temp": data.get("main", {}).get("temp", "N/A"),
+            "humidity": data.get("main", {}).get("humidity", "N/A"),
+            "wind_speed": data.get("wind", {}).get("speed", "N/A")
+        }
+    return {"error": f"Failed to fetch road/weather details for {state}"}
+
+async def get_road_details(state, lat, lon, fetched=None):
+    """
+    Weather for the grid cell containing (lat, lon). Nearby suppliers share
+    one cached upstream call; concurrent lookups for a cell are coalesced.
+    If this call goes upstream its cell is appended to `fetched` (when given).
+    """
+    cell = grid_cell(lat, lon)
+    center_lat, center_lon = cell_center(cell)
+
+    def fetch():
+        if fetched is not None:
+            fetched.append(cell)
+        return weather_limiter.run(fetch_road_details, state, center_lat, center_lon)
+
+    return await weather_cache.get_or_fetch(
+        f"weather:{WEATHER_GRID_DEGREES}:{cell[0]}:{cell[1]}", fetch,
+        should_cache=lambda result: "error" not in result
+    )
+
+async def prefetch_weather(points):
+    """
+    Warm the cache for many (state, lat, lon) points with one request per
+    distinct cell not already cached. Returns (distinct cells, upstream fetches).
+    """
+    cells = {}
+    for state, lat, lon in points:
+        cells.setdefault(grid_cell(lat, lon), (state, lat, lon))
+    fetched = []
+    await map_bounded(lambda point: get_road_details(*point, fetched=fetched), list(cells.values()))
+    return len(cells), len(fetched)